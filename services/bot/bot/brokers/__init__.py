@@ -1 +1,44 @@
+"""Broker adapters, created lazily by name.
 
+Adapters pull in heavy third-party stacks (e.g. ib_insync and its event loop
+machinery), so they are only imported once `create_broker` selects one.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Callable, Dict
+
+from bot.util.startup import STARTUP
+
+if TYPE_CHECKING:
+    from bot.brokers.base import Broker
+    from bot.config import LocalConfig
+
+
+def _alpaca(cfg: "LocalConfig") -> "Broker":
+    mod = STARTUP.timed_import("bot.brokers.alpaca")
+    return mod.AlpacaBroker(
+        api_key=cfg.alpaca.api_key,
+        api_secret=cfg.alpaca.api_secret,
+        trading_base_url=cfg.alpaca.trading_base_url,
+        data_base_url=os.getenv("ALPACA_DATA_BASE_URL", "https://data.alpaca.markets"),
+    )
+
+
+def _ibkr(cfg: "LocalConfig") -> "Broker":
+    mod = STARTUP.timed_import("bot.brokers.ibkr")
+    return mod.IBKRBroker(host=cfg.ibkr.host, port=cfg.ibkr.port, client_id=cfg.ibkr.client_id)
+
+
+BROKERS: Dict[str, Callable[["LocalConfig"], "Broker"]] = {
+    "alpaca": _alpaca,
+    "ibkr": _ibkr,
+}
+
+
+def create_broker(cfg: "LocalConfig") -> "Broker":
+    factory = BROKERS.get(cfg.broker)
+    if factory is None:
+        raise ValueError(f"unknown_broker {cfg.broker!r}")
+    return factory(cfg)
@@ -2,23 +2,28 @@ from __future__ import annotations
 
 import logging
 import os
+from datetime import date, datetime
 from typing import Any, Dict, List, Optional
 
 import requests
 
 from bot.brokers.base import Account, Broker, Position
+from bot.brokers.calendar import MarketCalendar, Session, et_to_ms
 
 log = logging.getLogger("bot.broker.alpaca")
 
 
 class AlpacaBroker(Broker):
     name = "alpaca"
+    fast_quotes = True
 
     def __init__(self, api_key: str, api_secret: str, trading_base_url: str, data_base_url: str):
         self.api_key = api_key.strip()
         self.api_secret = api_secret.strip()
         self.trading_base_url = trading_base_url.rstrip("/")
         self.data_base_url = data_base_url.rstrip("/")
+        # Pooled keep-alive connections: no TLS handshake per request once warm.
+        self._http = requests.Session()
 
     def is_configured(self) -> bool:
         return bool(self.api_key and self.api_secret)
@@ -31,16 +36,28 @@ class AlpacaBroker(Broker):
         }
 
     def is_market_open(self) -> bool:
-        try:
-            r = requests.get(f"{self.trading_base_url}/v2/clock", headers=self._headers(), timeout=10)
-            if r.status_code != 200:
-                return False
-            return bool(r.json().get("is_open"))
-        except Exception:
-            return False
+        # Answered from the cached /v2/calendar sessions instead of a /v2/clock call per tick.
+        return self.market_calendar().is_open()
+
+    def _new_calendar(self) -> MarketCalendar:
+        return MarketCalendar("alpaca", fetcher=self._fetch_calendar)
+
+    def _fetch_calendar(self, start: date, end: date) -> List[Session]:
+        r = self._http.get(
+            f"{self.trading_base_url}/v2/calendar",
+            headers=self._headers(),
+            params={"start": start.isoformat(), "end": end.isoformat()},
+            timeout=15,
+        )
+        r.raise_for_status()
+        out: List[Session] = []
+        for row in r.json() or []:
+            d = date.fromisoformat(str(row["date"]))
+            out.append(Session(d.isoformat(), et_to_ms(d, str(row["open"])), et_to_ms(d, str(row["close"]))))
+        return out
 
     def get_account(self) -> Account:
-        r = requests.get(f"{self.trading_base_url}/v2/account", headers=self._headers(), timeout=15)
+        r = self._http.get(f"{self.trading_base_url}/v2/account", headers=self._headers(), timeout=15)
         if r.status_code != 200:
             raise RuntimeError(f"alpaca_account_failed status={r.status_code} body={r.text[:200]}")
         j = r.json()
@@ -49,7 +66,7 @@ class AlpacaBroker(Broker):
         return Account(equity=equity, cash=cash)
 
     def list_positions(self) -> List[Position]:
-        r = requests.get(f"{self.trading_base_url}/v2/positions", headers=self._headers(), timeout=15)
+        r = self._http.get(f"{self.trading_base_url}/v2/positions", headers=self._headers(), timeout=15)
         if r.status_code == 404:
             return []
         if r.status_code != 200:
@@ -74,7 +91,7 @@ class AlpacaBroker(Broker):
         symbol = symbol.upper()
         # Prefer quote midpoint.
         try:
-            r = requests.get(
+            r = self._http.get(
                 f"{self.data_base_url}/v2/stocks/{symbol}/quotes/latest",
                 headers=self._headers(),
                 timeout=10,
@@ -94,7 +111,7 @@ class AlpacaBroker(Broker):
 
         # Fallback to last trade price.
         try:
-            r = requests.get(
+            r = self._http.get(
                 f"{self.data_base_url}/v2/stocks/{symbol}/trades/latest",
                 headers=self._headers(),
                 timeout=10,
@@ -109,6 +126,48 @@ class AlpacaBroker(Broker):
 
         return None
 
+    def latest_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        """Batched quote midpoints (one request), last trade for any symbol without a quote."""
+        syms = sorted({s.upper() for s in symbols if s})
+        out: Dict[str, Optional[float]] = {s: None for s in syms}
+        if not syms:
+            return out
+        try:
+            r = self._http.get(
+                f"{self.data_base_url}/v2/stocks/quotes/latest",
+                headers=self._headers(),
+                params={"symbols": ",".join(syms)},
+                timeout=10,
+            )
+            if r.status_code == 200:
+                for sym, q in ((r.json() or {}).get("quotes") or {}).items():
+                    bp = float(q.get("bp") or 0.0)
+                    ap = float(q.get("ap") or 0.0)
+                    if bp > 0 and ap > 0:
+                        out[sym.upper()] = (bp + ap) / 2.0
+                    elif bp > 0 or ap > 0:
+                        out[sym.upper()] = bp or ap
+        except Exception:
+            pass
+
+        missing = [s for s, px in out.items() if px is None]
+        if missing:
+            try:
+                r = self._http.get(
+                    f"{self.data_base_url}/v2/stocks/trades/latest",
+                    headers=self._headers(),
+                    params={"symbols": ",".join(missing)},
+                    timeout=10,
+                )
+                if r.status_code == 200:
+                    for sym, t in ((r.json() or {}).get("trades") or {}).items():
+                        p = float(t.get("p") or 0.0)
+                        if p > 0:
+                            out[sym.upper()] = p
+            except Exception:
+                pass
+        return out
+
     def place_entry_with_bracket(
         self,
         symbol: str,
@@ -143,7 +202,7 @@ class AlpacaBroker(Broker):
         if client_order_id:
             payload["client_order_id"] = client_order_id[:48]
 
-        r = requests.post(f"{self.trading_base_url}/v2/orders", headers=self._headers(), json=payload, timeout=20)
+        r = self._http.post(f"{self.trading_base_url}/v2/orders", headers=self._headers(), json=payload, timeout=20)
         if r.status_code not in (200, 201):
             raise RuntimeError(f"alpaca_order_failed status={r.status_code} body={r.text[:300]}")
 
@@ -152,7 +211,7 @@ class AlpacaBroker(Broker):
 
         # Alpaca supports DELETE /v2/positions/{symbol} to close full position.
         if qty is None:
-            r = requests.delete(f"{self.trading_base_url}/v2/positions/{symbol}", headers=self._headers(), timeout=20)
+            r = self._http.delete(f"{self.trading_base_url}/v2/positions/{symbol}", headers=self._headers(), timeout=20)
             if r.status_code not in (200, 204):
                 raise RuntimeError(f"alpaca_close_failed status={r.status_code} body={r.text[:300]}")
             return
@@ -170,6 +229,25 @@ class AlpacaBroker(Broker):
         if client_order_id:
             payload["client_order_id"] = client_order_id[:48]
 
-        r = requests.post(f"{self.trading_base_url}/v2/orders", headers=self._headers(), json=payload, timeout=20)
+        r = self._http.post(f"{self.trading_base_url}/v2/orders", headers=self._headers(), json=payload, timeout=20)
         if r.status_code not in (200, 201):
             raise RuntimeError(f"alpaca_partial_close_failed status={r.status_code} body={r.text[:300]}")
+
+    def fill_time_ms(self, client_order_id: str) -> Optional[int]:
+        if not client_order_id:
+            return None
+        r = self._http.get(
+            f"{self.trading_base_url}/v2/orders:by_client_order_id",
+            headers=self._headers(),
+            params={"client_order_id": client_order_id[:48]},
+            timeout=10,
+        )
+        if r.status_code != 200:
+            return None
+        filled_at = (r.json() or {}).get("filled_at")
+        if not filled_at:
+            return None
+        # RFC 3339 with up to nanosecond precision; fromisoformat takes at most microseconds.
+        head, _, frac = str(filled_at).rstrip("Z").partition(".")
+        ts = datetime.fromisoformat(f"{head}.{(frac or '0')[:6]}+00:00")
+        return int(ts.timestamp() * 1000)
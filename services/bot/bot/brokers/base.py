@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
+
+from bot.brokers.calendar import MarketCalendar
 
 
 @dataclass
@@ -19,8 +22,32 @@ class Account:
     cash: float
 
 
+@dataclass
+class BrokerUpdate:
+    """State pushed by adapters with a streaming connection (fields left None are unchanged)."""
+
+    account: Optional[Account] = None
+    positions: Optional[List[Position]] = None
+    connected: Optional[bool] = None
+
+
+UpdateCallback = Callable[[BrokerUpdate], None]
+
+
 class Broker:
+    """Broker adapter.
+
+    The sync methods are the adapter contract. The engine uses the `a*`
+    coroutines, which by default run the sync call on a worker thread so a slow
+    broker request never stalls the event loop; adapters with their own I/O
+    loop override them.
+    """
+
     name: str = ""
+    # True when latest_prices() is a cheap, thread-safe request that can be
+    # polled frequently (used for intraday mark-to-market).
+    fast_quotes: bool = False
+    _calendar: Optional[MarketCalendar] = None
 
     def is_configured(self) -> bool:
         raise NotImplementedError
@@ -32,6 +59,15 @@ class Broker:
         """
         raise NotImplementedError
 
+    def market_calendar(self) -> MarketCalendar:
+        """Session calendar (cached on disk, refreshed at most daily)."""
+        if self._calendar is None:
+            self._calendar = self._new_calendar()
+        return self._calendar
+
+    def _new_calendar(self) -> MarketCalendar:
+        return MarketCalendar()
+
     def get_account(self) -> Account:
         raise NotImplementedError
 
@@ -41,6 +77,10 @@ class Broker:
     def latest_price(self, symbol: str) -> Optional[float]:
         raise NotImplementedError
 
+    def latest_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        """Prices for several symbols; adapters override with a batched request."""
+        return {s.upper(): self.latest_price(s) for s in symbols}
+
     def place_entry_with_bracket(
         self,
         symbol: str,
@@ -54,3 +94,57 @@ class Broker:
 
     def close_position(self, symbol: str, qty: Optional[float] = None, client_order_id: str = "") -> None:
         raise NotImplementedError
+
+    def fill_time_ms(self, client_order_id: str) -> Optional[int]:
+        """Broker-reported time (epoch ms) the order was filled; None if unknown or not filled yet."""
+        return None
+
+    # --- async surface ------------------------------------------------------
+
+    async def start(self, on_update: Optional[UpdateCallback] = None) -> None:
+        """Start background machinery; `on_update` is called on the caller's loop.
+
+        Adapters without push updates ignore the callback.
+        """
+        return None
+
+    async def ais_market_open(self) -> bool:
+        return await asyncio.to_thread(self.is_market_open)
+
+    async def afill_time_ms(self, client_order_id: str) -> Optional[int]:
+        return await asyncio.to_thread(self.fill_time_ms, client_order_id)
+
+    async def aprepare(self, symbols: List[str]) -> None:
+        """Pre-open: bring up connections and per-symbol state for `symbols`.
+
+        Adapters whose first request pays a setup cost (login, contract lookup)
+        override this; the default does nothing.
+        """
+        return None
+
+    async def aget_account(self) -> Account:
+        return await asyncio.to_thread(self.get_account)
+
+    async def alist_positions(self) -> List[Position]:
+        return await asyncio.to_thread(self.list_positions)
+
+    async def alatest_price(self, symbol: str) -> Optional[float]:
+        return await asyncio.to_thread(self.latest_price, symbol)
+
+    async def alatest_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        return await asyncio.to_thread(self.latest_prices, symbols)
+
+    async def aplace_entry_with_bracket(
+        self,
+        symbol: str,
+        qty: float,
+        stop_loss_pct: float,
+        take_profit_pct: float,
+        client_order_id: str,
+    ) -> None:
+        await asyncio.to_thread(
+            self.place_entry_with_bracket, symbol, qty, stop_loss_pct, take_profit_pct, client_order_id
+        )
+
+    async def aclose_position(self, symbol: str, qty: Optional[float] = None, client_order_id: str = "") -> None:
+        await asyncio.to_thread(self.close_position, symbol, qty, client_order_id)
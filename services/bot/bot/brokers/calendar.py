@@ -0,0 +1,334 @@
+"""US equities session calendar, answered locally.
+
+Sessions (open/close instants per trading day) come from a fetcher, e.g.
+Alpaca `/v2/calendar`, or from bundled NYSE rules (holidays, observed dates
+and 13:00 early closes). They are cached in `<state_dir>/market_calendar_<source>.json`
+and refetched at most once a day, so open/closed, time-to-open and
+time-to-close need no per-tick network call. Queries never block: a stale
+table is refetched in the background (a worker thread) while the current one
+keeps answering; with no table at all the bundled rules answer meanwhile.
+
+The bundled rules cannot know about unscheduled closures (e.g. national days
+of mourning); a broker calendar source covers those once published.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bot.config import state_dir
+
+log = logging.getLogger("bot.calendar")
+
+_REFRESH_S = 24 * 3600
+_HORIZON_DAYS = 45  # sessions fetched ahead of today
+_LOOKBACK_DAYS = 7
+_RETRY_S = 3600  # after a failed fetch
+
+try:
+    from zoneinfo import ZoneInfo
+
+    _ET: Optional[timezone] = ZoneInfo("America/New_York")  # type: ignore[assignment]
+except Exception:  # no tz database in the image
+    _ET = None
+
+
+@dataclass(frozen=True)
+class Session:
+    day: str       # YYYY-MM-DD (exchange date)
+    open_ms: int   # epoch ms
+    close_ms: int  # epoch ms
+
+
+SessionFetcher = Callable[[date, date], List[Session]]
+
+
+def _us_eastern_offset_h(d: date, hour: int) -> int:
+    """UTC offset of US/Eastern for a local wall time (post-2007 DST rules)."""
+    march = date(d.year, 3, 1)
+    dst_start = march + timedelta(days=(6 - march.weekday()) % 7 + 7)  # 2nd Sunday of March
+    nov = date(d.year, 11, 1)
+    dst_end = nov + timedelta(days=(6 - nov.weekday()) % 7)  # 1st Sunday of November
+    if dst_start < d < dst_end or (d == dst_start and hour >= 2) or (d == dst_end and hour < 2):
+        return -4
+    return -5
+
+
+def et_to_ms(d: date, hhmm: str) -> int:
+    """Epoch ms for an America/New_York wall-clock time on `d`."""
+    hh, _, mm = hhmm.partition(":")
+    hour, minute = int(hh), int(mm or 0)
+    if _ET is not None:
+        local = datetime(d.year, d.month, d.day, hour, minute, tzinfo=_ET)
+        return int(local.timestamp() * 1000)
+    off = _us_eastern_offset_h(d, hour)
+    utc = datetime(d.year, d.month, d.day, hour, minute, tzinfo=timezone.utc) - timedelta(hours=off)
+    return int(utc.timestamp() * 1000)
+
+
+def et_today(now_s: Optional[float] = None) -> date:
+    now_s = time.time() if now_s is None else now_s
+    if _ET is not None:
+        return datetime.fromtimestamp(now_s, _ET).date()
+    utc = datetime.fromtimestamp(now_s, timezone.utc)
+    return (utc + timedelta(hours=_us_eastern_offset_h(utc.date(), utc.hour))).date()
+
+
+# --- bundled NYSE rules ----------------------------------------------------------
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    nxt = date(year + (month == 12), month % 12 + 1, 1)
+    last = nxt - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm.
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(d: date) -> Optional[date]:
+    if d.weekday() == 5:
+        # Saturday holidays move to Friday, except New Year's Day (NYSE rule 7.2).
+        return None if (d.month, d.day) == (1, 1) else d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+def nyse_holidays(year: int) -> Dict[date, str]:
+    out: Dict[date, str] = {}
+
+    def add(d: Optional[date], name: str) -> None:
+        if d is not None:
+            out[d] = name
+
+    add(_observed(date(year, 1, 1)), "new_year")
+    add(_nth_weekday(year, 1, 0, 3), "mlk_day")
+    add(_nth_weekday(year, 2, 0, 3), "presidents_day")
+    add(_easter(year) - timedelta(days=2), "good_friday")
+    add(_last_weekday(year, 5, 0), "memorial_day")
+    if year >= 2022:
+        add(_observed(date(year, 6, 19)), "juneteenth")
+    add(_observed(date(year, 7, 4)), "independence_day")
+    add(_nth_weekday(year, 9, 0, 1), "labor_day")
+    add(_nth_weekday(year, 11, 3, 4), "thanksgiving")
+    add(_observed(date(year, 12, 25)), "christmas")
+    return out
+
+
+def nyse_early_closes(year: int) -> Dict[date, str]:
+    out: Dict[date, str] = {}
+    jul3 = date(year, 7, 3)
+    if jul3.weekday() < 4:  # Mon-Thu; a Friday July 3 is the observed holiday
+        out[jul3] = "13:00"
+    out[_nth_weekday(year, 11, 3, 4) + timedelta(days=1)] = "13:00"
+    dec24 = date(year, 12, 24)
+    if dec24.weekday() < 4:
+        out[dec24] = "13:00"
+    return out
+
+
+def bundled_sessions(start: date, end: date) -> List[Session]:
+    """Regular sessions from the NYSE rules, `start`..`end` inclusive."""
+    holidays: Dict[date, str] = {}
+    early: Dict[date, str] = {}
+    for y in range(start.year, end.year + 1):
+        holidays.update(nyse_holidays(y))
+        early.update(nyse_early_closes(y))
+    out: List[Session] = []
+    d = start
+    while d <= end:
+        if d.weekday() < 5 and d not in holidays:
+            out.append(Session(d.isoformat(), et_to_ms(d, "09:30"), et_to_ms(d, early.get(d, "16:00"))))
+        d += timedelta(days=1)
+    return out
+
+
+# --- calendar -------------------------------------------------------------------
+
+
+class MarketCalendar:
+    """Cached session table with local open/close queries.
+
+    `source` names the cache (`alpaca`, `bundled`) so brokers don't share a
+    file with a different origin. With no fetcher, or if the fetch fails, the
+    bundled rules are used.
+    """
+
+    def __init__(self, source: str = "bundled", fetcher: Optional[SessionFetcher] = None, path: Optional[Path] = None):
+        self.source = source
+        self.fetcher = fetcher
+        self.path = path if path is not None else state_dir() / f"market_calendar_{source}.json"
+        self._sessions: List[Session] = []
+        self._opens: List[int] = []
+        self._fetched_s = 0.0
+        self._covers: Tuple[str, str] = ("", "")
+        self._retry_at = 0.0  # no refresh attempt before this (after a failed fetch)
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._load_cache()
+
+    # --- cache ---------------------------------------------------------------
+
+    def _set(self, sessions: List[Session], fetched_s: float, covers: Tuple[str, str]) -> None:
+        sessions = sorted(sessions, key=lambda s: s.open_ms)
+        self._sessions = sessions
+        self._opens = [s.open_ms for s in sessions]
+        self._fetched_s = fetched_s
+        self._covers = covers
+
+    def _load_cache(self) -> None:
+        try:
+            if not self.path.exists():
+                return
+            j = json.loads(self.path.read_text(encoding="utf-8"))
+            sessions = [Session(str(s["day"]), int(s["open_ms"]), int(s["close_ms"])) for s in j.get("sessions") or []]
+            self._set(sessions, float(j.get("fetched_s") or 0.0), (str(j.get("from") or ""), str(j.get("to") or "")))
+        except Exception as e:
+            log.warning("calendar_cache_invalid path=%s err=%s", self.path, e)
+
+    def _save_cache(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "source": self.source,
+            "fetched_s": self._fetched_s,
+            "from": self._covers[0],
+            "to": self._covers[1],
+            "sessions": [s.__dict__ for s in self._sessions],
+        }, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _stale(self, today: date) -> bool:
+        if time.time() < self._retry_at:
+            return False
+        lo, hi = self._covers
+        if not self._sessions or not lo or not hi:
+            return True
+        need_hi = (today + timedelta(days=7)).isoformat()
+        return lo > today.isoformat() or hi < need_hi or time.time() - self._fetched_s > _REFRESH_S
+
+    def refresh(self, force: bool = False) -> None:
+        """Refetch the session table if stale (blocking; at most once a day)."""
+        today = et_today()
+        with self._lock:
+            if not force and not self._stale(today):
+                return
+            start = today - timedelta(days=_LOOKBACK_DAYS)
+            end = today + timedelta(days=_HORIZON_DAYS)
+            sessions: Optional[List[Session]] = None
+            if self.fetcher is not None:
+                try:
+                    sessions = self.fetcher(start, end)
+                except Exception as e:
+                    log.warning("calendar_fetch_failed source=%s err=%s", self.source, e)
+            if not sessions:
+                if self.fetcher is not None:
+                    self._retry_at = time.time() + _RETRY_S
+                    # Keep the last fetched table while it still covers today.
+                    if not (self._sessions and self._covers[1] >= today.isoformat()):
+                        # Nothing fetched covers today: use the bundled rules in memory only, unstamped
+                        # and unsaved, so `_retry_at` alone decides when to ask the fetcher again.
+                        self._set(bundled_sessions(start, end), 0.0, ("", ""))
+                    return
+                sessions = bundled_sessions(start, end)
+            else:
+                self._retry_at = 0.0
+            self._set(sessions, time.time(), (start.isoformat(), end.isoformat()))
+            try:
+                self._save_cache()
+            except OSError as e:
+                log.warning("calendar_cache_write_failed err=%s", e)
+            log.info("calendar_refreshed source=%s sessions=%d to=%s", self.source, len(sessions), end.isoformat())
+
+    # --- queries (local) ---------------------------------------------------------
+
+    def _current_or_next(self, now_ms: int) -> Optional[Session]:
+        i = bisect.bisect_right(self._opens, now_ms) - 1
+        if i >= 0 and now_ms < self._sessions[i].close_ms:
+            return self._sessions[i]
+        return self._sessions[i + 1] if i + 1 < len(self._sessions) else None
+
+    def _refresh_in_background(self) -> None:
+        if self._refreshing:
+            return
+        self._refreshing = True
+
+        def _run() -> None:
+            try:
+                self.refresh()
+            except Exception as e:
+                log.warning("calendar_refresh_failed source=%s err=%s", self.source, e)
+            finally:
+                self._refreshing = False
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            threading.Thread(target=_run, name="calendar-refresh", daemon=True).start()
+        else:
+            self._task = loop.create_task(asyncio.to_thread(_run))
+
+    def _now_ms(self, now_ms: Optional[int]) -> int:
+        today = et_today()
+        if self._stale(today):
+            if not self._sessions:
+                # Nothing cached yet: answer from the bundled rules until the fetch lands.
+                self._set(
+                    bundled_sessions(today - timedelta(days=_LOOKBACK_DAYS), today + timedelta(days=_HORIZON_DAYS)),
+                    0.0, ("", ""),
+                )
+            self._refresh_in_background()
+        return int(time.time() * 1000) if now_ms is None else int(now_ms)
+
+    def is_open(self, now_ms: Optional[int] = None) -> bool:
+        now = self._now_ms(now_ms)
+        s = self._current_or_next(now)
+        return s is not None and s.open_ms <= now < s.close_ms
+
+    def session(self, now_ms: Optional[int] = None) -> Optional[Session]:
+        """The session in progress, else the next one."""
+        return self._current_or_next(self._now_ms(now_ms))
+
+    def time_to_open(self, now_ms: Optional[int] = None) -> Optional[float]:
+        """Seconds until the next open (0 while open; None if unknown)."""
+        now = self._now_ms(now_ms)
+        s = self._current_or_next(now)
+        if s is None:
+            return None
+        return max(0.0, (s.open_ms - now) / 1000.0)
+
+    def time_to_close(self, now_ms: Optional[int] = None) -> Optional[float]:
+        """Seconds until the current session closes (None while closed)."""
+        now = self._now_ms(now_ms)
+        s = self._current_or_next(now)
+        if s is None or now < s.open_ms:
+            return None
+        return (s.close_ms - now) / 1000.0
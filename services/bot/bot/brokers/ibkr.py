@@ -1,16 +1,179 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
 import logging
+import threading
 import time
-from datetime import datetime
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-from ib_insync import IB, LimitOrder, MarketOrder, Stock, StopOrder, util
+from ib_insync import IB, LimitOrder, MarketOrder, Stock, StopOrder
 
-from bot.brokers.base import Account, Broker, Position
+from bot.brokers.base import Account, Broker, BrokerUpdate, Position, UpdateCallback
 
 log = logging.getLogger("bot.broker.ibkr")
 
+# Upper bound for a single request on the worker (entries wait up to ~6 s for a fill).
+_CALL_TIMEOUT_S = 30.0
+
+
+def _price(px: Any) -> Optional[float]:
+    """ib_insync reports missing prices as NaN (or -1 for some ticks)."""
+    try:
+        v = float(px)
+    except (TypeError, ValueError):
+        return None
+    if v != v or v <= 0:
+        return None
+    return v
+
+
+class _IBWorker:
+    """Owns the `IB` connection on a dedicated thread with its own event loop.
+
+    Every ib_insync call happens on that loop, so the bot's loop never waits on
+    a connect timeout or an `ib.sleep`. Callers submit coroutines with `submit`
+    and get a concurrent future back. The worker reconnects in the background
+    and pushes portfolio/account changes through `on_update`.
+    """
+
+    def __init__(self, host: str, port: int, client_id: int, on_update: Callable[[BrokerUpdate], None]):
+        self.host = host
+        self.port = int(port)
+        self.client_id = int(client_id)
+        self.on_update = on_update
+        self.connected = threading.Event()
+
+        self.ib: Optional[IB] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+        self._disconnected: Optional[asyncio.Event] = None
+        self._push_scheduled = False
+        self._thread = threading.Thread(target=self._main, name="ibkr-worker", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        self._ready.wait()
+
+    def submit(self, fn: Callable[..., Awaitable[Any]], *args: Any) -> "concurrent.futures.Future[Any]":
+        assert self._loop is not None
+        return asyncio.run_coroutine_threadsafe(fn(*args), self._loop)
+
+    # --- worker thread --------------------------------------------------------
+
+    def _main(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._disconnected = asyncio.Event()
+        self.ib = IB()
+        self.ib.connectedEvent += self._on_connected
+        self.ib.disconnectedEvent += self._on_disconnected
+        self.ib.updatePortfolioEvent += self._on_portfolio
+        self.ib.accountValueEvent += self._on_account_value
+        loop.create_task(self._connection_loop())
+        self._ready.set()
+        loop.run_forever()
+
+    async def _connection_loop(self) -> None:
+        assert self.ib is not None and self._disconnected is not None
+        backoff = 2.0
+        while True:
+            if self.ib.isConnected():
+                await self._disconnected.wait()
+                self._disconnected.clear()
+                continue
+            try:
+                await self.ib.connectAsync(self.host, self.port, clientId=self.client_id, timeout=3)
+                backoff = 2.0
+            except Exception as e:
+                log.warning("ibkr_connect_failed err=%s retry_s=%.0f", e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(60.0, backoff * 2)
+
+    def _on_connected(self) -> None:
+        self.connected.set()
+        log.info("ibkr_connected host=%s port=%s client_id=%s", self.host, self.port, self.client_id)
+        self.on_update(BrokerUpdate(connected=True))
+
+    def _on_disconnected(self) -> None:
+        was = self.connected.is_set()
+        self.connected.clear()
+        if self._disconnected is not None:
+            self._disconnected.set()
+        if was:
+            log.warning("ibkr_disconnected")
+            self.on_update(BrokerUpdate(connected=False))
+
+    def _on_portfolio(self, _item: Any) -> None:
+        # Portfolio rows arrive one symbol at a time; coalesce a burst into one push.
+        if self._push_scheduled or self._loop is None:
+            return
+        self._push_scheduled = True
+        self._loop.call_later(0.25, self._push_positions)
+
+    def _push_positions(self) -> None:
+        self._push_scheduled = False
+        self.on_update(BrokerUpdate(positions=self.positions()))
+
+    def _on_account_value(self, value: Any) -> None:
+        if getattr(value, "tag", "") not in ("NetLiquidation", "TotalCashValue"):
+            return
+        acct = self.account_from_values()
+        if acct is not None:
+            self.on_update(BrokerUpdate(account=acct))
+
+    # --- helpers (worker thread only) -----------------------------------------
+
+    def positions(self) -> List[Position]:
+        assert self.ib is not None
+        out: List[Position] = []
+        items = self.ib.portfolio()
+        if items:
+            for it in items:
+                if it.contract.secType != "STK" or not it.position:
+                    continue
+                qty = float(it.position)
+                out.append(Position(
+                    symbol=str(it.contract.symbol).upper(),
+                    qty=abs(qty),
+                    side="long" if qty >= 0 else "short",
+                    avg_entry_price=_price(it.averageCost),
+                    market_value=float(it.marketValue) if _price(abs(it.marketValue)) else None,
+                ))
+            return out
+        for p in self.ib.positions():
+            if p.contract.secType != "STK":
+                continue
+            qty = float(p.position)
+            out.append(Position(
+                symbol=str(p.contract.symbol).upper(),
+                qty=abs(qty),
+                side="long" if qty >= 0 else "short",
+                avg_entry_price=_price(p.avgCost),
+                market_value=None,
+            ))
+        return out
+
+    def account_from_values(self) -> Optional[Account]:
+        """Account from the streamed account values (kept current by ib_insync)."""
+        assert self.ib is not None
+        cash: Optional[float] = None
+        equity: Optional[float] = None
+        for v in self.ib.accountValues():
+            if v.currency not in ("USD", "BASE"):
+                continue
+            try:
+                if v.tag == "NetLiquidation":
+                    equity = float(v.value)
+                elif v.tag == "TotalCashValue":
+                    cash = float(v.value)
+            except ValueError:
+                continue
+        if equity is None or cash is None:
+            return None
+        return Account(equity=equity, cash=cash)
+
 
 class IBKRBroker(Broker):
     name = "ibkr"
@@ -19,43 +182,159 @@ class IBKRBroker(Broker):
         self.host = host
         self.port = int(port)
         self.client_id = int(client_id)
-        self.ib = IB()
-        self._last_connect = 0.0
+        self._worker: Optional[_IBWorker] = None
+        self._worker_lock = threading.Lock()
+        self._listener: Optional[UpdateCallback] = None
+        self._listener_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Qualified contracts by symbol (worker loop only); conIds don't change intraday.
+        self._contracts: Dict[str, Stock] = {}
 
     def is_configured(self) -> bool:
         # Credentials are handled by running TWS/IB Gateway; we only need connection params.
         return True
 
-    def _ensure_connected(self) -> None:
-        if self.ib.isConnected():
-            return
-        # Throttle reconnect attempts.
-        if time.time() - self._last_connect < 5:
+    # --- worker plumbing --------------------------------------------------------
+
+    def _ensure_worker(self) -> _IBWorker:
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = _IBWorker(self.host, self.port, self.client_id, self._emit)
+                self._worker.start()
+            return self._worker
+
+    @property
+    def ib(self) -> IB:
+        ib = self._ensure_worker().ib
+        assert ib is not None
+        return ib
+
+    def _emit(self, update: BrokerUpdate) -> None:
+        cb, loop = self._listener, self._listener_loop
+        if cb is None or loop is None or loop.is_closed():
             return
-        self._last_connect = time.time()
-        try:
-            self.ib.connect(self.host, self.port, clientId=self.client_id, timeout=3)
-        except Exception as e:
-            log.warning("ibkr_connect_failed err=%s", e)
+        loop.call_soon_threadsafe(cb, update)
 
-    def is_market_open(self) -> bool:
-        # Fallback heuristic: US equities regular session (Mon-Fri, 09:30-16:00 America/New_York).
-        try:
-            from zoneinfo import ZoneInfo
+    def _call(self, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Run a worker coroutine from a plain thread and wait for the result."""
+        return self._ensure_worker().submit(fn, *args).result(timeout=_CALL_TIMEOUT_S)
 
-            now = datetime.now(ZoneInfo("America/New_York"))
-            if now.weekday() >= 5:
-                return False
-            minutes = now.hour * 60 + now.minute
-            return (9 * 60 + 30) <= minutes < (16 * 60)
-        except Exception:
-            return False
+    async def _acall(self, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        fut = self._ensure_worker().submit(fn, *args)
+        return await asyncio.wait_for(asyncio.wrap_future(fut), timeout=_CALL_TIMEOUT_S)
 
-    def get_account(self) -> Account:
-        self._ensure_connected()
+    def _require_connected(self) -> None:
         if not self.ib.isConnected():
             raise RuntimeError("ibkr_not_connected")
-        summary = self.ib.accountSummary()
+
+    async def _qualify(self, symbols: List[str]) -> Dict[str, Stock]:
+        """Qualified contracts for `symbols`, one request for the ones not cached yet."""
+        want = [s.upper() for s in symbols]
+        missing = [Stock(s, "SMART", "USD") for s in dict.fromkeys(want) if s not in self._contracts]
+        if missing:
+            await self.ib.qualifyContractsAsync(*missing)
+            for c in missing:
+                if c.conId:
+                    self._contracts[str(c.symbol).upper()] = c
+        return {s: self._contracts[s] for s in want if s in self._contracts}
+
+    async def start(self, on_update: Optional[UpdateCallback] = None) -> None:
+        self._listener = on_update
+        self._listener_loop = asyncio.get_running_loop()
+        worker = self._ensure_worker()
+        # Give the first connect a moment so the first tick sees an account.
+        if not await asyncio.to_thread(worker.connected.wait, 5.0):
+            log.warning("ibkr_not_connected_yet host=%s port=%s", self.host, self.port)
+
+    # --- Broker API -------------------------------------------------------------
+
+    def is_market_open(self) -> bool:
+        # Regular US session from the bundled NYSE calendar (holidays and early closes included).
+        return self.market_calendar().is_open()
+
+    async def ais_market_open(self) -> bool:
+        return self.is_market_open()
+
+    async def aprepare(self, symbols: List[str]) -> None:
+        worker = self._ensure_worker()
+        if not worker.connected.is_set():
+            await asyncio.to_thread(worker.connected.wait, 20.0)
+        self._require_connected()
+        if symbols:
+            await self._acall(self._qualify, symbols)
+
+    def get_account(self) -> Account:
+        return self._call(self._get_account)
+
+    async def aget_account(self) -> Account:
+        return await self._acall(self._get_account)
+
+    def list_positions(self) -> List[Position]:
+        return self._call(self._list_positions)
+
+    async def alist_positions(self) -> List[Position]:
+        return await self._acall(self._list_positions)
+
+    def latest_price(self, symbol: str) -> Optional[float]:
+        return self._call(self._latest_prices, [symbol]).get(symbol.upper())
+
+    async def alatest_price(self, symbol: str) -> Optional[float]:
+        return (await self._acall(self._latest_prices, [symbol])).get(symbol.upper())
+
+    def latest_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        return self._call(self._latest_prices, symbols)
+
+    async def alatest_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        return await self._acall(self._latest_prices, symbols)
+
+    def place_entry_with_bracket(
+        self,
+        symbol: str,
+        qty: float,
+        stop_loss_pct: float,
+        take_profit_pct: float,
+        client_order_id: str,
+    ) -> None:
+        """Market entry + broker-side OCO protection (take-profit + stop-loss).
+
+        Goal: if the bot crashes / network drops, the broker still has an exit plan.
+        We place a market entry and, once filled, place an OCO pair:
+        - Take-profit (limit)
+        - Stop-loss (stop)
+        """
+        self._call(self._place_entry_with_bracket, symbol, qty, stop_loss_pct, take_profit_pct, client_order_id)
+
+    async def aplace_entry_with_bracket(
+        self,
+        symbol: str,
+        qty: float,
+        stop_loss_pct: float,
+        take_profit_pct: float,
+        client_order_id: str,
+    ) -> None:
+        await self._acall(self._place_entry_with_bracket, symbol, qty, stop_loss_pct, take_profit_pct, client_order_id)
+
+    def close_position(self, symbol: str, qty: Optional[float] = None, client_order_id: str = "") -> None:
+        self._call(self._close_position, symbol, qty, client_order_id)
+
+    async def aclose_position(self, symbol: str, qty: Optional[float] = None, client_order_id: str = "") -> None:
+        await self._acall(self._close_position, symbol, qty, client_order_id)
+
+    def fill_time_ms(self, client_order_id: str) -> Optional[int]:
+        return self._call(self._fill_time_ms, client_order_id)
+
+    async def afill_time_ms(self, client_order_id: str) -> Optional[int]:
+        if not client_order_id:
+            return None
+        return await self._acall(self._fill_time_ms, client_order_id)
+
+    # --- implementations (run on the worker loop) --------------------------------
+
+    async def _get_account(self) -> Account:
+        self._require_connected()
+        acct = self._ensure_worker().account_from_values()
+        if acct is not None:
+            return acct
+        summary = await self.ib.accountSummaryAsync()
         # keys: 'TotalCashValue', 'NetLiquidation'
         cash = 0.0
         equity = 0.0
@@ -72,40 +351,28 @@ class IBKRBroker(Broker):
                     pass
         return Account(equity=equity, cash=cash)
 
-    def list_positions(self) -> List[Position]:
-        self._ensure_connected()
+    async def _list_positions(self) -> List[Position]:
         if not self.ib.isConnected():
             return []
-        out: List[Position] = []
-        for p in self.ib.positions():
-            if p.contract.secType != "STK":
-                continue
-            sym = str(p.contract.symbol).upper()
-            qty = float(p.position)
-            side = "long" if qty >= 0 else "short"
-            out.append(Position(symbol=sym, qty=abs(qty), side=side, avg_entry_price=None, market_value=None))
-        return out
+        return self._ensure_worker().positions()
 
-    def latest_price(self, symbol: str) -> Optional[float]:
-        self._ensure_connected()
-        if not self.ib.isConnected():
-            return None
+    async def _latest_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {s.upper(): None for s in symbols}
+        if not out or not self.ib.isConnected():
+            return out
         try:
-            contract = Stock(symbol.upper(), "SMART", "USD")
-            self.ib.qualifyContracts(contract)
-            ticker = self.ib.reqMktData(contract, "", False, False)
-            self.ib.sleep(1)
-            price = None
-            if ticker.last is not None:
-                price = float(ticker.last)
-            elif ticker.marketPrice() is not None:
-                price = float(ticker.marketPrice())
-            self.ib.cancelMktData(contract)
-            return price
-        except Exception:
-            return None
+            contracts = list((await self._qualify(list(out))).values())
+            # One subscription per symbol, one shared wait for the first ticks.
+            tickers = [self.ib.reqMktData(c, "", False, False) for c in contracts]
+            await asyncio.sleep(1)
+            for c, t in zip(contracts, tickers):
+                out[str(c.symbol).upper()] = _price(t.last) or _price(t.marketPrice())
+                self.ib.cancelMktData(c)
+        except Exception as e:
+            log.debug("ibkr_price_failed err=%s", e)
+        return out
 
-    def place_entry_with_bracket(
+    async def _place_entry_with_bracket(
         self,
         symbol: str,
         qty: float,
@@ -113,27 +380,19 @@ class IBKRBroker(Broker):
         take_profit_pct: float,
         client_order_id: str,
     ) -> None:
-        """Market entry + broker-side OCO protection (take-profit + stop-loss).
-
-        Goal: if the bot crashes / network drops, the broker still has an exit plan.
-        We place a market entry and, once filled, place an OCO pair:
-        - Take-profit (limit)
-        - Stop-loss (stop)
-        """
-        self._ensure_connected()
-        if not self.ib.isConnected():
-            raise RuntimeError("ibkr_not_connected")
+        self._require_connected()
 
         q = int(qty)
         if q <= 0:
             raise RuntimeError("qty_must_be_positive")
 
         symbol = symbol.upper()
-        contract = Stock(symbol, "SMART", "USD")
-        self.ib.qualifyContracts(contract)
+        contract = (await self._qualify([symbol])).get(symbol)
+        if contract is None:
+            raise RuntimeError(f"ibkr_unknown_contract sym={symbol}")
 
         # Cancel any stray open orders for this symbol (safety).
-        self._cancel_open_orders_for_symbol(symbol)
+        await self._cancel_open_orders_for_symbol(symbol)
 
         entry = MarketOrder("BUY", q)
         if client_order_id:
@@ -142,7 +401,7 @@ class IBKRBroker(Broker):
 
         # Wait briefly for fill so protection orders match actual position.
         for _ in range(12):
-            self.ib.sleep(0.5)
+            await asyncio.sleep(0.5)
             st = trade.orderStatus.status
             if st in ("Filled", "Cancelled", "Inactive"):
                 break
@@ -176,7 +435,7 @@ class IBKRBroker(Broker):
                 fill_px = None
 
         if fill_px is None:
-            fill_px = self.latest_price(symbol)
+            fill_px = (await self._latest_prices([symbol])).get(symbol)
 
         if not fill_px or fill_px <= 0:
             # If we can't price protection reliably, bail out after entry.
@@ -200,42 +459,45 @@ class IBKRBroker(Broker):
 
         self.ib.placeOrder(contract, tp)
         self.ib.placeOrder(contract, sl)
-        self.ib.sleep(0.2)
+        await asyncio.sleep(0.2)
 
-    def close_position(self, symbol: str, qty: Optional[float] = None, client_order_id: str = "") -> None:
-        self._ensure_connected()
-        if not self.ib.isConnected():
-            raise RuntimeError("ibkr_not_connected")
+    async def _close_position(self, symbol: str, qty: Optional[float] = None, client_order_id: str = "") -> None:
+        self._require_connected()
         symbol = symbol.upper()
 
         # Cancel protective orders first to avoid accidental re-opening / shorting.
-        self._cancel_open_orders_for_symbol(symbol)
+        await self._cancel_open_orders_for_symbol(symbol)
 
-        positions = {p.symbol.upper(): p for p in self.list_positions()}
+        positions = {p.symbol.upper(): p for p in await self._list_positions()}
         pos = positions.get(symbol)
         if not pos:
             return
         q = int(qty) if qty is not None else int(pos.qty)
         if q <= 0:
             return
-        contract = Stock(symbol, "SMART", "USD")
-        self.ib.qualifyContracts(contract)
+        contract = (await self._qualify([symbol])).get(symbol)
+        if contract is None:
+            raise RuntimeError(f"ibkr_unknown_contract sym={symbol}")
         order = MarketOrder("SELL", q)
         if client_order_id:
             order.orderRef = client_order_id[:32]
         trade = self.ib.placeOrder(contract, order)
-        self.ib.sleep(0.5)
+        await asyncio.sleep(0.5)
         if trade.orderStatus.status in ("Cancelled", "Inactive"):
             raise RuntimeError(f"ibkr_close_failed status={trade.orderStatus.status}")
 
         # Best-effort: cancel any remaining orders for the symbol.
-        self._cancel_open_orders_for_symbol(symbol)
+        await self._cancel_open_orders_for_symbol(symbol)
+
+    async def _fill_time_ms(self, client_order_id: str) -> Optional[int]:
+        ref = client_order_id[:32]
+        times = [f.time for f in self.ib.fills() if f.execution.orderRef == ref and f.time]
+        return int(max(times).timestamp() * 1000) if times else None
 
-    def _cancel_open_orders_for_symbol(self, symbol: str) -> None:
+    async def _cancel_open_orders_for_symbol(self, symbol: str) -> None:
         """Cancel all open orders/trades for the given symbol."""
         try:
             symbol = symbol.upper()
-            self._ensure_connected()
             if not self.ib.isConnected():
                 return
             for tr in list(self.ib.openTrades() or []):
@@ -249,6 +511,6 @@ class IBKRBroker(Broker):
                     self.ib.cancelOrder(tr.order)
                 except Exception:
                     continue
-            self.ib.sleep(0.1)
+            await asyncio.sleep(0.1)
         except Exception:
             return
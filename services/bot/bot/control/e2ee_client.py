@@ -2,7 +2,8 @@
 E2EE Client for Bot
 
 Handles X25519 key exchange and AES-GCM encryption for secure
-app-bot communication.
+app-bot communication. Envelopes are v1 (single message) or v2
+(batched, optionally compressed); both are accepted on receive.
 """
 
 from __future__ import annotations
@@ -14,18 +15,34 @@ import logging
 import os
 import secrets
 import time
+import zlib
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
-
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 import requests
 
+from bot.settings import runtime_settings
+
+# `cryptography` is imported where keys are actually used, so an unpaired bot
+# (and anything importing BotMessages) does not pay for it at startup.
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
 log = logging.getLogger("bot.e2ee")
 
+# Envelope versions:
+# - v1: one JSON message per envelope, uncompressed.
+# - v2: a JSON *list* of messages per envelope, zlib-compressed above a size
+#   threshold. The codec is bound to the ciphertext as AES-GCM associated data.
+ENVELOPE_V1 = 1
+ENVELOPE_V2 = 2
+
+_JSON_SEPARATORS = (",", ":")
+
+
+def _v2_aad(codec: str) -> bytes:
+    return f"thecouncilai-e2ee-v2:{codec}".encode()
+
 
 @dataclass
 class E2EEConfig:
@@ -67,9 +84,17 @@ class E2EEClient:
     def __init__(self):
         self.config = self._load_config()
         self._shared_secret: Optional[bytes] = None
+        self._aead: Optional["AESGCM"] = None
         
         if self.config.shared_secret_b64:
-            self._shared_secret = base64.b64decode(self.config.shared_secret_b64)
+            self._set_shared_secret(base64.b64decode(self.config.shared_secret_b64))
+    
+    def _set_shared_secret(self, secret: bytes) -> None:
+        # AESGCM key setup is not free; build the context once per secret.
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        self._shared_secret = secret
+        self._aead = AESGCM(secret)
     
     def _load_config(self) -> E2EEConfig:
         """Load E2EE config from file."""
@@ -92,6 +117,9 @@ class E2EEClient:
         Generate X25519 key pair.
         Returns public key as base64.
         """
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+
         private_key = X25519PrivateKey.generate()
         public_key = private_key.public_key()
         
@@ -117,6 +145,10 @@ class E2EEClient:
         Derive shared secret from app's public key.
         Uses X25519 key exchange + HKDF.
         """
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
         if not self.config.private_key_b64:
             raise ValueError("No private key - call generate_keypair first")
         
@@ -139,7 +171,7 @@ class E2EEClient:
         )
         derived_key = hkdf.derive(shared_key)
         
-        self._shared_secret = derived_key
+        self._set_shared_secret(derived_key)
         self.config.shared_secret_b64 = base64.b64encode(derived_key).decode()
         self.config.app_public_key_b64 = app_public_key_b64
         self.config.paired = True
@@ -152,34 +184,82 @@ class E2EEClient:
         Encrypt message using AES-256-GCM.
         Returns envelope with nonce and ciphertext.
         """
-        if not self._shared_secret:
+        if not self._aead:
             raise ValueError("Not paired - no shared secret")
         
         nonce = secrets.token_bytes(12)
-        aesgcm = AESGCM(self._shared_secret)
+        plaintext_bytes = json.dumps(plaintext, separators=_JSON_SEPARATORS).encode()
+        ciphertext = self._aead.encrypt(nonce, plaintext_bytes, None)
+        
+        return {
+            "v": ENVELOPE_V1,
+            "nonce_b64": base64.b64encode(nonce).decode(),
+            "ciphertext_b64": base64.b64encode(ciphertext).decode(),
+            "ts": int(time.time() * 1000),
+        }
+    
+    def encrypt_batch(self, messages: List[Dict[str, Any]], compress_min_bytes: int = 512) -> Dict[str, Any]:
+        """
+        Encrypt several messages into a single v2 envelope.
+        Payloads of at least `compress_min_bytes` are zlib-compressed first.
+        """
+        if not self._aead:
+            raise ValueError("Not paired - no shared secret")
         
-        plaintext_bytes = json.dumps(plaintext).encode()
-        ciphertext = aesgcm.encrypt(nonce, plaintext_bytes, None)
+        payload = json.dumps(messages, separators=_JSON_SEPARATORS).encode()
+        codec = "none"
+        if compress_min_bytes >= 0 and len(payload) >= compress_min_bytes:
+            packed = zlib.compress(payload, 6)
+            if len(packed) < len(payload):
+                payload = packed
+                codec = "zlib"
+        
+        nonce = secrets.token_bytes(12)
+        ciphertext = self._aead.encrypt(nonce, payload, _v2_aad(codec))
         
         return {
-            "v": 1,
+            "v": ENVELOPE_V2,
+            "c": codec,
+            "n": len(messages),
             "nonce_b64": base64.b64encode(nonce).decode(),
             "ciphertext_b64": base64.b64encode(ciphertext).decode(),
             "ts": int(time.time() * 1000),
         }
     
     def decrypt(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
-        """Decrypt message from envelope."""
-        if not self._shared_secret:
+        """Decrypt a single message from envelope (v1, or v2 carrying one message)."""
+        messages = self.decrypt_batch(envelope)
+        if len(messages) != 1:
+            raise ValueError(f"envelope carries {len(messages)} messages - use decrypt_batch")
+        return messages[0]
+    
+    def decrypt_batch(self, envelope: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Decrypt all messages from a v1 or v2 envelope."""
+        if not self._aead:
             raise ValueError("Not paired - no shared secret")
         
         nonce = base64.b64decode(envelope["nonce_b64"])
         ciphertext = base64.b64decode(envelope["ciphertext_b64"])
+        version = int(envelope.get("v", ENVELOPE_V1))
         
-        aesgcm = AESGCM(self._shared_secret)
-        plaintext_bytes = aesgcm.decrypt(nonce, ciphertext, None)
+        if version == ENVELOPE_V1:
+            plaintext_bytes = self._aead.decrypt(nonce, ciphertext, None)
+            return [json.loads(plaintext_bytes.decode())]
         
-        return json.loads(plaintext_bytes.decode())
+        if version != ENVELOPE_V2:
+            raise ValueError(f"unsupported envelope version: {version}")
+        
+        codec = str(envelope.get("c") or "none")
+        payload = self._aead.decrypt(nonce, ciphertext, _v2_aad(codec))
+        if codec == "zlib":
+            payload = zlib.decompress(payload)
+        elif codec != "none":
+            raise ValueError(f"unsupported envelope codec: {codec}")
+        
+        data = json.loads(payload.decode())
+        if isinstance(data, dict):
+            return [data]
+        return [m for m in data if isinstance(m, dict)]
     
     @property
     def is_paired(self) -> bool:
@@ -208,6 +288,24 @@ class E2EEMessenger:
         self.pb_token = pb_token
         self.client = E2EEClient()
         self._last_message_id: Optional[str] = None
+        self._outgoing: List[Dict[str, Any]] = []
+        
+        # "auto": switch to v2 once the app has sent us a v2 envelope.
+        cfg = runtime_settings()
+        self._v2_mode = cfg.e2ee_envelope_v2
+        self._peer_v2 = False
+        self.compress_min_bytes = cfg.e2ee_compress_min_bytes
+        
+        # Wire accounting (envelope JSON bytes actually POSTed).
+        self.stats: Dict[str, int] = {"requests": 0, "bytes": 0, "messages": 0}
+    
+    @property
+    def use_v2(self) -> bool:
+        if self._v2_mode == "on":
+            return True
+        if self._v2_mode == "off":
+            return False
+        return self._peer_v2
     
     def _headers(self) -> Dict[str, str]:
         return {"Authorization": f"Bearer {self.pb_token}"}
@@ -259,16 +357,46 @@ class E2EEMessenger:
     
     def send(self, message: Dict[str, Any]) -> bool:
         """Send encrypted message to app."""
+        return self.send_batch([message])
+    
+    def send_batch(self, messages: List[Dict[str, Any]]) -> bool:
+        """Send several messages; one POST with a v2 envelope, else one POST each."""
         if not self.client.is_paired:
             raise ValueError("Not paired")
+        if not messages:
+            return True
         
-        envelope = self.client.encrypt(message)
+        if self.use_v2:
+            envelope = self.client.encrypt_batch(messages, compress_min_bytes=self.compress_min_bytes)
+            return self._post_envelope(envelope, len(messages))
+        
+        ok = True
+        for message in messages:
+            ok = self._post_envelope(self.client.encrypt(message), 1) and ok
+        return ok
+    
+    def queue(self, message: Dict[str, Any]) -> None:
+        """Queue a message for the next `flush()`."""
+        self._outgoing.append(message)
+    
+    def flush(self) -> bool:
+        """Send all queued messages together."""
+        if not self._outgoing:
+            return True
+        batch, self._outgoing = self._outgoing, []
+        return self.send_batch(batch)
+    
+    def _post_envelope(self, envelope: Dict[str, Any], count: int) -> bool:
+        body = json.dumps({"envelope": envelope}, separators=_JSON_SEPARATORS).encode()
+        self.stats["requests"] += 1
+        self.stats["bytes"] += len(body)
+        self.stats["messages"] += count
         
         try:
             r = requests.post(
                 f"{self.control_url}/control/e2ee/send/bot",
-                headers=self._headers(),
-                json={"envelope": envelope},
+                headers={**self._headers(), "Content-Type": "application/json"},
+                data=body,
                 timeout=10,
             )
             return r.status_code == 200
@@ -302,8 +430,11 @@ class E2EEMessenger:
             for msg in data.get("messages", []):
                 self._last_message_id = msg.get("id")
                 try:
-                    decrypted = self.client.decrypt(msg.get("envelope", {}))
-                    messages.append(decrypted)
+                    envelope = msg.get("envelope", {})
+                    messages.extend(self.client.decrypt_batch(envelope))
+                    if int(envelope.get("v", ENVELOPE_V1)) >= ENVELOPE_V2 and not self._peer_v2:
+                        self._peer_v2 = True
+                        log.info("e2ee_peer_v2: app supports batched envelopes")
                 except Exception as e:
                     log.warning("e2ee_decrypt_failed: %s", e)
             
@@ -358,11 +489,21 @@ class BotMessages:
         }
     
     @staticmethod
-    def trade_history(trades: List[Dict]) -> Dict[str, Any]:
+    def trade_history(trades: List[Dict], next_cursor: Optional[str] = None) -> Dict[str, Any]:
         return {
             "type": "trade_history",
             "ts": int(time.time() * 1000),
             "trades": trades,
+            "next_cursor": next_cursor,
+        }
+    
+    @staticmethod
+    def pnl_summary(daily: List[Dict], by_symbol: List[Dict]) -> Dict[str, Any]:
+        return {
+            "type": "pnl_summary",
+            "ts": int(time.time() * 1000),
+            "daily": daily,
+            "by_symbol": by_symbol,
         }
     
     @staticmethod
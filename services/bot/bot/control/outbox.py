@@ -0,0 +1,111 @@
+"""
+Background delivery of the trade-event outbox to the app.
+
+`log_trade` queues events in the `outbox` table inside the trade's own
+transaction; this sender drains it off the order path. Due events go out
+oldest first, batched into one E2EE envelope, and are deleted only after
+the control plane accepts them. A failed batch is retried with exponential
+backoff (jittered, capped), so events survive control-plane outages and
+restarts. Delivery is at-least-once; each message carries `event_id`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from bot.storage.trades_db import (
+    OUTBOX_MAX_AGE_MS,
+    outbox_backlog,
+    outbox_delivered,
+    outbox_due,
+    outbox_prune,
+    outbox_retry,
+)
+
+if TYPE_CHECKING:
+    from bot.control.e2ee_client import E2EEMessenger
+
+log = logging.getLogger("bot.outbox")
+
+_IDLE_S = 1.0
+_BASE_BACKOFF_S = 2.0
+_PRUNE_EVERY_S = 3600.0
+
+
+class OutboxSender:
+    def __init__(self, messenger: "E2EEMessenger", batch_max: int = 50, max_backoff_s: float = 300.0):
+        self.messenger = messenger
+        self.batch_max = max(1, int(batch_max))
+        self.max_backoff_s = max(_BASE_BACKOFF_S, float(max_backoff_s))
+        self._last_prune = 0.0
+        self.stats: Dict[str, Any] = {
+            "delivered": 0,
+            "batches": 0,
+            "failures": 0,
+            "dropped": 0,
+            "pending": 0,
+            "oldest_pending_s": None,
+            "last_error": None,
+        }
+
+    def _backoff_s(self, attempts: int) -> float:
+        return min(self.max_backoff_s, _BASE_BACKOFF_S * (2 ** min(attempts, 16))) * random.uniform(0.8, 1.2)
+
+    def deliver_once(self) -> int:
+        """Send one batch of due events (blocking); returns how many were delivered."""
+        now = time.time()
+        if now - self._last_prune >= _PRUNE_EVERY_S:
+            self._last_prune = now
+            dropped = outbox_prune(int(now * 1000) - OUTBOX_MAX_AGE_MS)
+            if dropped:
+                self.stats["dropped"] += dropped
+                log.warning("outbox_expired dropped=%d", dropped)
+
+        due = outbox_due(self.batch_max)
+        if not due:
+            return 0
+        ids = [row_id for row_id, _, _ in due]
+        err: Optional[str] = None
+        try:
+            if not self.messenger.send_batch([msg for _, _, msg in due]):
+                err = "send_failed"
+        except Exception as e:
+            err = str(e) or type(e).__name__
+
+        if err is None:
+            outbox_delivered(ids)
+            self.stats["delivered"] += len(ids)
+            self.stats["batches"] += 1
+            return len(ids)
+
+        # One schedule for the batch, driven by its most-retried event.
+        attempts = max(a for _, a, _ in due)
+        delay = self._backoff_s(attempts)
+        outbox_retry(ids, int((time.time() + delay) * 1000), err)
+        self.stats["failures"] += 1
+        self.stats["last_error"] = err
+        log.warning("outbox_send_failed events=%d attempts=%d retry_s=%.0f err=%s", len(ids), attempts + 1, delay, err)
+        return 0
+
+    def _refresh_backlog(self) -> None:
+        pending, oldest = outbox_backlog()
+        self.stats["pending"] = pending
+        self.stats["oldest_pending_s"] = round(time.time() - oldest / 1000.0, 1) if oldest is not None else None
+
+    async def run(self, health: Optional[Dict[str, Any]] = None) -> None:
+        """Drain the outbox forever; `health` (if given) receives `stats` as `outbox`."""
+        while True:
+            try:
+                sent = await asyncio.to_thread(self.deliver_once)
+                await asyncio.to_thread(self._refresh_backlog)
+            except Exception as e:
+                sent = 0
+                log.warning("outbox_error err=%s", e)
+            if health is not None:
+                health["outbox"] = dict(self.stats)
+            # A full batch means more may be due; otherwise poll at the idle rate.
+            await asyncio.sleep(0 if sent >= self.batch_max else _IDLE_S)
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import json
 import os
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
 
@@ -50,6 +51,51 @@ class PocketBaseClient:
             raise RuntimeError(f"pb_update_me_failed status={r.status_code} body={r.text[:200]}")
         return r.json()
 
+    def realtime_events(self, topics: List[str], read_timeout: float = 330.0) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Blocking iterator over PocketBase realtime (SSE) events for `topics`.
+
+        Subscribes as soon as the server sends `PB_CONNECT`, then yields
+        `(event_name, data)` for every event. PocketBase drops idle clients after
+        a few minutes; the iterator then ends (or raises) and callers reconnect.
+        """
+        url = f"{self.base_url}/api/realtime"
+        with requests.get(url, stream=True, timeout=(10, read_timeout), headers={"Accept": "text/event-stream"}) as r:
+            if r.status_code != 200:
+                raise RuntimeError(f"pb_realtime_failed status={r.status_code}")
+            event = ""
+            data_lines: List[str] = []
+            # chunk_size=1: SSE events are small and must not wait for a full buffer.
+            for line in r.iter_lines(chunk_size=1, decode_unicode=True):
+                if line is None:
+                    continue
+                if line == "":
+                    if data_lines:
+                        try:
+                            data = json.loads("\n".join(data_lines))
+                        except ValueError:
+                            data = {}
+                        if event == "PB_CONNECT":
+                            self._realtime_subscribe(str(data.get("clientId") or ""), topics)
+                        yield event, data if isinstance(data, dict) else {}
+                    event, data_lines = "", []
+                    continue
+                if line.startswith(":"):
+                    continue
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data_lines.append(value)
+
+    def _realtime_subscribe(self, client_id: str, topics: List[str]) -> None:
+        if not client_id:
+            raise RuntimeError("pb_realtime_no_client_id")
+        url = f"{self.base_url}/api/realtime"
+        r = requests.post(url, headers=self._auth_headers(), json={"clientId": client_id, "subscriptions": topics}, timeout=15)
+        if r.status_code not in (200, 204):
+            raise RuntimeError(f"pb_realtime_subscribe_failed status={r.status_code} body={r.text[:200]}")
+
     def _auth_headers(self) -> Dict[str, str]:
         if not self.token:
             return {}
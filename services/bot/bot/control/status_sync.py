@@ -0,0 +1,184 @@
+"""
+Delta-encoded status updates for the app.
+
+The status document is the `status_response` payload with `positions` keyed
+by symbol. The bot sends a full keyframe (`status_response` with `seq`)
+periodically and on `status_request`; in between it sends `status_delta`
+messages: an RFC 7386 merge patch from the last state the app acknowledged
+(`status_ack` with that `seq`) to the current one. Because every delta is
+relative to an acknowledged base, a lost delta costs nothing: the next one
+carries the same changes. The app keeps the last few documents by `seq` and
+applies a delta to `base`; if it lacks the base it sends `status_request`.
+
+Until the app acknowledges something it gets keyframes only (older apps
+ignore `seq`). Sampling adapts: a change resets the interval to the minimum,
+each unchanged sample doubles it up to the maximum, and nothing is sent
+while idle. A trade samples immediately.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+log = logging.getLogger("bot.status")
+
+# Fields that change on every sample and are not part of the diffed document.
+_VOLATILE = ("type", "ts", "uptime_seconds", "seq", "keyframe")
+# Sent documents kept for a late ack.
+_SENT_WINDOW = 32
+# The fixed full-status cadence this replaces, for the savings estimate.
+_BASELINE_INTERVAL_S = 30.0
+
+_JSON_SEPARATORS = (",", ":")
+
+
+def status_document(status: Dict[str, Any]) -> Dict[str, Any]:
+    """The diffable part of a `status_response`: positions keyed by symbol."""
+    doc = {k: v for k, v in status.items() if k not in _VOLATILE}
+    doc["positions"] = {
+        str(p.get("symbol")): {k: v for k, v in p.items() if k != "symbol"}
+        for p in status.get("positions") or []
+    }
+    return doc
+
+
+def merge_patch(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """RFC 7386 patch turning `old` into `new` (`None` removes a key)."""
+    patch: Dict[str, Any] = {}
+    for k, v in new.items():
+        if k not in old:
+            patch[k] = v
+        elif isinstance(v, dict) and isinstance(old[k], dict):
+            sub = merge_patch(old[k], v)
+            if sub:
+                patch[k] = sub
+        elif old[k] != v:
+            patch[k] = v
+    for k in old:
+        if k not in new:
+            patch[k] = None
+    return patch
+
+
+def _size(message: Dict[str, Any]) -> int:
+    return len(json.dumps(message, separators=_JSON_SEPARATORS))
+
+
+class StatusSync:
+    """Decides when to sample the status and what (if anything) to send."""
+
+    def __init__(self, keyframe_s: float = 600.0, min_interval_s: float = 5.0, max_interval_s: float = 120.0):
+        self.keyframe_s = keyframe_s
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max(min_interval_s, max_interval_s)
+
+        self._seq = 0
+        self._sent: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._last: Optional[Dict[str, Any]] = None  # last document sent
+        self._acked: Optional[Dict[str, Any]] = None
+        self._acked_seq = 0
+        self._keyframe_at = 0.0
+        self._resync = True
+
+        self.interval_s = min_interval_s
+        self._next_sample = 0.0
+        self._started = time.time()
+        self.stats: Dict[str, int] = {
+            "samples": 0,
+            "keyframes": 0,
+            "deltas": 0,
+            "idle": 0,
+            "acks": 0,
+            "bytes": 0,
+            "full_bytes": 0,  # size of the full status at every sample that sent something
+        }
+
+    # --- app messages ------------------------------------------------------------
+
+    def resync(self) -> None:
+        """The app asked for the full status (`status_request`)."""
+        self._resync = True
+        self._next_sample = 0.0
+
+    def ack(self, seq: Any) -> None:
+        try:
+            seq = int(seq)
+        except (TypeError, ValueError):
+            return
+        doc = self._sent.get(seq)
+        if doc is None or seq <= self._acked_seq:
+            return
+        self._acked, self._acked_seq = doc, seq
+        while self._sent and next(iter(self._sent)) < seq:
+            self._sent.popitem(last=False)
+        self.stats["acks"] += 1
+
+    # --- sampling ------------------------------------------------------------------
+
+    def due(self, now: Optional[float] = None, traded: bool = False) -> bool:
+        now = time.time() if now is None else now
+        return traded or self._resync or now >= self._next_sample or now - self._keyframe_at >= self.keyframe_s
+
+    def build(self, status: Dict[str, Any], now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Message to send for a fresh `status_response` sample, or None when idle."""
+        now = time.time() if now is None else now
+        st = self.stats
+        st["samples"] += 1
+        doc = status_document(status)
+        changed = doc != self._last
+
+        # Back off while nothing changes; any change returns to the fast cadence.
+        self.interval_s = self.min_interval_s if changed else min(self.max_interval_s, self.interval_s * 2)
+        self._next_sample = now + self.interval_s
+
+        periodic = now - self._keyframe_at >= self.keyframe_s
+        if not (changed or periodic or self._resync):
+            st["idle"] += 1
+            return None
+
+        keyframe = self._resync or periodic or self._acked is None
+        self._seq += 1
+        if keyframe:
+            msg = dict(status, seq=self._seq, keyframe=True)
+            self._keyframe_at = now
+            self._resync = False
+            st["keyframes"] += 1
+            full = _size(msg)
+        else:
+            assert self._acked is not None
+            msg = {
+                "type": "status_delta",
+                "ts": int(now * 1000),
+                "seq": self._seq,
+                "base": self._acked_seq,
+                "patch": merge_patch(self._acked, doc),
+            }
+            st["deltas"] += 1
+            full = _size(dict(status, seq=self._seq))
+        self._sent[self._seq] = doc
+        while len(self._sent) > _SENT_WINDOW:
+            self._sent.popitem(last=False)
+        self._last = doc
+        st["bytes"] += _size(msg)
+        st["full_bytes"] += full
+        return msg
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        st = self.stats
+        hours = max(1e-6, (now - self._started) / 3600.0)
+        sent = st["keyframes"] + st["deltas"]
+        avg_full = st["full_bytes"] / sent if sent else 0.0
+        baseline_requests = 3600.0 / _BASELINE_INTERVAL_S
+        return {
+            **st,
+            "seq": self._seq,
+            "acked_seq": self._acked_seq,
+            "interval_s": self.interval_s,
+            "per_hour": {"requests": round(sent / hours, 1), "bytes": round(st["bytes"] / hours)},
+            "baseline_per_hour": {"requests": baseline_requests, "bytes": round(avg_full * baseline_requests)},
+        }
@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import threading
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from bot.control.pocketbase import PocketBaseClient
+from bot.settings import runtime_settings
 
 log = logging.getLogger("bot.usercfg")
 
@@ -20,23 +22,65 @@ class UserConfig:
 
 
 class UserConfigWatcher:
+    """Keeps `latest` in sync with the user's PocketBase record.
+
+    Primary path is a realtime (SSE) subscription on `users/<id>`, consumed by a
+    daemon thread so the event loop never blocks on the stream. Polling stays as
+    a fallback: every `poll_seconds` while realtime is down, and a slow safety
+    poll while it is up. The auth token is refreshed periodically.
+    """
+
     def __init__(self, pb: PocketBaseClient, fallback_risk_profile: str = "balanced"):
         self.pb = pb
         self.fallback_risk_profile = fallback_risk_profile
         self.latest: UserConfig = UserConfig(risk_profile=fallback_risk_profile)
         self._last_fetch_ms: int = 0
+        self._listeners: List[Callable[[UserConfig], None]] = []
+
+        cfg = runtime_settings()
+        self.poll_seconds = cfg.usercfg_poll_seconds
+        self.safety_poll_seconds = cfg.usercfg_safety_poll_seconds
+        self.token_refresh_seconds = cfg.pb_token_refresh_seconds
+        self.realtime_enabled = cfg.usercfg_realtime
+
+        self._realtime_ok = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._token_lock = threading.Lock()
+
+    @property
+    def realtime_ok(self) -> bool:
+        return self._realtime_ok
+
+    def add_listener(self, cb: Callable[[UserConfig], None]) -> None:
+        """Register a callback invoked (on the event loop) whenever the config changes."""
+        self._listeners.append(cb)
 
     async def run(self) -> None:
-        interval = 10
-        while True:
-            try:
-                self.refresh()
-            except Exception as e:
-                log.warning("user_config_refresh_failed err=%s", e)
-            await asyncio.sleep(interval)
+        self._loop = asyncio.get_running_loop()
+        if self.realtime_enabled:
+            threading.Thread(target=self._realtime_thread, name="pb-realtime", daemon=True).start()
+
+        refresh_task = asyncio.create_task(self._token_refresh_loop())
+        try:
+            last_poll = 0.0
+            while True:
+                interval = self.safety_poll_seconds if self._realtime_ok else self.poll_seconds
+                if time.monotonic() - last_poll >= interval:
+                    try:
+                        await asyncio.to_thread(self.refresh)
+                    except Exception as e:
+                        log.warning("user_config_refresh_failed err=%s", e)
+                    last_poll = time.monotonic()
+                await asyncio.sleep(1.0)
+        finally:
+            refresh_task.cancel()
 
     def refresh(self) -> None:
-        rec = self.pb.get_me()
+        with self._token_lock:
+            rec = self.pb.get_me()
+        self._apply(rec)
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
         rp = (rec.get("risk_profile") or rec.get("bot_risk_profile") or self.fallback_risk_profile)
         panic = bool(rec.get("panic") or rec.get("bot_panic") or False)
         paired = rec.get("bot_paired")
@@ -44,10 +88,67 @@ class UserConfigWatcher:
             paired = True  # backwards compatibility
         mode = (rec.get("trade_mode") or rec.get("bot_trade_mode") or "paper")
 
-        self.latest = UserConfig(
+        cfg = UserConfig(
             risk_profile=str(rp),
             panic=panic,
             bot_paired=bool(paired),
             trade_mode=str(mode),
         )
+        changed = cfg != self.latest
+        self.latest = cfg
         self._last_fetch_ms = int(time.time() * 1000)
+
+        if changed:
+            log.info("user_config_changed profile=%s panic=%s paired=%s", cfg.risk_profile, cfg.panic, cfg.bot_paired)
+            self._notify(cfg)
+
+    def _notify(self, cfg: UserConfig) -> None:
+        loop = self._loop
+        for cb in list(self._listeners):
+            try:
+                if loop is not None and loop.is_running():
+                    loop.call_soon_threadsafe(cb, cfg)
+                else:
+                    cb(cfg)
+            except Exception as e:
+                log.debug("user_config_listener_failed err=%s", e)
+
+    async def _token_refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.token_refresh_seconds)
+            try:
+                await asyncio.to_thread(self._refresh_token)
+            except Exception as e:
+                log.warning("pb_token_refresh_failed err=%s", e)
+
+    def _refresh_token(self) -> None:
+        with self._token_lock:
+            self.pb.auth_refresh()
+        log.info("pb_token_refreshed")
+
+    def _realtime_thread(self) -> None:
+        backoff = 2.0
+        while True:
+            topic = f"users/{self.pb.user_id}"
+            try:
+                for event, data in self.pb.realtime_events([topic]):
+                    if event == "PB_CONNECT":
+                        self._realtime_ok = True
+                        backoff = 2.0
+                        log.info("pb_realtime_connected topic=%s", topic)
+                        continue
+                    if event != topic:
+                        continue
+                    rec = data.get("record")
+                    if isinstance(rec, dict):
+                        self._apply(rec)
+            except Exception as e:
+                log.warning("pb_realtime_failed err=%s", e)
+                if "status=401" in str(e) or "status=403" in str(e):
+                    try:
+                        self._refresh_token()
+                    except Exception as re:
+                        log.warning("pb_token_refresh_failed err=%s", re)
+            self._realtime_ok = False
+            time.sleep(backoff)
+            backoff = min(60.0, backoff * 1.8)
@@ -0,0 +1,6 @@
+"""Local stand-ins for load and latency testing (not used by the running bot).
+
+- `fake_centrifugo`: Centrifugo WS + Brain `/snapshot` subset the feed speaks.
+- `sim_broker`: in-memory broker with configurable fill latency.
+- `harness`: end-to-end measurements (`python -m bot.devtools.harness`).
+"""
@@ -0,0 +1,362 @@
+"""Local stand-in for Centrifugo (`signals:delta`) and Brain API `/snapshot`.
+
+Serves both on one port: HTTP `GET /snapshot` and a WebSocket on any other
+path, speaking only the subset of the Centrifugo JSON protocol the bot uses
+(connect reply with history recovery + `push.pub` publications). Deltas are synthesised as a random
+walk over a fixed universe, or replayed from a JSONL file of `{e, t, d}`
+payloads. Faults can be injected at runtime: dropped connections, epoch
+jumps, slow or failing snapshots.
+
+Runs on its own thread and event loop so a harness in the same process does
+not share a loop with it:
+
+    python -m bot.devtools.fake_centrifugo --port 8765 --symbols 3000 --rate 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import http
+import json
+import logging
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import websockets
+
+log = logging.getLogger("bot.devtools.centrifugo")
+
+_SEPARATORS = (",", ":")
+
+
+def _symbols(n: int) -> List[str]:
+    return [f"S{i:05d}" for i in range(n)]
+
+
+class FakeSignalServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        symbols: int = 500,
+        rate: float = 10.0,
+        delta_size: int = 20,
+        score_range: Tuple[int, int] = (20, 69),
+        channel: str = "signals:delta",
+        replay: Optional[Path] = None,
+        seed: int = 1,
+        history: int = 1000,
+    ):
+        self.host = host
+        self.port = int(port)
+        self.rate = float(rate)
+        self.delta_size = max(1, int(delta_size))
+        self.score_range = score_range
+        self.channel = channel
+        self.replay = replay
+
+        self._rng = random.Random(seed)
+        self.universe = _symbols(symbols)
+        lo, hi = score_range
+        self.scores: Dict[str, int] = {s: self._rng.randint(lo, hi) for s in self.universe}
+        self.epoch = 1
+        self.offset = 0
+        # Channel history for recovery: last `history` publications of stream `stream_epoch`.
+        self.stream_epoch = "s1"
+        self.history: "collections.deque[Dict[str, Any]]" = collections.deque(maxlen=max(0, int(history)))
+
+        # Fault injection
+        self.snapshot_delay_s = 0.0
+        self.snapshot_fail = False
+
+        self.stats = {"connects": 0, "published": 0, "dropped": 0, "snapshots": 0, "recovered": 0, "recover_failed": 0}
+
+        self._clients: Set[Any] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Any = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._replay_iter: Optional[Iterator[Dict[str, Any]]] = None
+
+    # --- lifecycle --------------------------------------------------------------
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/connection/websocket"
+
+    @property
+    def brain_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "FakeSignalServer":
+        self._thread = threading.Thread(target=self._main, name="fake-centrifugo", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+
+        async def _shutdown() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        try:
+            self._call(_shutdown).result(timeout=5)
+        except Exception as e:
+            log.debug("fake_centrifugo_shutdown_failed err=%s", e)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _main(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._server = loop.run_until_complete(
+            websockets.serve(self._handle, self.host, self.port, process_request=self._http, ping_interval=None)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        loop.create_task(self._publisher())
+        self._ready.set()
+        loop.run_forever()
+
+    def _call(self, fn: Any, *args: Any) -> "concurrent.futures.Future[Any]":
+        assert self._loop is not None
+        return asyncio.run_coroutine_threadsafe(fn(*args), self._loop)
+
+    # --- protocol ---------------------------------------------------------------
+
+    async def _http(self, path: str, _headers: Any) -> Optional[Tuple[http.HTTPStatus, List[Tuple[str, str]], bytes]]:
+        if not path.startswith("/snapshot"):
+            return None  # continue with the WebSocket handshake
+        self.stats["snapshots"] += 1
+        if self.snapshot_delay_s:
+            await asyncio.sleep(self.snapshot_delay_s)
+        if self.snapshot_fail:
+            return http.HTTPStatus.SERVICE_UNAVAILABLE, [], b"unavailable"
+        body = json.dumps(
+            {"e": self.epoch, "t": int(time.time() * 1000), "m": [[s, sc] for s, sc in self.scores.items()]},
+            separators=_SEPARATORS,
+        ).encode()
+        return http.HTTPStatus.OK, [("Content-Type", "application/json")], body
+
+    async def _handle(self, ws: Any) -> None:
+        try:
+            raw = await ws.recv()
+            msg = json.loads(raw)
+            if "connect" not in msg:
+                await ws.close(code=3501, reason="bad request")
+                return
+            want = (msg["connect"].get("subs") or {}).get(self.channel)
+            await ws.send(json.dumps({
+                "id": msg.get("id", 1),
+                "connect": {
+                    "client": f"fake-{self.stats['connects']}",
+                    "version": "fake",
+                    "subs": {self.channel: self._sub_reply(want)},
+                },
+            }, separators=_SEPARATORS))
+            self.stats["connects"] += 1
+            self._clients.add(ws)
+            async for _ in ws:
+                pass  # pongs and anything else are ignored
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._clients.discard(ws)
+
+    def _sub_reply(self, want: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"recoverable": True, "epoch": self.stream_epoch, "offset": self.offset}
+        if not want or not want.get("recover"):
+            return out
+        # The reply and the client registration happen in one loop step, so
+        # nothing published in between can be missed or delivered twice.
+        since = int(want.get("offset") or 0)
+        oldest = self.history[0]["offset"] if self.history else self.offset + 1
+        ok = want.get("epoch") == self.stream_epoch and since + 1 >= oldest
+        out["was_recovering"] = True
+        out["recovered"] = ok
+        if ok:
+            out["publications"] = [p for p in self.history if p["offset"] > since]
+            self.stats["recovered"] += 1
+        else:
+            self.stats["recover_failed"] += 1
+        return out
+
+    def _frame(self, data: Dict[str, Any]) -> str:
+        self.offset += 1
+        pub = {"data": data, "offset": self.offset}
+        self.history.append(pub)
+        return json.dumps({"push": {"channel": self.channel, "pub": pub}}, separators=_SEPARATORS)
+
+    def _broadcast(self, updates: Dict[str, int], ts_ms: Optional[int] = None, epoch: Optional[int] = None) -> None:
+        self.scores.update(updates)
+        data = {
+            "e": self.epoch if epoch is None else epoch,
+            "t": int(time.time() * 1000) if ts_ms is None else ts_ms,
+            "d": [[s, sc] for s, sc in updates.items()],
+        }
+        websockets.broadcast(self._clients, self._frame(data))
+        self.stats["published"] += 1
+
+    def _next_delta(self) -> Tuple[Dict[str, int], Optional[int], Optional[int]]:
+        if self.replay is not None:
+            if self._replay_iter is None:
+                self._replay_iter = _read_replay(self.replay)
+            payload = next(self._replay_iter)
+            return {str(s): int(sc) for s, sc in payload.get("d") or []}, None, payload.get("e")
+        lo, hi = self.score_range
+        out: Dict[str, int] = {}
+        for sym in self._rng.sample(self.universe, min(self.delta_size, len(self.universe))):
+            out[sym] = max(lo, min(hi, self.scores[sym] + self._rng.randint(-3, 3)))
+        return out, None, None
+
+    async def _publisher(self) -> None:
+        # Sends however many deltas are due since the last wake-up, so high
+        # rates are not limited by sleep granularity.
+        sent = 0
+        started = time.monotonic()
+        rate = self.rate
+        while True:
+            if self.rate != rate:
+                rate, sent, started = self.rate, 0, time.monotonic()
+            if rate <= 0:
+                await asyncio.sleep(0.05)
+                continue
+            due = int((time.monotonic() - started) * rate) - sent
+            for _ in range(max(0, min(due, 10_000))):
+                self._broadcast(*self._next_delta())
+                sent += 1
+            await asyncio.sleep(min(0.01, 1.0 / rate))
+
+    # --- controls (thread-safe) --------------------------------------------------
+
+    def set_rate(self, rate: float) -> None:
+        self.rate = float(rate)
+
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def drop_connections(self) -> int:
+        """Close every client connection (as a Centrifugo restart would)."""
+
+        async def _drop() -> int:
+            clients = list(self._clients)
+            for ws in clients:
+                ws.transport.abort()
+            self.stats["dropped"] += len(clients)
+            return len(clients)
+
+        return self._call(_drop).result()
+
+    def reset_stream(self) -> str:
+        """Lose the channel history (a new stream epoch), so recovery fails."""
+
+        async def _reset() -> str:
+            self.history.clear()
+            self.stream_epoch = f"s{int(self.stream_epoch[1:]) + 1}"
+            self.offset = 0
+            return self.stream_epoch
+
+        return self._call(_reset).result()
+
+    def jump_epoch(self, reshuffle: bool = True) -> int:
+        """Start a new epoch; with `reshuffle`, scores and half the universe change."""
+
+        async def _jump() -> int:
+            self.epoch += 1
+            if reshuffle:
+                lo, hi = self.score_range
+                keep = self._rng.sample(self.universe, len(self.universe) // 2)
+                fresh = [f"E{self.epoch}_{i:04d}"[:12] for i in range(len(self.universe) - len(keep))]
+                self.universe = keep + fresh
+                self.scores = {s: self._rng.randint(lo, hi) for s in self.universe}
+            return self.epoch
+
+        return self._call(_jump).result()
+
+    def publish(self, updates: Dict[str, int]) -> float:
+        """Publish one delta now; returns the wall-clock send time (seconds)."""
+
+        async def _pub() -> float:
+            t = time.time()
+            self._broadcast(dict(updates), ts_ms=int(t * 1000))
+            return t
+
+        return self._call(_pub).result()
+
+    def burst(self, count: int, size: Optional[int] = None) -> Tuple[int, float]:
+        """Publish `count` deltas back to back; returns (count, seconds)."""
+
+        async def _burst() -> Tuple[int, float]:
+            saved = self.delta_size
+            if size is not None:
+                self.delta_size = max(1, int(size))
+            t0 = time.perf_counter()
+            try:
+                for i in range(count):
+                    self._broadcast(*self._next_delta())
+                    if i % 500 == 499:
+                        await asyncio.sleep(0)  # let the transport drain
+            finally:
+                self.delta_size = saved
+            return count, time.perf_counter() - t0
+
+        return self._call(_burst).result()
+
+
+def _read_replay(path: Path) -> Iterator[Dict[str, Any]]:
+    while True:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--symbols", type=int, default=3000)
+    ap.add_argument("--rate", type=float, default=10.0, help="deltas per second")
+    ap.add_argument("--delta-size", type=int, default=20, help="symbols per delta")
+    ap.add_argument("--history", type=int, default=1000, help="publications kept for recovery")
+    ap.add_argument("--replay", type=Path, help="JSONL of {e,t,d} payloads to replay instead of synthesising")
+    ap.add_argument("--flap-every", type=float, default=0.0, help="drop all connections every N seconds")
+    ap.add_argument("--epoch-every", type=float, default=0.0, help="jump to a new epoch every N seconds")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    srv = FakeSignalServer(
+        host=args.host, port=args.port, symbols=args.symbols, rate=args.rate,
+        delta_size=args.delta_size, replay=args.replay, history=args.history,
+    ).start()
+    log.info("fake_centrifugo_listening ws=%s brain=%s", srv.ws_url, srv.brain_url)
+
+    next_flap = time.monotonic() + args.flap_every if args.flap_every else None
+    next_epoch = time.monotonic() + args.epoch_every if args.epoch_every else None
+    try:
+        while True:
+            time.sleep(0.5)
+            now = time.monotonic()
+            if next_flap is not None and now >= next_flap:
+                log.info("drop_connections n=%d", srv.drop_connections())
+                next_flap = now + args.flap_every
+            if next_epoch is not None and now >= next_epoch:
+                log.info("epoch_jump epoch=%d", srv.jump_epoch())
+                next_epoch = now + args.epoch_every
+    except KeyboardInterrupt:
+        srv.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""End-to-end feed/engine measurements against the local stand-ins.
+
+Scenarios (all run in one process, the fake server on its own thread):
+
+- throughput: a back-to-back burst of deltas; time until the feed applied all.
+- recovery:   drop the WS connection under load; time to reconnect and to the
+              first delta applied afterwards, and how many of the deltas
+              published during the outage came back through stream recovery.
+- epoch:      jump the server to a new epoch; time until the feed adopts it and
+              how many symbols from the old epoch linger in the score map.
+- order:      publish a threshold crossing for a fresh symbol; time until the
+              engine's order reaches a simulated broker.
+
+Event-loop lag and blocking call sites over the whole run are under `loop`.
+
+    python -m bot.devtools.harness --symbols 3000 --burst 20000 --trials 10
+
+State is written to a throwaway directory unless BOT_STATE_DIR is set.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _summary(xs: List[float]) -> Dict[str, Optional[float]]:
+    if not xs:
+        return {"n": 0, "p50": None, "p95": None, "max": None}
+    s = sorted(xs)
+    return {
+        "n": len(s),
+        "p50": round(statistics.median(s), 4),
+        "p95": round(s[min(len(s) - 1, int(round(0.95 * (len(s) - 1))))], 4),
+        "max": round(s[-1], 4),
+    }
+
+
+async def _until(cond: Callable[[], bool], timeout: float, step: float = 0.002) -> Optional[float]:
+    """Seconds until `cond()` holds, or None on timeout."""
+    t0 = time.perf_counter()
+    while not cond():
+        if time.perf_counter() - t0 > timeout:
+            return None
+        await asyncio.sleep(step)
+    return time.perf_counter() - t0
+
+
+async def _start_feed(srv: Any) -> Any:
+    from bot.signals.feed import SignalFeed
+
+    # Long poll interval: only the startup snapshot, so versions count deltas.
+    feed = SignalFeed(brain_api_url=srv.brain_url, centrifugo_ws_url=srv.ws_url, centrifugo_token="", poll_seconds=3600)
+    feed._harness_task = asyncio.create_task(feed.run())  # type: ignore[attr-defined]
+    ok = await _until(lambda: feed.ws_ok and srv.client_count() > 0 and len(feed.scores) > 0, timeout=15)
+    if ok is None:
+        raise RuntimeError("feed did not connect to the fake server")
+    return feed
+
+
+async def scenario_throughput(srv: Any, feed: Any, count: int, size: int) -> Dict[str, Any]:
+    srv.set_rate(0)
+    await asyncio.sleep(0.2)
+    v0 = feed.version
+    t0 = time.perf_counter()
+    burst = asyncio.ensure_future(asyncio.to_thread(srv.burst, count, size))
+    done = await _until(lambda: feed.version - v0 >= count, timeout=120)
+    sent, send_s = await burst
+    elapsed = time.perf_counter() - t0
+    applied = feed.version - v0
+    return {
+        "deltas": sent,
+        "symbols_per_delta": size,
+        "applied": applied,
+        "complete": done is not None,
+        "seconds": round(elapsed, 3),
+        "server_send_seconds": round(send_s, 3),
+        "deltas_per_s": round(applied / elapsed, 1),
+        "symbol_updates_per_s": round(applied * size / elapsed, 1),
+    }
+
+
+async def scenario_recovery(srv: Any, feed: Any, flaps: int, rate: float) -> Dict[str, Any]:
+    srv.set_rate(rate)
+    reconnect: List[float] = []
+    first_delta: List[float] = []
+    missed = recovered = 0
+    for _ in range(flaps):
+        await asyncio.sleep(1.0)
+        connects = srv.stats["connects"]
+        published = srv.stats["published"]
+        before = sum(st["recovered_pubs"] for st in feed.endpoint_stats())
+        t0 = time.perf_counter()
+        srv.drop_connections()
+        t_conn = await _until(lambda: srv.stats["connects"] > connects, timeout=90, step=0.005)
+        if t_conn is None:
+            continue
+        reconnect.append(t_conn)
+        missed += srv.stats["published"] - published
+        v = feed.version
+        t_delta = await _until(lambda: feed.version > v, timeout=30)
+        if t_delta is not None:
+            first_delta.append(time.perf_counter() - t0)
+        recovered += sum(st["recovered_pubs"] for st in feed.endpoint_stats()) - before
+    return {
+        "flaps": flaps,
+        "rate": rate,
+        "reconnect_s": _summary(reconnect),
+        "first_delta_s": _summary(first_delta),
+        "missed_deltas": missed,
+        "recovered_deltas": recovered,
+        "recover_failed": srv.stats["recover_failed"],
+    }
+
+
+async def scenario_epoch(srv: Any, feed: Any, rate: float) -> Dict[str, Any]:
+    srv.set_rate(rate)
+    await asyncio.sleep(0.5)
+    new_epoch = srv.jump_epoch()
+    adopt = await _until(lambda: feed.epoch == new_epoch, timeout=30)
+    await asyncio.sleep(0.5)
+    current = set(srv.scores)
+    stale = sum(1 for s in list(feed.scores) if s not in current)
+    return {
+        "epoch": new_epoch,
+        "adopt_s": round(adopt, 4) if adopt is not None else None,
+        "stale_symbols": stale,
+        "feed_symbols": len(feed.scores),
+        "server_symbols": len(current),
+    }
+
+
+async def scenario_order(srv: Any, feed: Any, trials: int, confirm_s: int, broker_latency_s: float) -> Dict[str, Any]:
+    from bot.devtools.sim_broker import SimBroker
+    from bot.risk.profile import PROFILES
+    from bot.settings import runtime_settings
+    from bot.storage.trades_db import init_db
+    from bot.strategy.engine import BotEngine
+
+    init_db()
+    PROFILES["harness"] = replace(  # type: ignore[index]
+        PROFILES["aggressive"],
+        name="harness",  # type: ignore[arg-type]
+        entry_confirm_s=confirm_s,
+        max_positions=trials + 10,
+        max_weight_per_pos=0.02,
+        rotation_margin=100,
+    )
+    broker = SimBroker(latency_s=broker_latency_s)
+    engine = BotEngine(broker, feed, "harness", get_panic=lambda: False, get_profile=lambda: "harness")  # type: ignore[arg-type]
+    task = asyncio.create_task(engine.run())
+
+    apply: List[float] = []
+    to_order: List[float] = []
+    timeout = runtime_settings().decision_seconds * 3 + confirm_s + 10
+    try:
+        await asyncio.sleep(0.5)
+        for i in range(trials):
+            sym = f"X{i:04d}"
+            t_pub = await asyncio.to_thread(srv.publish, {sym: 95})
+            if await _until(lambda: sym in feed.scores, timeout=10) is not None:
+                apply.append(time.time() - t_pub)
+            if await _until(lambda: broker.first_order(sym) is not None, timeout=timeout, step=0.005) is None:
+                continue
+            order = broker.first_order(sym)
+            assert order is not None
+            to_order.append(order.ts - t_pub)
+    finally:
+        task.cancel()
+    return {
+        "trials": trials,
+        "decision_seconds": runtime_settings().decision_seconds,
+        "entry_confirm_s": confirm_s,
+        "broker_latency_s": broker_latency_s,
+        "delta_apply_s": _summary(apply),
+        "delta_to_order_s": _summary(to_order),
+    }
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    from bot.devtools.fake_centrifugo import FakeSignalServer
+
+    from bot.util.loopmon import LOOP
+
+    srv = FakeSignalServer(symbols=args.symbols, rate=args.rate, delta_size=args.delta_size).start()
+    report: Dict[str, Any] = {"symbols": args.symbols}
+    monitor = asyncio.create_task(LOOP.run(watchdog=True))
+    try:
+        feed = await _start_feed(srv)
+        scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+        if "throughput" in scenarios:
+            report["throughput"] = await scenario_throughput(srv, feed, args.burst, args.delta_size)
+        if "recovery" in scenarios:
+            report["recovery"] = await scenario_recovery(srv, feed, args.flaps, args.rate)
+        if "epoch" in scenarios:
+            report["epoch"] = await scenario_epoch(srv, feed, args.rate)
+        if "order" in scenarios:
+            report["order"] = await scenario_order(srv, feed, args.trials, args.confirm_s, args.broker_latency)
+        feed.stop()
+        await asyncio.wait_for(feed._harness_task, timeout=5)
+        await asyncio.sleep(0.2)  # let the cancelled WS task finish its closing handshake
+        report["loop"] = LOOP.summary()
+    finally:
+        monitor.cancel()
+        srv.stop()
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default="throughput,recovery,epoch,order")
+    ap.add_argument("--symbols", type=int, default=3000, help="universe size")
+    ap.add_argument("--rate", type=float, default=50.0, help="background deltas per second")
+    ap.add_argument("--delta-size", type=int, default=20, help="symbols per delta")
+    ap.add_argument("--burst", type=int, default=20000, help="deltas in the throughput burst")
+    ap.add_argument("--flaps", type=int, default=3, help="connection drops in the recovery scenario")
+    ap.add_argument("--trials", type=int, default=10, help="threshold crossings in the order scenario")
+    ap.add_argument("--confirm-s", type=int, default=0, help="entry confirmation window for the order scenario")
+    ap.add_argument("--decision-seconds", type=float, default=1.0, help="engine tick interval")
+    ap.add_argument("--broker-latency", type=float, default=0.05, help="simulated broker request latency (s)")
+    args = ap.parse_args()
+
+    # Settings are read once, on first use; set them before any bot import uses them.
+    os.environ.setdefault("BOT_STATE_DIR", tempfile.mkdtemp(prefix="bot-harness-"))
+    os.environ["BOT_DECISION_SECONDS"] = str(args.decision_seconds)
+    os.environ.setdefault("BOT_LOG_LEVEL", "WARNING")
+
+    from bot.util.logging import setup_logging
+
+    setup_logging()
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from bot.brokers.base import Account, Broker, Position
+
+
+@dataclass(frozen=True)
+class SimOrder:
+    ts: float  # wall clock when the broker received the order
+    symbol: str
+    side: str
+    qty: float
+    price: float
+    client_order_id: str
+
+
+class SimBroker(Broker):
+    """In-memory broker: instant fills at a flat price after `latency_s`.
+
+    Every order is appended to `orders` with its arrival time, so a harness can
+    measure signal-to-order latency. Thread-safe, since the engine calls the
+    sync methods from worker threads.
+    """
+
+    name = "sim"
+    fast_quotes = True
+
+    def __init__(self, equity: float = 1_000_000.0, price: float = 100.0, latency_s: float = 0.0, market_open: bool = True):
+        self.cash = float(equity)
+        self.price = float(price)
+        self.latency_s = float(latency_s)
+        self.market_open = market_open
+        self.positions: Dict[str, float] = {}
+        self.orders: List[SimOrder] = []
+        self._lock = threading.Lock()
+
+    def _wait(self) -> None:
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+
+    def is_configured(self) -> bool:
+        return True
+
+    def is_market_open(self) -> bool:
+        return self.market_open
+
+    def get_account(self) -> Account:
+        self._wait()
+        with self._lock:
+            held = sum(q * self.price for q in self.positions.values())
+            return Account(equity=self.cash + held, cash=self.cash)
+
+    def list_positions(self) -> List[Position]:
+        self._wait()
+        with self._lock:
+            return [
+                Position(symbol=s, qty=q, side="long", avg_entry_price=self.price, market_value=q * self.price)
+                for s, q in self.positions.items()
+            ]
+
+    def latest_price(self, symbol: str) -> Optional[float]:
+        return self.price
+
+    def latest_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        self._wait()
+        return {s.upper(): self.price for s in symbols}
+
+    def place_entry_with_bracket(
+        self,
+        symbol: str,
+        qty: float,
+        stop_loss_pct: float,
+        take_profit_pct: float,
+        client_order_id: str,
+    ) -> None:
+        received = time.time()
+        self._wait()
+        with self._lock:
+            self.orders.append(SimOrder(received, symbol.upper(), "BUY", float(qty), self.price, client_order_id))
+            self.positions[symbol.upper()] = self.positions.get(symbol.upper(), 0.0) + float(qty)
+            self.cash -= float(qty) * self.price
+
+    def close_position(self, symbol: str, qty: Optional[float] = None, client_order_id: str = "") -> None:
+        received = time.time()
+        self._wait()
+        with self._lock:
+            held = self.positions.pop(symbol.upper(), 0.0)
+            if held:
+                self.orders.append(SimOrder(received, symbol.upper(), "SELL", held, self.price, client_order_id))
+                self.cash += held * self.price
+
+    def first_order(self, symbol: str, side: str = "BUY") -> Optional[SimOrder]:
+        with self._lock:
+            for o in self.orders:
+                if o.symbol == symbol.upper() and o.side == side:
+                    return o
+        return None
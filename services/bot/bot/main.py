@@ -5,19 +5,26 @@ import logging
 import os
 import sys
 import time
+from typing import TYPE_CHECKING, Optional
 
-from bot.brokers.alpaca import AlpacaBroker
-from bot.brokers.ibkr import IBKRBroker
+from bot.util.startup import STARTUP
+
+from bot.brokers import create_broker
 from bot.config import load_config
 from bot.control.control_api import ControlApiClient
 from bot.control.pocketbase import PocketBaseClient
 from bot.control.user_config import UserConfigWatcher
-from bot.control.e2ee_client import E2EEMessenger, BotMessages
-from bot.setup import run_setup
+from bot.settings import settings_store
 from bot.signals.feed import SignalFeed
-from bot.storage.trades_db import init_db, get_recent_trades
+from bot.storage.retention import TradeRetention
+from bot.storage.score_snapshot import snapshot_path
+from bot.storage.trades_db import get_pnl_by_symbol, get_pnl_daily, get_recent_trades, get_trades_page, init_db
 from bot.strategy.engine import BotEngine
 from bot.util.logging import setup_logging
+from bot.util.loopmon import LOOP
+
+if TYPE_CHECKING:
+    from bot.control.e2ee_client import E2EEMessenger
 
 log = logging.getLogger("bot.main")
 
@@ -68,8 +75,31 @@ def check_subscription_access(control_url: str, pb_token: str) -> dict:
             raise
 
 
+def _int_arg(value, default: Optional[int] = None) -> Optional[int]:
+    """An app-supplied integer, or `default` when missing or malformed."""
+    try:
+        return int(value) if value is not None and value != "" else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _str_arg(value) -> Optional[str]:
+    """An app-supplied string filter, or None when missing or not a string."""
+    return value if isinstance(value, str) and value else None
+
+
+def _cursor_arg(value) -> Optional[str]:
+    """A "<ts_ms>:<id>" page cursor as returned by `get_trades_page`, else None."""
+    if not isinstance(value, str):
+        return None
+    ts, sep, row_id = value.partition(":")
+    if not sep or _int_arg(ts) is None or _int_arg(row_id) is None:
+        return None
+    return value
+
+
 async def e2ee_listener(
-    messenger: E2EEMessenger,
+    messenger: "E2EEMessenger",
     broker,
     usercfg: UserConfigWatcher,
     engine: BotEngine,
@@ -78,10 +108,18 @@ async def e2ee_listener(
     E2EE message listener task.
     Handles commands from app and sends status updates.
     """
+    from bot.control.e2ee_client import BotMessages
+    from bot.control.status_sync import StatusSync
+
     global _emergency_stop
     
-    last_status_send = 0
-    status_interval = 30  # Send status every 30 seconds
+    cfg = settings_store().current
+    sync = StatusSync(
+        keyframe_s=cfg.status_keyframe_seconds,
+        min_interval_s=cfg.status_min_interval_seconds,
+        max_interval_s=cfg.status_max_interval_seconds,
+    )
+    traded = False
     
     while True:
         try:
@@ -92,8 +130,34 @@ async def e2ee_listener(
                 msg_type = msg.get("type", "")
                 
                 if msg_type == "status_request":
-                    # Send status response
-                    await _send_status(messenger, broker, usercfg)
+                    # Full status (keyframe) in this cycle
+                    sync.resync()
+                    
+                elif msg_type == "status_ack":
+                    sync.ack(msg.get("seq"))
+                    
+                elif msg_type == "trade_history_request":
+                    # Paginated: the app passes back `next_cursor` to load older trades.
+                    # Reads archive files too, so keep it off the event loop.
+                    trades, next_cursor = await asyncio.to_thread(
+                        get_trades_page,
+                        limit=_int_arg(msg.get("limit"), 50) or 50,
+                        cursor=_cursor_arg(msg.get("cursor")),
+                        symbol=_str_arg(msg.get("symbol")),
+                        since_ms=_int_arg(msg.get("since_ms")),
+                        until_ms=_int_arg(msg.get("until_ms")),
+                        include_archive=True,
+                    )
+                    messenger.queue(BotMessages.trade_history(trades, next_cursor=next_cursor))
+                    
+                elif msg_type == "pnl_request":
+                    since_day = _str_arg(msg.get("since_day"))
+                    until_day = _str_arg(msg.get("until_day"))
+                    daily = await asyncio.to_thread(
+                        get_pnl_daily, since_day=since_day, until_day=until_day, symbol=_str_arg(msg.get("symbol")),
+                    )
+                    by_symbol = await asyncio.to_thread(get_pnl_by_symbol, since_day=since_day, until_day=until_day)
+                    messenger.queue(BotMessages.pnl_summary(daily=daily, by_symbol=by_symbol))
                     
                 elif msg_type == "config_update":
                     # Handle config update
@@ -115,7 +179,7 @@ async def e2ee_listener(
                         log.warning("e2ee_command: EMERGENCY STOP received")
                         _emergency_stop = True
                         engine.pause()
-                        messenger.send(BotMessages.error("emergency_stop", "Bot durduruldu"))
+                        messenger.queue(BotMessages.error("emergency_stop", "Bot durduruldu"))
                         
                     elif action == "pause":
                         log.info("e2ee_command: pause")
@@ -128,30 +192,49 @@ async def e2ee_listener(
                         
                     elif action == "sync_config":
                         log.info("e2ee_command: sync_config")
-                        usercfg.refresh()
+                        await asyncio.to_thread(usercfg.refresh)
                         
                 elif msg_type == "api_keys_update":
                     # API keys update would require restart
                     log.info("e2ee_api_keys_update: received (requires restart)")
-                    messenger.send(BotMessages.error(
+                    messenger.queue(BotMessages.error(
                         "restart_required",
                         "API key güncellemesi için bot'u yeniden başlatın"
                     ))
             
-            # Send periodic status
-            now = time.time()
-            if now - last_status_send > status_interval:
-                await _send_status(messenger, broker, usercfg)
-                last_status_send = now
+            # Status: sampled on an adaptive cadence, sent only as changes
+            # against what the app acknowledged (see status_sync).
+            if sync.due(traded=traded):
+                status = await _collect_status(broker, usercfg)
+                update = sync.build(status) if status is not None else None
+                if update is not None:
+                    messenger.queue(update)
+            traded = False
+            
+            # Replies and status produced in this cycle go out in one envelope.
+            messenger.flush()
+            
+            engine.state.setdefault("health", {})["status_sync"] = {
+                **sync.summary(),
+                "wire": dict(messenger.stats),
+            }
                 
         except Exception as e:
             log.warning("e2ee_listener_error: %s", e)
         
-        await asyncio.sleep(3)
+        # A trade ends the wait early so the app sees it at once.
+        try:
+            await asyncio.wait_for(engine.traded.wait(), timeout=3)
+            traded = True
+        except asyncio.TimeoutError:
+            pass
+        engine.traded.clear()
+
 
+async def _collect_status(broker, usercfg: UserConfigWatcher) -> Optional[dict]:
+    """Current full `status_response` for the app (None if it could not be built)."""
+    from bot.control.e2ee_client import BotMessages
 
-async def _send_status(messenger: E2EEMessenger, broker, usercfg: UserConfigWatcher):
-    """Send status update to app via E2EE."""
     global _emergency_stop, _start_time
     
     try:
@@ -161,24 +244,25 @@ async def _send_status(messenger: E2EEMessenger, broker, usercfg: UserConfigWatc
         api_key_valid = False
         
         try:
-            account = broker.get_account()
-            balance = float(account.get("equity", 0) or account.get("cash", 0))
+            account = await broker.aget_account()
+            balance = float(account.equity or account.cash or 0)
             api_key_valid = True
         except Exception as e:
             log.debug("broker_account_failed: %s", e)
         
         try:
-            pos_list = broker.get_positions()
-            positions = [
-                {
-                    "symbol": p.get("symbol"),
-                    "qty": float(p.get("qty", 0)),
-                    "avg_entry": float(p.get("avg_entry_price", 0)),
-                    "current_price": float(p.get("current_price", 0)),
-                    "unrealized_pl": float(p.get("unrealized_pl", 0)),
-                }
-                for p in pos_list
-            ]
+            pos_list = await broker.alist_positions()
+            positions = []
+            for p in pos_list:
+                avg = float(p.avg_entry_price or 0)
+                price = abs(float(p.market_value)) / p.qty if p.market_value and p.qty else 0.0
+                positions.append({
+                    "symbol": p.symbol,
+                    "qty": float(p.qty),
+                    "avg_entry": avg,
+                    "current_price": price,
+                    "unrealized_pl": (price - avg) * p.qty if price and avg else 0.0,
+                })
         except Exception as e:
             log.debug("broker_positions_failed: %s", e)
         
@@ -199,7 +283,7 @@ async def _send_status(messenger: E2EEMessenger, broker, usercfg: UserConfigWatc
         except Exception:
             pass
         
-        # Build and send status
+        # Build status
         status = BotMessages.status_response(
             balance=balance,
             positions=positions,
@@ -213,10 +297,11 @@ async def _send_status(messenger: E2EEMessenger, broker, usercfg: UserConfigWatc
             status["paused"] = True
             status["pause_reason"] = "emergency_stop"
         
-        messenger.send(status)
+        return status
         
     except Exception as e:
         log.warning("send_status_failed: %s", e)
+        return None
 
 
 async def _run_bot() -> int:
@@ -227,8 +312,16 @@ async def _run_bot() -> int:
     control_url = os.getenv("CONTROL_API_URL", "http://control-api:8001")
     brain_url = os.getenv("BRAIN_API_URL", "http://brain-api:8080")
     ws_url = os.getenv("CENTRIFUGO_WS_URL", "ws://centrifugo:8000/connection/websocket")
+    # Optional list of hub endpoints, all connected in parallel (hedged ingestion).
+    ws_urls = [u.strip() for u in os.getenv("CENTRIFUGO_WS_URLS", "").split(",") if u.strip()] or [ws_url]
 
     cfg = load_config()
+    try:
+        settings = settings_store().current
+    except ValueError as e:
+        # pydantic ValidationError: bad BOT_* env or settings.json value.
+        log.error("invalid_settings: %s", e)
+        return 2
     if not cfg.email or not cfg.password:
         log.error("missing_credentials: run 'python -m bot.main setup' first")
         return 2
@@ -237,7 +330,8 @@ async def _run_bot() -> int:
     log.info("authenticating with PocketBase...")
     pb = PocketBaseClient(pb_url)
     try:
-        pb.auth_with_password(cfg.email, cfg.password)
+        with STARTUP.phase("auth"):
+            pb.auth_with_password(cfg.email, cfg.password)
     except Exception as e:
         log.error("auth_failed: %s", e)
         print("\n❌ Giriş başarısız. E-posta veya şifrenizi kontrol edin.\n")
@@ -249,7 +343,8 @@ async def _run_bot() -> int:
     log.info("checking subscription status...")
     token = None
     try:
-        tok = check_subscription_access(control_url, pb.token)
+        with STARTUP.phase("subscription"):
+            tok = check_subscription_access(control_url, pb.token)
         token = tok.get("token")
         plan = tok.get("plan", "unknown")
         log.info("subscription_ok: plan=%s", plan)
@@ -266,7 +361,9 @@ async def _run_bot() -> int:
     # Initialize E2EE messenger
     messenger = None
     try:
-        messenger = E2EEMessenger(control_url, pb.token)
+        with STARTUP.phase("e2ee_init"):
+            e2ee = STARTUP.timed_import("bot.control.e2ee_client")
+            messenger = e2ee.E2EEMessenger(control_url, pb.token)
         if messenger.client.is_paired:
             log.info("e2ee_paired: encrypted communication active")
             print("🔒 E2EE bağlantısı aktif\n")
@@ -275,26 +372,26 @@ async def _run_bot() -> int:
     except Exception as e:
         log.warning("e2ee_init_failed: %s", e)
 
+    def centrifugo_token() -> str:
+        # Re-issued on expiry/reconnect; pb.token is kept fresh by the config watcher.
+        return str(check_subscription_access(control_url, pb.token).get("token") or "")
+
     feed = SignalFeed(
-        ws_url=ws_url,
         brain_api_url=brain_url,
-        pb_token=pb.token,
-        centrifugo_token=token,
+        centrifugo_ws_url=ws_urls[0],
+        centrifugo_token=token or "",
+        snapshot_path=snapshot_path(),
+        snapshot_save_seconds=settings.score_snapshot_seconds,
+        extra_ws_urls=ws_urls[1:],
+        token_provider=centrifugo_token,
     )
 
-    # Broker init
-    data_base_url = os.getenv("ALPACA_DATA_BASE_URL", "https://data.alpaca.markets")
-    if cfg.broker == "alpaca":
-        broker = AlpacaBroker(
-            api_key=cfg.alpaca.api_key,
-            api_secret=cfg.alpaca.api_secret,
-            trading_base_url=cfg.alpaca.trading_base_url,
-            data_base_url=data_base_url,
-        )
-    else:
-        broker = IBKRBroker(host=cfg.ibkr.host, port=cfg.ibkr.port, client_id=cfg.ibkr.client_id)
+    # Broker init (adapter module is imported only for the configured broker)
+    with STARTUP.phase("broker_init"):
+        broker = create_broker(cfg)
 
-    init_db()
+    with STARTUP.phase("db_init"):
+        init_db()
 
     engine = BotEngine(
         broker=broker,
@@ -303,6 +400,8 @@ async def _run_bot() -> int:
         get_panic=lambda: usercfg.latest.panic or _emergency_stop,
         get_profile=lambda: usercfg.latest.risk_profile,
     )
+    # Profile/panic changes from the app reach the engine without waiting a full tick.
+    usercfg.add_listener(lambda _cfg: engine.wake())
 
     async def pair_gate() -> None:
         # Only enforce pairing if PB supports the flag.
@@ -316,13 +415,28 @@ async def _run_bot() -> int:
         asyncio.create_task(feed.run()),
         asyncio.create_task(pair_gate()),
         asyncio.create_task(engine.run()),
+        asyncio.create_task(TradeRetention().run()),
+        asyncio.create_task(settings_store().watch()),
+        asyncio.create_task(LOOP.run(
+            interval_s=settings.loop_lag_sample_seconds,
+            slow_ms=settings.loop_slow_ms,
+            watchdog=settings.loop_watchdog,
+        )),
     ]
     
     # Add E2EE listener if paired
     if messenger and messenger.client.is_paired:
+        from bot.control.outbox import OutboxSender
+
+        outbox = OutboxSender(
+            messenger,
+            batch_max=settings.outbox_batch_max,
+            max_backoff_s=settings.outbox_max_backoff_seconds,
+        )
         tasks.append(asyncio.create_task(
             e2ee_listener(messenger, broker, usercfg, engine)
         ))
+        tasks.append(asyncio.create_task(outbox.run(engine.state.setdefault("health", {}))))
 
     done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
     for d in done:
@@ -333,11 +447,19 @@ async def _run_bot() -> int:
 
 
 def main() -> None:
+    STARTUP.mark("main_entered")
     setup_logging()
 
     if len(sys.argv) > 1 and sys.argv[1].lower() == "setup":
+        from bot.setup import run_setup
+
         sys.exit(run_setup())
 
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "why":
+        from bot.storage.decision_log import run_why_cli
+
+        sys.exit(run_why_cli(sys.argv[2:]))
+
     print("\n" + "=" * 50)
     print("  TheCouncilAI Trading Bot")
     print("=" * 50)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Deque, Dict, Mapping, Optional, Tuple
+
+
+class EquityTracker:
+    """Intraday mark-to-market equity between broker account polls.
+
+    The last account poll is the anchor (`base_equity`, with the per-symbol
+    prices it implied). Every later price mark moves equity by
+    `qty * (price - anchor_price)`, so any price source (batched quotes, the
+    engine's own lookups, broker push updates) keeps equity current without
+    another account request.
+
+    Keeps the day's start equity, an intraday high-water mark and a bounded
+    equity curve sampled once per `sample_s` (the latest equity in each
+    interval), so its span does not depend on how often prices are marked:
+    the default 1440 one-minute points cover a full day.
+    """
+
+    def __init__(self, max_points: int = 1440, sample_s: float = 60.0):
+        self.day_id: Optional[str] = None
+        self.equity_start: Optional[float] = None
+        self.high_water: Optional[float] = None
+        self.curve: Deque[Tuple[int, float]] = deque(maxlen=max(16, int(max_points)))
+        self._sample_ms = max(1, int(sample_s * 1000))
+
+        self._base_equity: Optional[float] = None
+        self._qty: Dict[str, float] = {}
+        self._base_px: Dict[str, Optional[float]] = {}
+        self._px: Dict[str, float] = {}
+        self.last_mark_ms: Optional[int] = None
+
+    def start_day(self, day_id: str, equity_start: float) -> None:
+        if day_id == self.day_id:
+            return
+        self.day_id = day_id
+        self.equity_start = float(equity_start)
+        self.high_water = float(equity_start)
+        self.curve.clear()
+
+    def sync(self, equity: float, positions: Mapping[str, Tuple[float, Optional[float]]]) -> None:
+        """Re-anchor on an authoritative account value.
+
+        `positions` maps symbol -> (qty, price implied by the broker, if known).
+        """
+        self._base_equity = float(equity)
+        self._qty = {s: float(q) for s, (q, _) in positions.items()}
+        self._base_px = {s: (float(px) if px else self._px.get(s)) for s, (_, px) in positions.items()}
+        self._px = {s: px for s, px in self._px.items() if s in self._qty}
+        self._record()
+
+    def mark(self, symbol: str, price: Optional[float]) -> None:
+        if not price or price <= 0 or symbol not in self._qty:
+            return
+        if self._base_px.get(symbol) is None:
+            # First usable price after an anchor without one contributes no PnL.
+            self._base_px[symbol] = float(price)
+        self._px[symbol] = float(price)
+
+    def add(self, symbol: str, qty: float, price: float) -> None:
+        """Track a newly opened (or increased) position from its entry price."""
+        if self._base_equity is None or not price or price <= 0:
+            return
+        held = self._qty.get(symbol, 0.0)
+        self.drop(symbol)
+        self._qty[symbol] = held + float(qty)
+        self._base_px[symbol] = float(price)
+        self._px[symbol] = float(price)
+
+    def drop(self, symbol: str) -> None:
+        """Stop tracking a closed position, keeping its marked PnL in the anchor."""
+        qty = self._qty.pop(symbol, None)
+        px = self._px.pop(symbol, None)
+        base = self._base_px.pop(symbol, None)
+        if qty is not None and px is not None and base is not None and self._base_equity is not None:
+            self._base_equity += qty * (px - base)
+
+    def mark_many(self, prices: Mapping[str, Optional[float]]) -> None:
+        for sym, px in prices.items():
+            self.mark(sym, px)
+        self._record()
+
+    @property
+    def held_symbols(self) -> list:
+        return list(self._qty.keys())
+
+    @property
+    def equity(self) -> Optional[float]:
+        if self._base_equity is None:
+            return None
+        eq = self._base_equity
+        for sym, qty in self._qty.items():
+            px = self._px.get(sym)
+            base = self._base_px.get(sym)
+            if px is not None and base is not None:
+                eq += qty * (px - base)
+        return eq
+
+    def drawdown(self) -> float:
+        """Drawdown from the day's start equity (0 when flat or up)."""
+        eq = self.equity
+        if eq is None or not self.equity_start:
+            return 0.0
+        return max(0.0, (self.equity_start - eq) / self.equity_start)
+
+    def drawdown_from_high(self) -> float:
+        eq = self.equity
+        if eq is None or not self.high_water:
+            return 0.0
+        return max(0.0, (self.high_water - eq) / self.high_water)
+
+    def _record(self) -> None:
+        eq = self.equity
+        if eq is None:
+            return
+        now_ms = int(time.time() * 1000)
+        self.last_mark_ms = now_ms
+        if self.high_water is None or eq > self.high_water:
+            self.high_water = eq
+        point = (now_ms, round(eq, 2))
+        if self.curve and self.curve[-1][0] // self._sample_ms == now_ms // self._sample_ms:
+            self.curve[-1] = point
+        else:
+            self.curve.append(point)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        eq = self.equity
+        return {
+            "equity": round(eq, 2) if eq is not None else None,
+            "equity_start": self.equity_start,
+            "high_water": round(self.high_water, 2) if self.high_water is not None else None,
+            "day_drawdown": round(self.drawdown(), 4),
+            "drawdown_from_high": round(self.drawdown_from_high(), 4),
+            "last_mark_ms": self.last_mark_ms,
+            "curve_points": len(self.curve),
+        }
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Literal, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from bot.config import state_dir
+
+log = logging.getLogger("bot.settings")
+
+
+class RuntimeSettings(BaseModel):
+    """Typed runtime tunables.
+
+    Each field `foo_bar` is read from env `BOT_FOO_BAR`. An optional
+    `<state_dir>/settings.json` (keys: field names or env names) overrides env.
+    That file is watched and reloaded atomically, so tuning needs no restart.
+    Hot paths read plain attributes from `runtime_settings()`.
+    """
+
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    # Engine cadence / signal health
+    decision_seconds: float = Field(12.0, gt=0)
+    fast_decision_seconds: float = Field(3.0, gt=0)
+    near_threshold_points: int = Field(3, ge=0)
+    closed_max_sleep_seconds: float = Field(3600.0, gt=0)
+    preopen_lead_seconds: float = Field(300.0, ge=0)
+    preopen_warmup: bool = True
+    signal_stale_seconds: float = Field(480.0, gt=0)
+    missing_symbol_grace_seconds: float = Field(180.0, ge=0)
+
+    # Sizing
+    min_weight_per_pos: float = Field(0.08, ge=0, le=1)
+    cash_buffer: float = Field(0.05, ge=0, lt=1)
+    min_order_notional: float = Field(50.0, ge=0)
+    cooldown_seconds: float = Field(240.0, ge=0)
+
+    # Rotation cost model (commission None -> broker default: alpaca 0, others 1)
+    score_point_value_bps: float = Field(4.0, ge=0)
+    commission_per_trade: Optional[float] = Field(None, ge=0)
+    slippage_bps: float = Field(2.5, ge=0)
+    switch_cost_multiplier: float = Field(1.5, ge=0)
+
+    # Safety
+    equity_mark_seconds: float = Field(2.0, gt=0)
+    equity_curve_points: int = Field(1440, ge=16)
+    safe_reduce_step_seconds: float = Field(60.0, ge=0)
+    safe_reduce_per_step: int = Field(1, ge=1)
+    safe_stale_escalate_seconds: float = Field(900.0, ge=0)
+
+    # Signal feed
+    score_snapshot_seconds: float = Field(15.0, gt=0)
+
+    # Control plane
+    usercfg_poll_seconds: float = Field(10.0, gt=0)
+    usercfg_safety_poll_seconds: float = Field(300.0, gt=0)
+    usercfg_realtime: bool = True
+    pb_token_refresh_seconds: float = Field(1800.0, gt=0)
+    e2ee_envelope_v2: Literal["auto", "on", "off"] = "auto"
+    e2ee_compress_min_bytes: int = Field(512, ge=0)
+    status_keyframe_seconds: float = Field(600.0, gt=0)
+    status_min_interval_seconds: float = Field(5.0, gt=0)
+    status_max_interval_seconds: float = Field(120.0, gt=0)
+    outbox_batch_max: int = Field(50, ge=1)
+    outbox_max_backoff_seconds: float = Field(300.0, gt=0)
+
+    # Storage
+    trades_retention_days: int = Field(90, ge=0)
+    retention_interval_seconds: float = Field(21600.0, gt=0)
+    decision_ring_records: int = Field(8192, ge=64)
+    decision_flush_seconds: float = Field(30.0, gt=0)
+    decision_heartbeat_seconds: float = Field(60.0, ge=0)
+    decision_retention_days: int = Field(14, ge=0)
+
+    # Logging (BOT_LOG_LEVEL stays a plain env var: it applies before settings load)
+    log_format: Literal["text", "json"] = "text"
+    log_queue_size: int = Field(10000, ge=100)
+    log_rate_limit_seconds: float = Field(60.0, ge=0)
+    log_tick_budget: int = Field(200, ge=0)
+
+    # Diagnostics
+    loop_lag_sample_seconds: float = Field(0.25, gt=0)
+    loop_slow_ms: float = Field(100.0, gt=0)
+    loop_watchdog: bool = False
+
+    def commission(self, broker_name: str) -> float:
+        if self.commission_per_trade is not None:
+            return self.commission_per_trade
+        return 0.0 if broker_name == "alpaca" else 1.0
+
+
+def settings_path() -> Path:
+    return state_dir() / "settings.json"
+
+
+def _env_name(field: str) -> str:
+    return f"BOT_{field.upper()}"
+
+
+def _from_env() -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for field in RuntimeSettings.model_fields:
+        raw = os.getenv(_env_name(field))
+        if raw is not None and raw.strip() != "":
+            out[field] = raw.strip()
+    return out
+
+
+def _from_file(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text(encoding="utf-8") or "{}")
+    if not isinstance(data, dict):
+        raise ValueError("settings file must contain a JSON object")
+    by_env = {_env_name(f): f for f in RuntimeSettings.model_fields}
+    return {by_env.get(k, k.lower()): v for k, v in data.items()}
+
+
+def load_settings(path: Optional[Path] = None) -> RuntimeSettings:
+    """Build settings from env plus the optional file; raises on invalid values."""
+    merged = _from_env()
+    merged.update(_from_file(path if path is not None else settings_path()))
+    return RuntimeSettings.model_validate(merged)
+
+
+class SettingsStore:
+    """Holds the current `RuntimeSettings` and swaps it when the file changes."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path if path is not None else settings_path()
+        self.current: RuntimeSettings = load_settings(self.path)
+        self._stamp = self._file_stamp()
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def maybe_reload(self) -> bool:
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            new = load_settings(self.path)
+        except (ValidationError, ValueError) as e:
+            # Keep running on the last good settings.
+            log.warning("settings_reload_rejected err=%s", e)
+            return False
+        if new == self.current:
+            return False
+        changed = sorted(k for k in RuntimeSettings.model_fields if getattr(new, k) != getattr(self.current, k))
+        self.current = new
+        log.info("settings_reloaded changed=%s", ",".join(changed))
+        return True
+
+    async def watch(self, interval_s: float = 2.0) -> None:
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                self.maybe_reload()
+            except Exception as e:
+                log.warning("settings_watch_failed err=%s", e)
+
+
+_STORE: Optional[SettingsStore] = None
+
+
+def settings_store() -> SettingsStore:
+    global _STORE
+    if _STORE is None:
+        _STORE = SettingsStore()
+    return _STORE
+
+
+def runtime_settings() -> RuntimeSettings:
+    """Current settings snapshot (an immutable object; cheap to call)."""
+    return settings_store().current
@@ -5,13 +5,70 @@ import json
 import logging
 import os
 import time
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import requests
 import websockets
 
+from bot.signals.view import ScoreView
+from bot.storage.score_snapshot import load_snapshot, save_snapshot
+
 log = logging.getLogger("bot.signals")
 
+# Publications remembered for cross-endpoint de-duplication.
+_SEEN_WINDOW = 8192
+_CONNECT_ID = 1
+# Centrifugo: connect error 109 and disconnect 3005 both mean "token expired".
+_TOKEN_EXPIRED_CODES = (109, 3005)
+
+
+class _ConnectError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(f"connect_error code={code} message={message}")
+        self.code = code
+
+
+_EWMA_ALPHA = 0.1
+
+
+@dataclass
+class EndpointStats:
+    """Per-WS-endpoint delivery stats.
+
+    `lag_ms` is receipt time minus the publisher's `t` (includes clock skew);
+    `behind_ms` is how far this route trailed the one that delivered first,
+    measured on duplicates, so it compares routes without clock skew.
+    """
+
+    url: str
+    connected: bool = False
+    connects: int = 0
+    received: int = 0
+    first: int = 0
+    duplicates: int = 0
+    lag_ms: Optional[float] = None
+    behind_ms: Optional[float] = None
+    last_ms: Optional[int] = None
+    recoveries: int = 0
+    recovered_pubs: int = 0
+    recovery_failed: int = 0
+
+    def observe_lag(self, ms: float) -> None:
+        self.lag_ms = ms if self.lag_ms is None else self.lag_ms + _EWMA_ALPHA * (ms - self.lag_ms)
+
+    def observe_behind(self, ms: float) -> None:
+        self.behind_ms = ms if self.behind_ms is None else self.behind_ms + _EWMA_ALPHA * (ms - self.behind_ms)
+
+    def to_json(self) -> Dict[str, Any]:
+        out = dict(self.__dict__)
+        for k in ("lag_ms", "behind_ms"):
+            if out[k] is not None:
+                out[k] = round(out[k], 1)
+        return out
+
 
 class SignalFeed:
     """Maintains the latest public score map (symbol -> score) using:
@@ -19,7 +76,28 @@ class SignalFeed:
     1) Centrifugo WS channel `signals:delta` if possible
     2) Fallback polling of Brain API `/snapshot`
 
+    With several WS URLs (e.g. two hub nodes or routes) every endpoint keeps
+    its own connection; publications are de-duplicated by their content
+    (brain epoch, timestamp and changes), which does not depend on any one
+    stream's offsets, and applied on first arrival, so losing one route
+    leaves no gap. Per-endpoint lag is in `endpoint_stats()`.
+
+    A reconnect asks Centrifugo to recover from the last stream position
+    (stream epoch + offset); missed publications are replayed in order
+    through the normal delta path, and only a failed recovery (history gone
+    or stream reset) falls back to a full snapshot. With `token_provider`, an
+    expired connection token is refreshed and the connection resumed at once.
+
     The public payload remains minimal: only the single score per symbol.
+
+    The map is published as immutable, versioned `ScoreView`s swapped in one
+    assignment per payload, so `scores`/`view` can be read from any thread
+    without locks. A full snapshot replaces the map (symbols it no longer
+    lists are dropped); deltas publish the next version on top of it.
+
+    With `snapshot_path`, the score map is persisted periodically (off the event
+    loop) and restored on startup. Restored scores are *provisional* until fresh
+    data confirms the epoch; an epoch mismatch triggers an immediate snapshot.
     """
 
     def __init__(
@@ -28,33 +106,117 @@ class SignalFeed:
         centrifugo_ws_url: str,
         centrifugo_token: str,
         poll_seconds: float = 20.0,
+        snapshot_path: Optional[Path] = None,
+        snapshot_save_seconds: float = 15.0,
+        extra_ws_urls: Sequence[str] = (),
+        token_provider: Optional[Callable[[], str]] = None,
     ):
         self.brain_api_url = brain_api_url.rstrip("/")
         self.ws_url = centrifugo_ws_url
+        urls = list(dict.fromkeys([centrifugo_ws_url, *extra_ws_urls]))
+        self._endpoints = [EndpointStats(url=u) for u in urls if u]
+        self._seen: "OrderedDict[Tuple[Any, ...], int]" = OrderedDict()
         self.token = centrifugo_token
+        # Fetches a fresh connection token (blocking; run in a worker thread).
+        self.token_provider = token_provider
+        self._token_lock = asyncio.Lock()
+        # channel -> (stream epoch, last offset) for recovery on reconnect
+        self._positions: Dict[str, Tuple[str, int]] = {}
         self.poll_seconds = poll_seconds
+        self.snapshot_path = snapshot_path
+        self.snapshot_save_seconds = snapshot_save_seconds
 
-        self.scores: Dict[str, int] = {}
-        self.epoch: Optional[int] = None
-        self.last_update_ms: Optional[int] = None
+        self._view = ScoreView()
+        # symbol -> (received_ms, publisher t) of the payload that last changed its score
+        self.arrivals: Dict[str, Tuple[int, Optional[int]]] = {}
+        self._restored_epoch: Optional[int] = None
 
         self._stop = asyncio.Event()
-        self._ws_ok = False
+        self._snapshot_now = asyncio.Event()
+        self._saved_version = 0
+
+        if snapshot_path is not None:
+            self._restore(snapshot_path)
 
     @property
     def ws_ok(self) -> bool:
-        return self._ws_ok
+        return any(st.connected for st in self._endpoints)
+
+    @property
+    def view(self) -> ScoreView:
+        """Current version; hold on to it for a consistent read across several lookups."""
+        return self._view
+
+    @property
+    def scores(self) -> ScoreView:
+        return self._view
+
+    @property
+    def version(self) -> int:
+        return self._view.version
+
+    @property
+    def epoch(self) -> Optional[int]:
+        return self._view.epoch
+
+    @property
+    def last_update_ms(self) -> Optional[int]:
+        return self._view.ts_ms
+
+    @property
+    def provisional(self) -> bool:
+        return self._view.provisional
 
     def stop(self) -> None:
         self._stop.set()
 
+    def request_snapshot(self) -> None:
+        """Fetch a full snapshot now instead of at the next poll."""
+        self._snapshot_now.set()
+
+    def _restore(self, path: Path) -> None:
+        snap = load_snapshot(path)
+        if snap is None or not snap.scores:
+            return
+        self._view = self._view.replaced(dict(snap.scores), snap.epoch, snap.ts_ms, provisional=True)
+        self._restored_epoch = snap.epoch
+        log.info("scores_restored symbols=%d epoch=%s ts_ms=%s (provisional)", len(self.scores), self.epoch, self.last_update_ms)
+
+    def _validate_epoch(self, epoch: Optional[int]) -> None:
+        """Called with the epoch of the first fresh payload after a restore."""
+        if not self.provisional or epoch is None:
+            return
+        if self._restored_epoch is not None and int(epoch) == self._restored_epoch:
+            self._view = self._view.restamped(provisional=False)
+            log.info("scores_validated epoch=%s", epoch)
+        else:
+            # Restored map belongs to another epoch; fetch a full snapshot now.
+            self._snapshot_now.set()
+
     async def run(self) -> None:
         # Start polling loop always, but when WS works it becomes lightweight.
-        ws_task = asyncio.create_task(self._ws_loop())
-        poll_task = asyncio.create_task(self._poll_loop())
+        tasks = [
+            *(asyncio.create_task(self._ws_loop(st)) for st in self._endpoints),
+            asyncio.create_task(self._poll_loop()),
+        ]
+        if self.snapshot_path is not None:
+            tasks.append(asyncio.create_task(self._persist_loop()))
         await self._stop.wait()
-        ws_task.cancel()
-        poll_task.cancel()
+        for t in tasks:
+            t.cancel()
+
+    async def _persist_loop(self) -> None:
+        while not self._stop.is_set():
+            await asyncio.sleep(self.snapshot_save_seconds)
+            view = self._view
+            if view.version == self._saved_version or not view:
+                continue
+            try:
+                # Views are immutable: the worker thread reads this one while newer ones are published.
+                await asyncio.to_thread(save_snapshot, self.snapshot_path, view.epoch, view.ts_ms, view)
+                self._saved_version = view.version
+            except Exception as e:
+                log.warning("scores_persist_failed err=%s", e)
 
     async def _poll_loop(self) -> None:
         # Initial snapshot so we have a baseline.
@@ -65,69 +227,251 @@ class SignalFeed:
                 epoch = snap.get("e")
                 ts = snap.get("t")
                 m = snap.get("m") or []
-                for sym, sc in m:
-                    self.scores[str(sym).upper()] = int(sc)
-                self.epoch = int(epoch) if epoch is not None else self.epoch
-                self.last_update_ms = int(ts) if ts is not None else int(time.time() * 1000)
-                if not self._ws_ok:
+                self._apply_snapshot(
+                    {str(sym).upper(): int(sc) for sym, sc in m},
+                    int(epoch) if epoch is not None else None,
+                    int(ts) if ts is not None else int(time.time() * 1000),
+                )
+                if not self.ws_ok:
                     log.info("snapshot_ok symbols=%d epoch=%s", len(self.scores), self.epoch)
             except Exception as e:
                 log.warning("snapshot_failed err=%s", e)
 
-            await asyncio.sleep(self.poll_seconds)
+            self._snapshot_now.clear()
+            try:
+                await asyncio.wait_for(self._snapshot_now.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def _apply_snapshot(self, scores: Dict[str, int], epoch: Optional[int], ts_ms: int) -> None:
+        """Publish a full snapshot as the next version, replacing the map.
+
+        Within the same epoch, symbols whose last delta is newer than the
+        snapshot keep that delta's score, so a snapshot generated before
+        already-applied deltas does not roll them back; that includes symbols
+        such a delta added and the older snapshot does not list yet. A symbol
+        is dropped only by a snapshot at least as new as its last delta.
+        """
+        cur = self._view
+        now_ms = int(time.time() * 1000)
+        if not cur.provisional and epoch is not None and epoch == cur.epoch:
+            for sym, (_, t_ms) in self.arrivals.items():
+                if t_ms is not None and t_ms > ts_ms and sym in cur:
+                    scores[sym] = cur[sym]
+        arrivals = {}
+        for sym, sc in scores.items():
+            prev = self.arrivals.get(sym)
+            arrivals[sym] = (now_ms, ts_ms) if prev is None or cur.get(sym) != sc else prev
+        dropped = len(cur) - sum(1 for sym in cur if sym in scores)
+        self.arrivals = arrivals
+        self._view = cur.replaced(scores, epoch, ts_ms, provisional=False)
+        if dropped:
+            log.info("snapshot_dropped_symbols n=%d epoch=%s", dropped, self.epoch)
+
+    def _apply_delta(self, d: List[Any], epoch: Optional[int], ts: Optional[int]) -> None:
+        cur = self._view
+        now_ms = int(time.time() * 1000)
+        changes: Dict[str, Optional[int]] = {}
+        for sym, sc in d:
+            sym = str(sym).upper()
+            if sc is None:
+                changes[sym] = None
+                self.arrivals.pop(sym, None)
+                continue
+            sc = int(sc)
+            if cur.get(sym) != sc:
+                changes[sym] = sc
+                self.arrivals[sym] = (now_ms, ts)
+        self._view = cur.with_changes(changes, epoch, ts)
+
+    # --- WebSocket -----------------------------------------------------------------
+
+    def _pub_key(self, data: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Identity of a publication across endpoints.
+
+        Offsets restart with each stream epoch and differ between separate
+        hubs, so the key is the payload itself (epoch, timestamp, changes).
+        """
+        return (data.get("e"), data.get("t"), tuple(tuple(x) for x in data.get("d") or []))
+
+    def _first_delivery(self, st: EndpointStats, data: Dict[str, Any], now_ms: int) -> bool:
+        """Record one delivery; False when another endpoint already delivered it."""
+        st.received += 1
+        st.last_ms = now_ms
+        ts = data.get("t")
+        if ts is not None:
+            st.observe_lag(now_ms - int(ts))
+        key = self._pub_key(data)
+        first_ms = self._seen.get(key)
+        if first_ms is not None:
+            st.duplicates += 1
+            st.observe_behind(now_ms - first_ms)
+            return False
+        self._seen[key] = now_ms
+        if len(self._seen) > _SEEN_WINDOW:
+            self._seen.popitem(last=False)
+        st.first += 1
+        return True
+
+    def endpoint_stats(self) -> List[Dict[str, Any]]:
+        return [st.to_json() for st in self._endpoints]
+
+    # --- token / stream position ------------------------------------------------
+
+    async def _refresh_token(self, stale: str) -> str:
+        """New connection token, fetched once even if several endpoints ask."""
+        async with self._token_lock:
+            if self.token != stale or self.token_provider is None:
+                return self.token
+            try:
+                self.token = await asyncio.to_thread(self.token_provider)
+                log.info("ws_token_refreshed")
+            except Exception as e:
+                log.warning("ws_token_refresh_failed err=%s", e)
+            return self.token
 
-    async def _ws_loop(self) -> None:
-        # Best-effort Centrifugo protocol v2.
-        # If protocol changes, we keep working via snapshot polling.
+    def _connect_cmd(self) -> Dict[str, Any]:
+        cmd: Dict[str, Any] = {"token": self.token, "name": "thecouncilai-bot"}
+        if self._positions:
+            # Resume each server-side subscription where we left off.
+            cmd["subs"] = {
+                ch: {"recover": True, "epoch": epoch, "offset": offset}
+                for ch, (epoch, offset) in self._positions.items()
+            }
+        return {"id": _CONNECT_ID, "connect": cmd}
+
+    def _advance(self, channel: str, offset: Any) -> None:
+        if offset is None or channel not in self._positions:
+            return
+        epoch, cur = self._positions[channel]
+        if int(offset) > cur:
+            self._positions[channel] = (epoch, int(offset))
+
+    def _on_connect_reply(self, st: EndpointStats, result: Dict[str, Any]) -> None:
+        for ch, sub in (result.get("subs") or {}).items():
+            sub = sub or {}
+            known = self._positions.get(ch)
+            epoch = sub.get("epoch")
+            if known is not None:  # we asked to recover this channel
+                pubs = sub.get("publications") or []
+                if sub.get("recovered"):
+                    st.recoveries += 1
+                    st.recovered_pubs += len(pubs)
+                    for pub in pubs:
+                        self._on_publication(st, ch, pub)
+                    log.info("ws_recovered url=%s channel=%s publications=%d", st.url, ch, len(pubs))
+                else:
+                    # History gone (too old, or the stream epoch changed): resync from a snapshot.
+                    st.recovery_failed += 1
+                    self._snapshot_now.set()
+                    log.warning("ws_recovery_failed url=%s channel=%s", st.url, ch, extra={"endpoint": st.url})
+            if epoch is not None and sub.get("recoverable"):
+                offset = int(sub.get("offset") or 0)
+                if known is None or known[0] != epoch or offset > known[1]:
+                    self._positions[ch] = (str(epoch), offset)
+
+    def _on_publication(self, st: EndpointStats, channel: str, pub: Dict[str, Any]) -> None:
+        data = pub.get("data")
+        if not isinstance(data, dict):
+            return
+        self._advance(channel, pub.get("offset"))
+        if not self._first_delivery(st, data, int(time.time() * 1000)):
+            return
+
+        # Expected delta payload: {e, t, d:[[sym,score],...]}
+        epoch = data.get("e")
+        ts = data.get("t")
+        d = data.get("d") or []
+        epoch = int(epoch) if epoch is not None else None
+        if epoch is not None and self.epoch is not None and epoch != self.epoch and not self.provisional:
+            # New epoch: the stream restarted; only a snapshot says which symbols remain.
+            log.info("epoch_changed old=%s new=%s", self.epoch, epoch)
+            self._snapshot_now.set()
+        self._validate_epoch(epoch)
+        self._apply_delta(d, epoch, int(ts) if ts is not None else None)
+
+    async def _refresh_loop(self, ws: Any, ttl_s: float) -> None:
+        """Refresh the connection token before the server expires it."""
+        rid = _CONNECT_ID
+        while True:
+            await asyncio.sleep(max(5.0, ttl_s * 0.8))
+            token = await self._refresh_token(self.token)
+            rid += 1
+            await ws.send(json.dumps({"id": rid, "refresh": {"token": token}}))
+
+    # --- WebSocket loop ------------------------------------------------------------
+
+    async def _ws_loop(self, st: EndpointStats) -> None:
+        # Centrifugo client protocol (JSON). If the protocol changes, we keep
+        # working via snapshot polling.
         backoff = 2.0
         while not self._stop.is_set():
+            refresher: Optional[asyncio.Task] = None
+            token = self.token
+            if not token and self.token_provider is not None:
+                token = await self._refresh_token(token)
             try:
-                async with websockets.connect(self.ws_url, ping_interval=20, ping_timeout=20) as ws:
-                    self._ws_ok = True
-                    backoff = 2.0
-                    # connect
-                    await ws.send(json.dumps({"id": 1, "connect": {"token": self.token, "name": "thecouncilai-bot"}}))
-                    log.info("ws_connected")
+                async with websockets.connect(st.url, ping_interval=20, ping_timeout=20) as ws:
+                    await ws.send(json.dumps(self._connect_cmd()))
 
                     while not self._stop.is_set():
                         raw = await ws.recv()
                         msg = json.loads(raw)
 
-                        # Ping handling (protocol tolerant)
+                        # Server ping is an empty object; reply in kind. Older servers send {"ping": ...}.
+                        if not msg:
+                            await ws.send("{}")
+                            continue
                         if "ping" in msg:
                             mid = msg.get("id")
                             if mid is not None:
                                 await ws.send(json.dumps({"id": mid, "pong": {}}))
                             continue
 
+                        if msg.get("id") == _CONNECT_ID:
+                            err = msg.get("error")
+                            if err:
+                                raise _ConnectError(int(err.get("code") or 0), str(err.get("message") or ""))
+                            result = msg.get("connect") or {}
+                            st.connected = True
+                            st.connects += 1
+                            backoff = 2.0
+                            log.info("ws_connected url=%s", st.url)
+                            self._on_connect_reply(st, result)
+                            if result.get("expires") and result.get("ttl") and self.token_provider is not None:
+                                refresher = asyncio.create_task(self._refresh_loop(ws, float(result["ttl"])))
+                            continue
+                        if msg.get("error"):
+                            log.warning("ws_command_error url=%s err=%s", st.url, msg["error"], extra={"endpoint": st.url})
+                            continue
+
                         # Publications can arrive as push->pub or push->publication.
                         push = msg.get("push")
                         if not push:
                             continue
-
                         pub = push.get("pub") or push.get("publication")
-                        if not pub:
-                            continue
-
-                        data = pub.get("data")
-                        if not isinstance(data, dict):
-                            continue
-
-                        # Expected delta payload: {e, t, d:[[sym,score],...]}
-                        epoch = data.get("e")
-                        ts = data.get("t")
-                        d = data.get("d") or []
-                        for sym, sc in d:
-                            self.scores[str(sym).upper()] = int(sc)
-                        if epoch is not None:
-                            self.epoch = int(epoch)
-                        if ts is not None:
-                            self.last_update_ms = int(ts)
+                        if pub:
+                            self._on_publication(st, str(push.get("channel") or ""), pub)
 
             except asyncio.CancelledError:
                 return
             except Exception as e:
-                self._ws_ok = False
-                log.warning("ws_failed err=%s", e)
+                st.connected = False
+                code = e.code if isinstance(e, _ConnectError) else getattr(getattr(e, "rcvd", None), "code", None)
+                if code in _TOKEN_EXPIRED_CODES and self.token_provider is not None:
+                    # Expired token: with a new one, reconnect at once (recovery fills the
+                    # gap); if the refresh failed or gave the same token, back off as usual.
+                    fresh = await self._refresh_token(token)
+                    log.info(
+                        "ws_token_expired url=%s code=%s refreshed=%s", st.url, code, fresh != token,
+                        extra={"endpoint": st.url},
+                    )
+                    if fresh and fresh != token:
+                        continue
+                log.warning("ws_failed url=%s err=%s", st.url, e, extra={"endpoint": st.url})
                 await asyncio.sleep(backoff)
                 backoff = min(60.0, backoff * 1.8)
+            finally:
+                st.connected = False
+                if refresher is not None:
+                    refresher.cancel()
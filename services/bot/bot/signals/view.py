@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+# An overlay larger than this (or than 1/8 of the base) is folded into a new base.
+_MIN_COMPACT = 256
+
+
+class ScoreView(Mapping[str, int]):
+    """Immutable symbol -> score map for one feed version.
+
+    A view is a shared base dict plus a small overlay of later changes
+    (`None` marks a removed symbol). Neither is mutated once published, so
+    the next version copies only the overlay, and a reader that holds a view
+    sees one consistent, epoch-stamped version with no locks while the feed
+    publishes newer ones.
+    """
+
+    __slots__ = ("version", "epoch", "ts_ms", "provisional", "_base", "_over", "_len")
+
+    def __init__(
+        self,
+        version: int = 0,
+        epoch: Optional[int] = None,
+        ts_ms: Optional[int] = None,
+        base: Optional[Dict[str, int]] = None,
+        over: Optional[Dict[str, Optional[int]]] = None,
+        provisional: bool = False,
+        size: Optional[int] = None,
+    ):
+        self.version = version
+        self.epoch = epoch
+        self.ts_ms = ts_ms
+        self.provisional = provisional
+        self._base: Dict[str, int] = base if base is not None else {}
+        self._over: Dict[str, Optional[int]] = over if over is not None else {}
+        self._len = size if size is not None else len(self._base)
+
+    # --- Mapping -----------------------------------------------------------------
+
+    def __getitem__(self, symbol: str) -> int:
+        over = self._over
+        if symbol in over:
+            v = over[symbol]
+            if v is None:
+                raise KeyError(symbol)
+            return v
+        return self._base[symbol]
+
+    def get(self, symbol: str, default: Optional[int] = None) -> Optional[int]:  # type: ignore[override]
+        over = self._over
+        if symbol in over:
+            v = over[symbol]
+            return default if v is None else v
+        return self._base.get(symbol, default)
+
+    def __contains__(self, symbol: object) -> bool:
+        over = self._over
+        if symbol in over:
+            return over[symbol] is not None  # type: ignore[index]
+        return symbol in self._base
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        for sym, _ in self.items():
+            yield sym
+
+    def items(self) -> Iterator[Tuple[str, int]]:  # type: ignore[override]
+        over = self._over
+        if not over:
+            yield from self._base.items()
+            return
+        for sym, sc in self._base.items():
+            if sym not in over:
+                yield sym, sc
+        for sym, v in over.items():
+            if v is not None:
+                yield sym, v
+
+    def values(self) -> Iterator[int]:  # type: ignore[override]
+        for _, sc in self.items():
+            yield sc
+
+    # --- new versions --------------------------------------------------------------
+
+    def with_changes(
+        self,
+        changes: Mapping[str, Optional[int]],
+        epoch: Optional[int],
+        ts_ms: Optional[int],
+        provisional: Optional[bool] = None,
+    ) -> "ScoreView":
+        """Next version with `changes` applied (`None` removes a symbol)."""
+        over = dict(self._over)
+        size = self._len
+        for sym, sc in changes.items():
+            had = sym in self
+            if sc is None:
+                if had:
+                    over[sym] = None
+                    size -= 1
+                continue
+            if not had:
+                size += 1
+            over[sym] = sc
+        base = self._base
+        if len(over) > max(_MIN_COMPACT, len(base) // 8):
+            base = dict(base)
+            for sym, v in over.items():
+                if v is None:
+                    base.pop(sym, None)
+                else:
+                    base[sym] = v
+            over = {}
+        return ScoreView(
+            self.version + 1,
+            self.epoch if epoch is None else epoch,
+            self.ts_ms if ts_ms is None else ts_ms,
+            base,
+            over,
+            self.provisional if provisional is None else provisional,
+            size,
+        )
+
+    def replaced(self, scores: Dict[str, int], epoch: Optional[int], ts_ms: Optional[int], provisional: bool = False) -> "ScoreView":
+        """Next version holding exactly `scores` (a full snapshot); takes ownership of the dict."""
+        return ScoreView(
+            self.version + 1,
+            self.epoch if epoch is None else epoch,
+            self.ts_ms if ts_ms is None else ts_ms,
+            scores,
+            None,
+            provisional,
+        )
+
+    def restamped(self, provisional: bool) -> "ScoreView":
+        """Same scores and version with a different provisional flag."""
+        return ScoreView(self.version, self.epoch, self.ts_ms, self._base, self._over, provisional, self._len)
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import struct
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from enum import IntEnum
+from pathlib import Path
+from typing import Container, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from bot.config import state_dir
+
+log = logging.getLogger("bot.decisions")
+
+# Fixed little-endian layout; day files are a header followed by packed records.
+#   header: magic(4s) version(H) record_size(H)
+#   record: ts_ms(q) tick_id(I) symbol(12s) action(B) gate(B) score(h) threshold(h)
+#           conf_age_s(f) conf_need_s(f) price(f) qty(f) weight(f) aux(f) pad(2x)
+_MAGIC = b"TCDL"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+_RECORD = struct.Struct("<qI12sBBhh6f2x")
+
+_DAY_MS = 86_400_000
+
+
+class Action(IntEnum):
+    SKIP = 0
+    ENTER = 1
+    EXIT = 2
+    ROTATE_OUT = 3
+
+
+class Gate(IntEnum):
+    """Why a candidate was (not) acted on. OK means the action went through."""
+
+    OK = 0
+    CONFIRMING = 1        # above entry, confirmation window not reached
+    COOLDOWN = 2
+    NO_SLOT = 3           # ranked below the free slots
+    NO_PRICE = 4
+    SIZING = 5            # dropped by the allocator (budget / min notional)
+    ROTATION_NO_GAIN = 6  # book full, no swap beats costs + margin
+    ORDER_FAILED = 7
+    SCORE_EXIT = 8
+    SYMBOL_MISSING = 9
+    ROTATE = 10
+    PANIC = 11
+    DRAWDOWN = 12
+    SIGNAL_STALE = 13
+    OTHER = 15
+
+
+def gate_for_exit_reason(reason: str) -> Gate:
+    for prefix, gate in (
+        ("score_exit", Gate.SCORE_EXIT),
+        ("symbol_missing", Gate.SYMBOL_MISSING),
+        ("rotate", Gate.ROTATE),
+        ("panic", Gate.PANIC),
+        ("daily_drawdown", Gate.DRAWDOWN),
+        ("signal_stale", Gate.SIGNAL_STALE),
+    ):
+        if reason.startswith(prefix):
+            return gate
+    return Gate.OTHER
+
+
+@dataclass(frozen=True)
+class Decision:
+    ts_ms: int
+    tick_id: int
+    symbol: str
+    action: Action
+    gate: Gate
+    score: Optional[int]
+    threshold: Optional[int]
+    conf_age_s: Optional[float]
+    conf_need_s: Optional[float]
+    price: float
+    qty: float
+    weight: float
+    aux: float  # gate-specific: rotation net benefit ($), sizing notional offered ($)
+
+
+def decisions_dir() -> Path:
+    d = state_dir() / "decisions"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _day_path(day: str) -> Path:
+    return decisions_dir() / f"decisions-{day}.bin"
+
+
+def _utc_day(ts_ms: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts_ms / 1000))
+
+
+def _opt_int(v: int) -> Optional[int]:
+    return None if v < 0 else int(v)
+
+
+def _opt_float(v: float) -> Optional[float]:
+    return None if v < 0 else round(float(v), 1)
+
+
+def _unpack(buf: bytes, off: int) -> Decision:
+    ts, tick, sym, action, gate, score, th, age, need, px, qty, w, aux = _RECORD.unpack_from(buf, off)
+    return Decision(
+        ts_ms=ts, tick_id=tick, symbol=sym.rstrip(b"\0").decode("ascii", "replace"),
+        action=Action(action), gate=Gate(gate) if gate in Gate._value2member_map_ else Gate.OTHER,
+        score=_opt_int(score), threshold=_opt_int(th),
+        conf_age_s=_opt_float(age), conf_need_s=_opt_float(need),
+        price=px, qty=qty, weight=w, aux=aux,
+    )
+
+
+class DecisionLog:
+    """Per-tick decision trace in a preallocated ring, flushed to daily files.
+
+    `record` packs one fixed-size record into the ring (no allocation beyond
+    the struct call). Repeated SKIPs with the same gate are only re-recorded
+    every `heartbeat_s`, so a candidate waiting out a confirmation window
+    costs one record per minute, not one per tick. If the ring fills up before
+    a flush, the oldest unflushed records are overwritten and counted.
+    """
+
+    def __init__(self, capacity: int = 8192, heartbeat_s: float = 60.0):
+        self.capacity = max(64, int(capacity))
+        self.heartbeat_ms = int(heartbeat_s * 1000)
+        self._buf = bytearray(_RECORD.size * self.capacity)
+        self._head = 0  # next slot to write
+        self._pending = 0
+        self._last_skip: Dict[str, Tuple[int, int]] = {}  # symbol -> (gate, ts_ms)
+        self.tick_id = 0
+        self._flush_now = asyncio.Event()
+        self.stats = {"recorded": 0, "deduped": 0, "overwritten": 0, "flushed": 0}
+
+    def record(
+        self,
+        ts_ms: int,
+        symbol: str,
+        action: Action,
+        gate: Gate,
+        score: Optional[int] = None,
+        threshold: Optional[float] = None,
+        conf_age_s: Optional[float] = None,
+        conf_need_s: Optional[float] = None,
+        price: Optional[float] = None,
+        qty: float = 0.0,
+        weight: float = 0.0,
+        aux: float = 0.0,
+    ) -> None:
+        if action == Action.SKIP:
+            last = self._last_skip.get(symbol)
+            if last is not None and last[0] == gate and ts_ms - last[1] < self.heartbeat_ms:
+                self.stats["deduped"] += 1
+                return
+            self._last_skip[symbol] = (int(gate), ts_ms)
+        else:
+            self._last_skip.pop(symbol, None)
+
+        _RECORD.pack_into(
+            self._buf, self._head * _RECORD.size,
+            int(ts_ms), self.tick_id & 0xFFFFFFFF, symbol.encode("ascii", "replace")[:12],
+            int(action), int(gate),
+            -1 if score is None else max(-1, min(32767, int(score))),
+            -1 if threshold is None else int(threshold),
+            -1.0 if conf_age_s is None else float(conf_age_s),
+            -1.0 if conf_need_s is None else float(conf_need_s),
+            float(price or 0.0), float(qty), float(weight), float(aux),
+        )
+        self._head = (self._head + 1) % self.capacity
+        if self._pending == self.capacity:
+            self.stats["overwritten"] += 1
+        else:
+            self._pending += 1
+            if self._pending * 4 >= self.capacity * 3:
+                self._flush_now.set()
+        self.stats["recorded"] += 1
+
+    def retain(self, symbols: Container[str]) -> None:
+        """Drop dedup state for symbols no longer tracked (keeps the map bounded)."""
+        for s in [s for s in self._last_skip if s not in symbols]:
+            del self._last_skip[s]
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def take(self) -> bytes:
+        """Unflushed records, oldest first; the ring is marked empty."""
+        n = self._pending
+        if n == 0:
+            return b""
+        start = (self._head - n) % self.capacity
+        size = _RECORD.size
+        if start + n <= self.capacity:
+            out = bytes(self._buf[start * size:(start + n) * size])
+        else:
+            out = bytes(self._buf[start * size:]) + bytes(self._buf[:self._head * size])
+        self._pending = 0
+        self.stats["flushed"] += n
+        return out
+
+    async def run(self, flush_s: float = 30.0, retention_days: int = 14) -> None:
+        last_prune: Optional[float] = None
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), timeout=flush_s)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_now.clear()
+                try:
+                    data = self.take()
+                    if data:
+                        await asyncio.to_thread(append_records, data)
+                    if last_prune is None or time.monotonic() - last_prune > 3600:
+                        last_prune = time.monotonic()
+                        await asyncio.to_thread(prune_days, retention_days)
+                except Exception as e:
+                    log.warning("decision_flush_failed err=%s", e)
+        finally:
+            # Shutdown: keep what is still in the ring.
+            try:
+                append_records(self.take())
+            except Exception as e:
+                log.warning("decision_flush_failed err=%s", e)
+
+
+def append_records(data: bytes) -> None:
+    """Append packed records to their UTC day files."""
+    size = _RECORD.size
+    by_day: Dict[str, List[bytes]] = {}
+    for off in range(0, len(data), size):
+        ts = struct.unpack_from("<q", data, off)[0]
+        by_day.setdefault(_utc_day(ts), []).append(data[off:off + size])
+    for day, chunks in by_day.items():
+        p = _day_path(day)
+        new = not p.exists()
+        with open(p, "ab") as f:
+            if new:
+                f.write(_HEADER.pack(_MAGIC, _VERSION, _RECORD.size))
+            f.write(b"".join(chunks))
+
+
+def prune_days(retention_days: int) -> None:
+    if retention_days <= 0:
+        return
+    cutoff = _utc_day(int(time.time() * 1000) - retention_days * _DAY_MS)
+    for p in decisions_dir().glob("decisions-*.bin"):
+        if p.name[len("decisions-"):-len(".bin")] < cutoff:
+            p.unlink(missing_ok=True)
+
+
+def _read_day(day: str) -> bytes:
+    p = _day_path(day)
+    if not p.exists():
+        return b""
+    data = p.read_bytes()
+    if len(data) < _HEADER.size:
+        return b""
+    magic, version, rsize = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _VERSION or rsize != _RECORD.size:
+        log.warning("decision_file_unsupported path=%s", p)
+        return b""
+    body = data[_HEADER.size:]
+    return body[: len(body) - len(body) % _RECORD.size]
+
+
+def query(symbol: Optional[str], since_ms: int, until_ms: int) -> Iterator[Decision]:
+    """Decisions in [since_ms, until_ms), oldest first.
+
+    For a symbol query, the last record before `since_ms` (same or previous
+    day) is yielded first, since deduplicated SKIPs may have started earlier.
+    """
+    sym = symbol.upper().encode("ascii", "replace")[:12].ljust(12, b"\0") if symbol else None
+    size = _RECORD.size
+    first = since_ms // _DAY_MS - (1 if sym else 0)
+    last = (until_ms - 1) // _DAY_MS
+    before: Optional[Decision] = None
+    for day_n in range(first, last + 1):
+        data = _read_day(_utc_day(day_n * _DAY_MS))
+        for off in range(0, len(data), size):
+            if sym is not None and data[off + 12:off + 24] != sym:
+                continue
+            ts = struct.unpack_from("<q", data, off)[0]
+            if ts < since_ms:
+                if sym is not None:
+                    before = _unpack(data, off)
+                continue
+            if ts >= until_ms:
+                continue
+            if before is not None:
+                yield before
+                before = None
+            yield _unpack(data, off)
+    if before is not None:
+        yield before
+
+
+# --- CLI: python -m bot.main why SYMBOL [--since ...] [--until ...] ---------------
+
+
+def _parse_time(s: str, default_day: datetime) -> datetime:
+    s = s.strip()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(s, fmt).replace(tzinfo=default_day.tzinfo)
+        except ValueError:
+            pass
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            t = datetime.strptime(s, fmt)
+            return default_day.replace(hour=t.hour, minute=t.minute, second=t.second, microsecond=0)
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognised time {s!r}")
+
+
+def _fmt(d: Decision, tz: Optional[timezone]) -> str:
+    ts = datetime.fromtimestamp(d.ts_ms / 1000, tz).strftime("%Y-%m-%d %H:%M:%S")
+    parts = [ts, f"{d.symbol:<6}", f"{d.action.name.lower():<10}", f"{d.gate.name.lower():<16}"]
+    if d.score is not None:
+        parts.append(f"score={d.score}" + (f"/{d.threshold}" if d.threshold is not None else ""))
+    if d.conf_age_s is not None:
+        parts.append(f"confirm={d.conf_age_s:.0f}s" + (f"/{d.conf_need_s:.0f}s" if d.conf_need_s is not None else ""))
+    if d.price:
+        parts.append(f"px={d.price:.2f}")
+    if d.qty:
+        parts.append(f"qty={d.qty:g}")
+    if d.weight:
+        parts.append(f"w={d.weight:.3f}")
+    if d.aux:
+        parts.append(f"aux={d.aux:.2f}")
+    parts.append(f"tick={d.tick_id}")
+    return " ".join(parts)
+
+
+def run_why_cli(argv: Sequence[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="bot.main why",
+        description="Show the engine's recorded decisions for a symbol (or all symbols with '*').",
+    )
+    ap.add_argument("symbol")
+    ap.add_argument("--since", help="'HH:MM', 'YYYY-MM-DD HH:MM' or a date (default: 1 hour ago)")
+    ap.add_argument("--until", help="same formats (default: now)")
+    ap.add_argument("--utc", action="store_true", help="read and print times in UTC (default: local time)")
+    args = ap.parse_args(list(argv))
+
+    tz = timezone.utc if args.utc else None
+    now = datetime.now(timezone.utc) if args.utc else datetime.now().astimezone()
+    try:
+        since = _parse_time(args.since, now) if args.since else now - timedelta(hours=1)
+        until = _parse_time(args.until, now) if args.until else now
+    except ValueError as e:
+        print(e)
+        return 2
+    if args.until and len(args.until.strip()) == 10:
+        until += timedelta(days=1)  # a bare date means the whole day
+
+    symbol = None if args.symbol == "*" else args.symbol
+    n = 0
+    for d in query(symbol, int(since.timestamp() * 1000), int(until.timestamp() * 1000)):
+        print(_fmt(d, tz))
+        n += 1
+    if n == 0:
+        print(
+            f"no decisions for {args.symbol} between {since:%Y-%m-%d %H:%M} and {until:%Y-%m-%d %H:%M} "
+            "(below the entry threshold or not in the feed)"
+        )
+    return 0
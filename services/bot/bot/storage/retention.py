@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from bot.config import state_dir
+from bot.settings import runtime_settings
+from bot.storage.trades_db import OUTBOX_MAX_AGE_MS, _db_path, _utc_day, outbox_prune
+
+log = logging.getLogger("bot.retention")
+
+_DAY_MS = 86_400_000
+
+
+def archive_dir() -> Path:
+    d = state_dir() / "archive"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _archive_path(day: str) -> Path:
+    return archive_dir() / f"trades-{day}.jsonl.gz"
+
+
+def _read_archive(day: str) -> List[Dict[str, Any]]:
+    p = _archive_path(day)
+    if not p.exists():
+        return []
+    with gzip.open(p, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_archive(day: str, rows: List[Dict[str, Any]]) -> None:
+    p = _archive_path(day)
+    tmp = p.with_suffix(".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=9) as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(",", ":")))
+            f.write("\n")
+    os.replace(tmp, p)
+
+
+def archived_days() -> List[str]:
+    """UTC days with an archive file, newest first."""
+    out = []
+    for p in archive_dir().glob("trades-*.jsonl.gz"):
+        out.append(p.name[len("trades-"):-len(".jsonl.gz")])
+    return sorted(out, reverse=True)
+
+
+def iter_archived_trades(
+    until_ms: Optional[int] = None,
+    since_ms: Optional[int] = None,
+    symbol: Optional[str] = None,
+    reason: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Archived trades newest first, in the same row shape as `get_trades_page`.
+
+    Only the day files overlapping [since_ms, until_ms) are opened.
+    """
+    until_day = _utc_day(until_ms) if until_ms is not None else None
+    since_day = _utc_day(since_ms) if since_ms is not None else None
+    sym = symbol.upper() if symbol else None
+    for day in archived_days():
+        if until_day is not None and day > until_day:
+            continue
+        if since_day is not None and day < since_day:
+            break
+        rows = _read_archive(day)
+        rows.sort(key=lambda r: (int(r["timestamp"]), int(r["id"])), reverse=True)
+        for r in rows:
+            ts = int(r["timestamp"])
+            if until_ms is not None and ts >= until_ms:
+                continue
+            if since_ms is not None and ts < since_ms:
+                continue
+            if sym and r.get("symbol") != sym:
+                continue
+            if reason and r.get("reason") != reason:
+                continue
+            yield r
+
+
+class TradeRetention:
+    """Keeps `trades.sqlite` small on long-running installs.
+
+    Trades older than `retention_days` (whole UTC days) are moved into
+    `archive/trades-YYYY-MM-DD.jsonl.gz`, then deleted from the live table.
+    The `pnl_daily` rollup rows and open `lots` are kept, so PnL history and FIFO
+    matching are unaffected. Freed pages are returned with incremental vacuum.
+    Expired outbox events are pruned here too, since the sender that normally
+    prunes them only runs when a messenger is paired.
+    """
+
+    def __init__(self, retention_days: Optional[int] = None, interval_s: Optional[float] = None):
+        cfg = runtime_settings()
+        self.retention_days = int(retention_days if retention_days is not None else cfg.trades_retention_days)
+        self.interval_s = float(interval_s if interval_s is not None else cfg.retention_interval_seconds)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                log.warning("retention_failed err=%s", e)
+            await asyncio.sleep(self.interval_s)
+
+    def run_once(self, now_ms: Optional[int] = None) -> Dict[str, Any]:
+        p = _db_path()
+        if not p.exists():
+            return {"archived": 0}
+
+        now_ms = int(now_ms if now_ms is not None else time.time() * 1000)
+        dropped = outbox_prune(now_ms - OUTBOX_MAX_AGE_MS)
+        if dropped:
+            log.warning("outbox_expired dropped=%d", dropped)
+        if self.retention_days <= 0:
+            return {"archived": 0}
+
+        cutoff_ms = (now_ms // _DAY_MS - self.retention_days) * _DAY_MS
+
+        con = sqlite3.connect(p)
+        con.row_factory = sqlite3.Row
+        try:
+            self._ensure_incremental_vacuum(con)
+
+            rows = con.execute(
+                """
+                SELECT id, ts_ms as timestamp, symbol, side, qty, score,
+                       price_est as price, reason, broker, mode, pnl
+                FROM trades WHERE ts_ms < ? ORDER BY ts_ms, id
+                """,
+                (cutoff_ms,),
+            ).fetchall()
+            if not rows:
+                return {"archived": 0}
+
+            by_day: Dict[str, List[Dict[str, Any]]] = {}
+            for r in rows:
+                by_day.setdefault(_utc_day(int(r["timestamp"])), []).append(dict(r))
+
+            # Archive files are written (and merged by id) before any delete,
+            # so a crash in between only leaves duplicates that the next run merges.
+            for day, day_rows in by_day.items():
+                merged = {int(r["id"]): r for r in _read_archive(day)}
+                for r in day_rows:
+                    merged[int(r["id"])] = r
+                _write_archive(day, sorted(merged.values(), key=lambda r: (int(r["timestamp"]), int(r["id"]))))
+
+            with con:
+                con.execute("DELETE FROM trades WHERE ts_ms < ?", (cutoff_ms,))
+            con.execute("PRAGMA incremental_vacuum")
+
+            log.info("retention_archived trades=%d days=%d cutoff_day=%s", len(rows), len(by_day), _utc_day(cutoff_ms))
+            return {"archived": len(rows), "days": sorted(by_day)}
+        finally:
+            con.close()
+
+    @staticmethod
+    def _ensure_incremental_vacuum(con: sqlite3.Connection) -> None:
+        # auto_vacuum can only change on an empty DB or via a full VACUUM (one-off).
+        mode = int(con.execute("PRAGMA auto_vacuum").fetchone()[0])
+        if mode != 2:
+            con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            con.execute("VACUUM")
+            log.info("retention_vacuum_mode_incremental")
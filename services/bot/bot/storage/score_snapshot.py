@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+from bot.config import state_dir
+
+# Fixed little-endian layout so the file can be mapped and scanned without parsing:
+#   header: magic(4s) version(H) reserved(H) epoch(q) ts_ms(q) count(I)
+#   record: symbol(12s, ASCII, NUL-padded) score(h)
+_MAGIC = b"TCSS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHqqI")
+_RECORD = struct.Struct("<12sh")
+_NO_EPOCH = -1
+
+
+@dataclass
+class ScoreSnapshot:
+    epoch: Optional[int]
+    ts_ms: Optional[int]
+    scores: Dict[str, int]
+
+
+def snapshot_path() -> Path:
+    return state_dir() / "scores.snap"
+
+
+def save_snapshot(path: Path, epoch: Optional[int], ts_ms: Optional[int], scores: Mapping[str, int]) -> None:
+    items = [(s, sc) for s, sc in scores.items() if len(s) <= 12]
+    buf = bytearray(_HEADER.size + _RECORD.size * len(items))
+    _HEADER.pack_into(
+        buf, 0, _MAGIC, _VERSION, 0,
+        _NO_EPOCH if epoch is None else int(epoch),
+        0 if ts_ms is None else int(ts_ms),
+        len(items),
+    )
+    off = _HEADER.size
+    for sym, sc in items:
+        _RECORD.pack_into(buf, off, sym.encode("ascii", "replace"), max(-32768, min(32767, int(sc))))
+        off += _RECORD.size
+
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(buf)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: Path) -> Optional[ScoreSnapshot]:
+    """Load a snapshot via mmap; returns None if missing or malformed."""
+    try:
+        if not path.exists() or path.stat().st_size < _HEADER.size:
+            return None
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, _, epoch, ts_ms, count = _HEADER.unpack_from(mm, 0)
+            if magic != _MAGIC or version != _VERSION:
+                return None
+            if len(mm) < _HEADER.size + count * _RECORD.size:
+                return None
+            scores: Dict[str, int] = {}
+            for i in range(count):
+                raw, sc = _RECORD.unpack_from(mm, _HEADER.size + i * _RECORD.size)
+                scores[raw.rstrip(b"\0").decode("ascii", "replace")] = int(sc)
+        return ScoreSnapshot(
+            epoch=None if epoch == _NO_EPOCH else int(epoch),
+            ts_ms=int(ts_ms) or None,
+            scores=scores,
+        )
+    except (OSError, ValueError, struct.error):
+        return None
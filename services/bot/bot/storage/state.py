@@ -18,14 +18,16 @@ def _state_path() -> Path:
     return state_dir() / "runtime_state.json"
 
 
+def _timers_path() -> Path:
+    return state_dir() / "timers.json"
+
+
 def load_state() -> Dict[str, Any]:
     p = _state_path()
     if not p.exists():
         return {
             "v": 1,
             "positions": {},
-            "cooldowns": {},
-            "opened_at_ms": {},
             "day": {},
             "health": {},
         }
@@ -36,8 +38,6 @@ def load_state() -> Dict[str, Any]:
         return {
             "v": 1,
             "positions": {},
-            "cooldowns": {},
-            "opened_at_ms": {},
             "day": {},
             "health": {},
         }
@@ -68,3 +68,26 @@ def save_state(state: Dict[str, Any]) -> None:
         os.chmod(p, 0o600)
     except Exception:
         pass
+
+
+def load_timers() -> Optional[Dict[str, Dict[str, int]]]:
+    """Per-kind symbol timers (see bot.strategy.timers); None if never saved."""
+    p = _timers_path()
+    if not p.exists():
+        return None
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def save_timers(timers: Dict[str, Dict[str, int]]) -> None:
+    """Written only when a timer changed, unlike the per-tick runtime state."""
+    p = _timers_path()
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(timers, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, p)
+    try:
+        os.chmod(p, 0o600)
+    except Exception:
+        pass
@@ -1,21 +1,31 @@
 from __future__ import annotations
 
+import json
 import sqlite3
 import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from bot.config import state_dir
 
+# Undelivered outbox events older than this are dropped (the app can page trade history).
+OUTBOX_MAX_AGE_MS = 7 * 86_400_000
+
 
 def _db_path() -> Path:
     return state_dir() / "trades.sqlite"
 
 
+def _utc_day(ts_ms: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts_ms / 1000.0))
+
+
 def init_db() -> None:
     p = _db_path()
     con = sqlite3.connect(p)
     try:
+        # Only takes effect on a fresh file; retention converts existing ones.
+        con.execute("PRAGMA auto_vacuum=INCREMENTAL")
         con.execute(
             """
             CREATE TABLE IF NOT EXISTS trades (
@@ -28,16 +38,177 @@ def init_db() -> None:
               price_est REAL,
               reason TEXT,
               broker TEXT,
-              mode TEXT
+              mode TEXT,
+              pnl REAL,
+              order_id TEXT,
+              latency_json TEXT
+            );
+            """
+        )
+        # Open FIFO lots (remaining quantity of each BUY not yet matched by a SELL).
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lots (
+              trade_id INTEGER PRIMARY KEY,
+              symbol TEXT NOT NULL,
+              ts_ms INTEGER NOT NULL,
+              qty_open REAL NOT NULL,
+              price REAL
+            );
+            """
+        )
+        # Incrementally maintained rollup: one row per UTC day and symbol.
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pnl_daily (
+              day TEXT NOT NULL,
+              symbol TEXT NOT NULL,
+              realized_pnl REAL NOT NULL DEFAULT 0,
+              buys INTEGER NOT NULL DEFAULT 0,
+              sells INTEGER NOT NULL DEFAULT 0,
+              buy_notional REAL NOT NULL DEFAULT 0,
+              sell_notional REAL NOT NULL DEFAULT 0,
+              PRIMARY KEY (day, symbol)
+            );
+            """
+        )
+
+        # Durable outbox of app notifications (trade events), written in the same
+        # transaction as the trade and drained by bot.control.outbox.
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              ts_ms INTEGER NOT NULL,
+              message_json TEXT NOT NULL,
+              attempts INTEGER NOT NULL DEFAULT 0,
+              next_attempt_ms INTEGER NOT NULL DEFAULT 0,
+              last_error TEXT
             );
             """
         )
+
+        cols = {row[1] for row in con.execute("PRAGMA table_info(trades)")}
+        migrated = False
+        if "pnl" not in cols:
+            con.execute("ALTER TABLE trades ADD COLUMN pnl REAL")
+            migrated = True
+        # Order lifecycle timing (bot.strategy.latency); no backfill needed.
+        if "order_id" not in cols:
+            con.execute("ALTER TABLE trades ADD COLUMN order_id TEXT")
+        if "latency_json" not in cols:
+            con.execute("ALTER TABLE trades ADD COLUMN latency_json TEXT")
+
         con.execute("CREATE INDEX IF NOT EXISTS idx_trades_ts ON trades(ts_ms)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_trades_symbol_ts ON trades(symbol, ts_ms)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_trades_reason_ts ON trades(reason, ts_ms)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_trades_order_id ON trades(order_id)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_lots_symbol_ts ON lots(symbol, ts_ms)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_pnl_daily_symbol ON pnl_daily(symbol, day)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_outbox_next ON outbox(next_attempt_ms, id)")
+
+        if migrated:
+            _rebuild_derived(con)
         con.commit()
     finally:
         con.close()
 
 
+def _rebuild_derived(con: sqlite3.Connection) -> None:
+    """One-off backfill of lots, per-SELL pnl and rollups from existing trades."""
+    con.execute("DELETE FROM lots")
+    con.execute("DELETE FROM pnl_daily")
+    rows = con.execute("SELECT id, ts_ms, symbol, side, qty, price_est FROM trades ORDER BY ts_ms, id").fetchall()
+    for trade_id, ts_ms, symbol, side, qty, price in rows:
+        qty_eff, pnl = _apply_fifo(con, trade_id, int(ts_ms), symbol, side, float(qty), price)
+        if side == "SELL":
+            con.execute("UPDATE trades SET qty=?, pnl=? WHERE id=?", (qty_eff, pnl, trade_id))
+        _bump_rollup(con, int(ts_ms), symbol, side, qty_eff, price, pnl)
+
+
+def _apply_fifo(
+    con: sqlite3.Connection,
+    trade_id: int,
+    ts_ms: int,
+    symbol: str,
+    side: str,
+    qty: float,
+    price: Optional[float],
+) -> Tuple[float, Optional[float]]:
+    """Update open lots for one trade. Returns (effective qty, realized pnl).
+
+    A SELL with qty <= 0 (full close of unknown size) consumes every open lot.
+    Realized pnl is None when the sell price or a matched lot price is unknown.
+    """
+    if side != "SELL":
+        con.execute(
+            "INSERT INTO lots(trade_id,symbol,ts_ms,qty_open,price) VALUES(?,?,?,?,?)",
+            (trade_id, symbol, ts_ms, qty, price),
+        )
+        return qty, None
+
+    remaining = qty if qty > 0 else float("inf")
+    matched = 0.0
+    pnl: Optional[float] = 0.0
+    lots = con.execute(
+        "SELECT trade_id, qty_open, price FROM lots WHERE symbol=? ORDER BY ts_ms, trade_id",
+        (symbol,),
+    ).fetchall()
+    for lot_id, lot_qty, lot_price in lots:
+        if remaining <= 0:
+            break
+        take = min(float(lot_qty), remaining)
+        if price is None or lot_price is None:
+            pnl = None
+        elif pnl is not None:
+            pnl += take * (float(price) - float(lot_price))
+        matched += take
+        remaining -= take
+        left = float(lot_qty) - take
+        if left <= 1e-9:
+            con.execute("DELETE FROM lots WHERE trade_id=?", (lot_id,))
+        else:
+            con.execute("UPDATE lots SET qty_open=? WHERE trade_id=?", (left, lot_id))
+
+    if matched <= 0:
+        return max(qty, 0.0), None
+    return (qty if qty > 0 else matched), (round(pnl, 6) if pnl is not None else None)
+
+
+def _bump_rollup(
+    con: sqlite3.Connection,
+    ts_ms: int,
+    symbol: str,
+    side: str,
+    qty: float,
+    price: Optional[float],
+    pnl: Optional[float],
+) -> None:
+    notional = float(qty) * float(price) if price is not None else 0.0
+    is_sell = side == "SELL"
+    con.execute(
+        """
+        INSERT INTO pnl_daily(day,symbol,realized_pnl,buys,sells,buy_notional,sell_notional)
+        VALUES(?,?,?,?,?,?,?)
+        ON CONFLICT(day,symbol) DO UPDATE SET
+          realized_pnl = realized_pnl + excluded.realized_pnl,
+          buys = buys + excluded.buys,
+          sells = sells + excluded.sells,
+          buy_notional = buy_notional + excluded.buy_notional,
+          sell_notional = sell_notional + excluded.sell_notional
+        """,
+        (
+            _utc_day(ts_ms),
+            symbol,
+            float(pnl or 0.0),
+            0 if is_sell else 1,
+            1 if is_sell else 0,
+            0.0 if is_sell else notional,
+            notional if is_sell else 0.0,
+        ),
+    )
+
+
 def log_trade(
     symbol: str,
     side: str,
@@ -47,16 +218,148 @@ def log_trade(
     reason: str,
     broker: str,
     mode: str,
-) -> None:
+    order_id: str = "",
+    latency: Optional[Dict[str, Any]] = None,
+) -> Optional[float]:
+    """Insert a trade, match it against open lots (FIFO) and update rollups.
+
+    `latency` is the order's lifecycle trace so far; `update_trade_latency`
+    completes it once the fill is known. A `trade_event` for the app is
+    queued in the outbox in the same transaction (no network I/O here).
+    Returns the realized PnL for SELLs (None for BUYs or when unknown).
+    """
+    ts_ms = int(time.time() * 1000)
     con = sqlite3.connect(_db_path())
     try:
-        con.execute(
-            "INSERT INTO trades(ts_ms,symbol,side,qty,score,price_est,reason,broker,mode) VALUES(?,?,?,?,?,?,?,?,?)",
-            (int(time.time() * 1000), symbol, side, float(qty), int(score), price_est, reason, broker, mode),
-        )
-        con.commit()
+        with con:
+            cur = con.execute(
+                "INSERT INTO trades(ts_ms,symbol,side,qty,score,price_est,reason,broker,mode,order_id,latency_json)"
+                " VALUES(?,?,?,?,?,?,?,?,?,?,?)",
+                (
+                    ts_ms, symbol, side, float(qty), int(score), price_est, reason, broker, mode,
+                    order_id or None, json.dumps(latency, separators=(",", ":")) if latency else None,
+                ),
+            )
+            trade_id = int(cur.lastrowid)
+            qty_eff, pnl = _apply_fifo(con, trade_id, ts_ms, symbol, side, float(qty), price_est)
+            if side == "SELL":
+                con.execute("UPDATE trades SET qty=?, pnl=? WHERE id=?", (qty_eff, pnl, trade_id))
+            _bump_rollup(con, ts_ms, symbol, side, qty_eff, price_est, pnl)
+            # Same shape as BotMessages.trade_event, stamped with the trade time.
+            _enqueue(con, ts_ms, {
+                "type": "trade_event",
+                "ts": ts_ms,
+                "symbol": symbol,
+                "side": side,
+                "qty": qty_eff,
+                "price": price_est,
+                "pnl": pnl,
+                "trade_id": str(trade_id),
+            })
+        return pnl
+    finally:
+        con.close()
+
+
+def update_trade_latency(order_id: str, latency: Dict[str, Any]) -> None:
+    """Replace the lifecycle trace stored with the trade for `order_id`."""
+    if not order_id:
+        return
+    con = sqlite3.connect(_db_path())
+    try:
+        with con:
+            con.execute(
+                "UPDATE trades SET latency_json=? WHERE order_id=?",
+                (json.dumps(latency, separators=(",", ":")), order_id),
+            )
+    finally:
+        con.close()
+
+
+def _enqueue(con: sqlite3.Connection, ts_ms: int, message: Dict[str, Any]) -> None:
+    con.execute(
+        "INSERT INTO outbox(ts_ms,message_json,next_attempt_ms) VALUES(?,?,?)",
+        (ts_ms, json.dumps(message, separators=(",", ":")), ts_ms),
+    )
+
+
+def outbox_due(limit: int, now_ms: Optional[int] = None) -> List[Tuple[int, int, Dict[str, Any]]]:
+    """Oldest outbox entries due for delivery: (id, attempts, message)."""
+    p = _db_path()
+    if not p.exists():
+        return []
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    con = sqlite3.connect(p)
+    try:
+        rows = con.execute(
+            "SELECT id, attempts, message_json FROM outbox WHERE next_attempt_ms <= ? ORDER BY id LIMIT ?",
+            (now_ms, int(limit)),
+        ).fetchall()
     finally:
         con.close()
+    out: List[Tuple[int, int, Dict[str, Any]]] = []
+    for row_id, attempts, raw in rows:
+        msg = json.loads(raw)
+        msg["event_id"] = int(row_id)  # lets the app drop a redelivered event
+        out.append((int(row_id), int(attempts), msg))
+    return out
+
+
+def outbox_delivered(ids: List[int]) -> None:
+    if not ids:
+        return
+    con = sqlite3.connect(_db_path())
+    try:
+        with con:
+            con.executemany("DELETE FROM outbox WHERE id=?", [(i,) for i in ids])
+    finally:
+        con.close()
+
+
+def outbox_retry(ids: List[int], next_attempt_ms: int, error: str) -> None:
+    if not ids:
+        return
+    con = sqlite3.connect(_db_path())
+    try:
+        with con:
+            con.executemany(
+                "UPDATE outbox SET attempts=attempts+1, next_attempt_ms=?, last_error=? WHERE id=?",
+                [(int(next_attempt_ms), error[:200], i) for i in ids],
+            )
+    finally:
+        con.close()
+
+
+def outbox_prune(before_ms: int) -> int:
+    """Drop undelivered entries older than `before_ms`; returns how many."""
+    p = _db_path()
+    if not p.exists():
+        return 0
+    con = sqlite3.connect(p)
+    try:
+        with con:
+            return int(con.execute("DELETE FROM outbox WHERE ts_ms < ?", (int(before_ms),)).rowcount)
+    finally:
+        con.close()
+
+
+def outbox_backlog() -> Tuple[int, Optional[int]]:
+    """(pending entries, ts_ms of the oldest)."""
+    p = _db_path()
+    if not p.exists():
+        return 0, None
+    con = sqlite3.connect(p)
+    try:
+        n, oldest = con.execute("SELECT COUNT(*), MIN(ts_ms) FROM outbox").fetchone()
+        return int(n), (int(oldest) if oldest is not None else None)
+    finally:
+        con.close()
+
+
+_TRADE_COLUMNS = """
+    id, ts_ms as timestamp, symbol, side, qty, score,
+    price_est as price, reason, broker, mode, pnl
+"""
 
 
 def get_recent_trades(limit: int = 10) -> list[dict]:
@@ -64,16 +367,15 @@ def get_recent_trades(limit: int = 10) -> list[dict]:
     p = _db_path()
     if not p.exists():
         return []
-    
+
     con = sqlite3.connect(p)
     con.row_factory = sqlite3.Row
     try:
         cur = con.execute(
-            """
-            SELECT id, ts_ms as timestamp, symbol, side, qty, score, 
-                   price_est as price, reason, broker, mode
-            FROM trades 
-            ORDER BY ts_ms DESC 
+            f"""
+            SELECT {_TRADE_COLUMNS}
+            FROM trades
+            ORDER BY ts_ms DESC, id DESC
             LIMIT ?
             """,
             (limit,)
@@ -83,3 +385,162 @@ def get_recent_trades(limit: int = 10) -> list[dict]:
     finally:
         con.close()
 
+
+def get_trades_page(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    symbol: Optional[str] = None,
+    reason: Optional[str] = None,
+    since_ms: Optional[int] = None,
+    until_ms: Optional[int] = None,
+    include_archive: bool = False,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Newest-first page of trades using keyset pagination.
+
+    `cursor` is the opaque value returned by the previous page ("<ts_ms>:<id>").
+    Filters by symbol or reason hit the composite (symbol|reason, ts_ms) indexes,
+    so a page costs O(limit) regardless of table size.
+    With `include_archive`, pages continue seamlessly into the daily archive
+    files written by retention once the live table is exhausted.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    p = _db_path()
+    if not p.exists() and not include_archive:
+        return [], None
+
+    where: List[str] = []
+    args: List[Any] = []
+    if symbol:
+        where.append("symbol = ?")
+        args.append(symbol.upper())
+    if reason:
+        where.append("reason = ?")
+        args.append(reason)
+    if since_ms is not None:
+        where.append("ts_ms >= ?")
+        args.append(int(since_ms))
+    if until_ms is not None:
+        where.append("ts_ms < ?")
+        args.append(int(until_ms))
+    if cursor:
+        c_ts, _, c_id = cursor.partition(":")
+        where.append("(ts_ms < ? OR (ts_ms = ? AND id < ?))")
+        args.extend([int(c_ts), int(c_ts), int(c_id or 0)])
+
+    limit = max(1, min(int(limit), 500))
+    sql = f"SELECT {_TRADE_COLUMNS} FROM trades"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY ts_ms DESC, id DESC LIMIT ?"
+    args.append(limit + 1)
+
+    rows: List[Dict[str, Any]] = []
+    if p.exists():
+        con = sqlite3.connect(p)
+        con.row_factory = sqlite3.Row
+        try:
+            rows = [dict(r) for r in con.execute(sql, args).fetchall()]
+        finally:
+            con.close()
+
+    if include_archive and len(rows) <= limit:
+        from bot.storage.retention import iter_archived_trades
+
+        if rows:
+            last = rows[-1]
+            key = (int(last["timestamp"]), int(last["id"]))
+        elif cursor:
+            c_ts, _, c_id = cursor.partition(":")
+            key = (int(c_ts), int(c_id or 0))
+        else:
+            key = None
+        seen = {int(r["id"]) for r in rows}
+        for r in iter_archived_trades(
+            until_ms=(key[0] + 1) if key else until_ms,
+            since_ms=since_ms,
+            symbol=symbol,
+            reason=reason,
+        ):
+            if key and (int(r["timestamp"]), int(r["id"])) >= key:
+                continue
+            if until_ms is not None and int(r["timestamp"]) >= int(until_ms):
+                continue
+            if int(r["id"]) in seen:
+                continue
+            rows.append(r)
+            if len(rows) > limit:
+                break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = f"{last['timestamp']}:{last['id']}"
+    return rows, next_cursor
+
+
+def get_pnl_daily(
+    since_day: Optional[str] = None,
+    until_day: Optional[str] = None,
+    symbol: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Realized PnL per UTC day (summed over symbols unless `symbol` is given)."""
+    p = _db_path()
+    if not p.exists():
+        return []
+
+    where: List[str] = []
+    args: List[Any] = []
+    if symbol:
+        where.append("symbol = ?")
+        args.append(symbol.upper())
+    if since_day:
+        where.append("day >= ?")
+        args.append(since_day)
+    if until_day:
+        where.append("day <= ?")
+        args.append(until_day)
+
+    sql = """
+        SELECT day, SUM(realized_pnl) AS realized_pnl, SUM(buys) AS buys, SUM(sells) AS sells,
+               SUM(buy_notional) AS buy_notional, SUM(sell_notional) AS sell_notional
+        FROM pnl_daily
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " GROUP BY day ORDER BY day DESC"
+
+    con = sqlite3.connect(p)
+    con.row_factory = sqlite3.Row
+    try:
+        return [dict(r) for r in con.execute(sql, args).fetchall()]
+    finally:
+        con.close()
+
+
+def get_pnl_by_symbol(since_day: Optional[str] = None, until_day: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Realized PnL per symbol over a day range, best first."""
+    p = _db_path()
+    if not p.exists():
+        return []
+
+    where: List[str] = []
+    args: List[Any] = []
+    if since_day:
+        where.append("day >= ?")
+        args.append(since_day)
+    if until_day:
+        where.append("day <= ?")
+        args.append(until_day)
+
+    sql = "SELECT symbol, SUM(realized_pnl) AS realized_pnl, SUM(buys) AS buys, SUM(sells) AS sells FROM pnl_daily"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " GROUP BY symbol ORDER BY realized_pnl DESC"
+
+    con = sqlite3.connect(p)
+    con.row_factory = sqlite3.Row
+    try:
+        return [dict(r) for r in con.execute(sql, args).fetchall()]
+    finally:
+        con.close()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from bot.risk.profile import ProfileParams
+
+
+@dataclass(frozen=True)
+class OrderPlan:
+    symbol: str
+    score: int
+    qty: int
+    price: float
+    weight: float  # target weight of equity actually allocated
+
+
+def desired_weights(scores: Sequence[int], entry: float, min_w: float, max_w: float) -> List[float]:
+    """Map scores to weights in [min_w, max_w] with a convex shape for selectivity."""
+    span = max(1.0, 100.0 - entry)
+    out: List[float] = []
+    for sc in scores:
+        if sc <= entry:
+            out.append(min_w)
+            continue
+        strength = min(1.0, max(0.0, (float(sc) - entry) / span))
+        # Convex: stronger scores ramp faster
+        out.append(min_w + (max_w - min_w) * strength * strength)
+    return out
+
+
+def plan_entries(
+    candidates: Sequence[tuple[str, int]],
+    prices: Mapping[str, Optional[float]],
+    equity: float,
+    cash: float,
+    held_value: float,
+    held_count: int,
+    profile: ProfileParams,
+    min_weight: float,
+    cash_buffer: float,
+    min_order_notional: float,
+    sizing: Optional[Dict[str, Tuple[float, float]]] = None,
+) -> List[OrderPlan]:
+    """Size all eligible candidates in one pass.
+
+    Constraints, applied jointly rather than per order:
+    - free slots (`max_positions - held_count`), filled by score (ties by symbol);
+      a slot whose order is dropped passes to the next priced candidate
+    - per-position cap `max_weight_per_pos`
+    - portfolio cap `max_exposure` including what is already held
+    - spendable cash after keeping `cash_buffer * equity` aside
+    - minimum order notional (dropped orders release budget to the rest)
+
+    If the targets do not fit the budget, every target is scaled by the same
+    factor. The plan therefore does not depend on candidate order.
+
+    `sizing`, if given, receives symbol -> (target weight, notional last
+    offered) for every priced candidate that was offered a slot, including
+    the ones dropped (notional 0 when there was no budget at all).
+    """
+    slots = profile.max_positions - held_count
+    if slots <= 0 or equity <= 0:
+        return []
+
+    ranked = sorted(
+        ((sym, int(sc)) for sym, sc in candidates if (prices.get(sym) or 0) > 0),
+        key=lambda c: (-c[1], c[0]),
+    )
+    if not ranked:
+        return []
+
+    max_w = float(profile.max_weight_per_pos)
+    weights = desired_weights([sc for _, sc in ranked], float(profile.entry), min(min_weight, max_w), max_w)
+    active = list(range(min(slots, len(ranked))))
+    if sizing is not None:
+        for i in active:
+            sizing[ranked[i][0]] = (weights[i], 0.0)
+    budget = min(
+        equity * float(profile.max_exposure) - max(0.0, held_value),
+        cash - equity * cash_buffer,
+    )
+    if budget <= 0:
+        return []
+
+    reserve = len(active)  # next candidate to take a freed slot
+    allocs: Dict[int, float] = {}
+    # Each pass drops one order (taking at most one from the reserve) or
+    # terminates, so this is bounded by len(ranked).
+    while active:
+        want = sum(weights[i] for i in active) * equity
+        scale = min(1.0, budget / want) if want > 0 else 0.0
+        allocs = {i: weights[i] * equity * scale for i in active}
+        if sizing is not None:
+            for i in active:
+                sizing[ranked[i][0]] = (weights[i], allocs[i])
+        too_small = [i for i in active if allocs[i] < min_order_notional or allocs[i] < float(prices[ranked[i][0]])]
+        if not too_small:
+            break
+        # Drop the weakest undersized order only (ranked is strongest-first),
+        # give its slot to the next candidate, then re-solve.
+        active.remove(max(too_small))
+        if reserve < len(ranked):
+            active.append(reserve)
+            reserve += 1
+
+    plans: List[OrderPlan] = []
+    for i in active:
+        sym, sc = ranked[i]
+        px = float(prices[sym])
+        qty = int(math.floor(allocs[i] / px))
+        if qty <= 0:
+            continue
+        plans.append(OrderPlan(symbol=sym, score=sc, qty=qty, price=px, weight=qty * px / equity))
+    return plans
@@ -1,22 +1,36 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
 import logging
-import os
 import random
 import time
 import uuid
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 
-from bot.brokers.base import Broker, Position
+from bot.brokers.base import Broker, BrokerUpdate, Position
+from bot.risk.equity import EquityTracker
 from bot.risk.profile import ProfileParams, params_for
+from bot.settings import RuntimeSettings, runtime_settings
 from bot.signals.feed import SignalFeed
-from bot.storage.state import load_state, save_state
-from bot.storage.trades_db import log_trade
+from bot.signals.view import ScoreView
+from bot.storage.decision_log import Action, DecisionLog, Gate, gate_for_exit_reason
+from bot.strategy.allocator import OrderPlan, plan_entries
+from bot.strategy.latency import FILL_WAIT_MS, LatencyHistograms, OrderTrace
+from bot.strategy.rotation import CostModel, HeldInfo, plan_rotations
+from bot.strategy.scheduler import TickScheduler
+from bot.strategy.timers import TimerStore
+from bot.storage.state import load_state, load_timers, save_state, save_timers
+from bot.storage.trades_db import log_trade, update_trade_latency
+from bot.util.logging import begin_tick, tick_stats
+from bot.util.loopmon import LOOP
+from bot.util.startup import STARTUP
 
 log = logging.getLogger("bot.engine")
 
+_TIMER_KINDS = ("above_since", "below_since", "missing_since", "cooldowns", "opened_at_ms")
+
 
 @dataclass
 class Candidate:
@@ -41,28 +55,179 @@ class BotEngine:
         self.get_profile = get_profile
 
         self._profile: ProfileParams = params_for(profile_name)  # placeholder until first tick
+        self._cfg: RuntimeSettings = runtime_settings()  # refreshed every tick
 
         self.state = load_state()
-        self._above_since: Dict[str, int] = self.state.get("above_since", {})
-        self._below_since: Dict[str, int] = self.state.get("below_since", {})
-        self._missing_since: Dict[str, int] = self.state.get("missing_since", {})
+        # Per-symbol timers live in timers.json and are written only when they change.
+        saved = load_timers()
+        migrated = saved is None  # older runtime_state.json carried them inline
+        if saved is None:
+            saved = {k: self.state.get(k) or {} for k in _TIMER_KINDS}
+        for k in _TIMER_KINDS:
+            self.state.pop(k, None)
+        self._above_since = TimerStore(saved.get("above_since"))      # entry confirmation start
+        self._below_since = TimerStore(saved.get("below_since"))      # exit confirmation start
+        self._missing_since = TimerStore(saved.get("missing_since"))  # held symbol absent from the feed
+        self._cooldowns = TimerStore(saved.get("cooldowns"))          # re-entry blocked until
+        self._opened_at = TimerStore(saved.get("opened_at_ms"))       # entry time, for min hold
+        if migrated:
+            self._above_since.dirty = True
 
         self._last_decision_ms: int = 0
         self._last_account_poll_ms: int = 0
         self._cached_equity: Optional[float] = None
         self._cached_cash: Optional[float] = None
 
+        self._wake = asyncio.Event()
+        self.traded = asyncio.Event()  # set after every logged trade (status push to the app)
+        self._sched = TickScheduler()
+        self._held: List[str] = []
+        self._warmup: Optional[Dict] = None  # last pre-open warm-up report
+
+        # Order lifecycle tracing: the feed arrival (received_ms, publisher t) and
+        # tracker start of each threshold crossing, open traces awaiting a fill.
+        self._crossings: Dict[str, Tuple[int, Optional[int], int]] = {}
+        self._pending_fills: Dict[str, OrderTrace] = {}
+        self._latency = LatencyHistograms()
+        self._tick_ms = 0
+        self._scores: ScoreView = feed.view  # one consistent version per tick
+
+        # Intraday equity marks; the drawdown guard runs on its own cadence.
+        self._equity = EquityTracker(max_points=self._cfg.equity_curve_points)
+        self._market_open = False
+        self._trade_lock = asyncio.Lock()
+        self._audit = DecisionLog(
+            capacity=self._cfg.decision_ring_records,
+            heartbeat_s=self._cfg.decision_heartbeat_seconds,
+        )
+        # Last pushed {symbol: (qty, price)} from adapters that stream positions.
+        self._pushed_marks: Optional[Dict[str, Tuple[float, Optional[float]]]] = None
+
+    def wake(self) -> None:
+        """Run the next tick now (e.g. profile/panic changed in the app)."""
+        self._wake.set()
+
+    def on_broker_update(self, update: BrokerUpdate) -> None:
+        """Account/position state pushed by the broker adapter between ticks."""
+        health = self.state.setdefault("health", {})
+        if update.connected is not None:
+            health["broker_connected"] = update.connected
+            if update.connected:
+                self.wake()
+        if update.account is not None and update.account.equity > 0:
+            self._cached_equity = float(update.account.equity)
+            self._cached_cash = float(update.account.cash)
+            self._last_account_poll_ms = int(time.time() * 1000)
+            if self._equity.day_id is not None and self._pushed_marks is not None:
+                self._equity.sync(self._cached_equity, self._pushed_marks)
+        if update.positions is not None:
+            longs = {p.symbol: p for p in update.positions if p.side == "long"}
+            self._pushed_marks = {
+                sym: (p.qty, (abs(p.market_value) / p.qty) if p.market_value and p.qty else None)
+                for sym, p in longs.items()
+            }
+            self._equity.mark_many({sym: px for sym, (_, px) in self._pushed_marks.items()})
+            # A position closed broker-side (stop/target hit): reconcile now.
+            if any(sym not in longs for sym in self._equity.held_symbols):
+                self.wake()
+
     async def run(self) -> None:
-        interval = float(os.getenv("BOT_DECISION_SECONDS", "12"))
+        await self.broker.start(self.on_broker_update)
+        self._guard_task = asyncio.create_task(self._equity_guard_loop())
+        self._audit_task = asyncio.create_task(
+            self._audit.run(self._cfg.decision_flush_seconds, self._cfg.decision_retention_days)
+        )
         while True:
+            self._audit.tick_id = begin_tick()
+            self._sched.begin()
             try:
-                await self._tick()
+                async with self._trade_lock:
+                    await self._tick()
             except Exception as e:
                 log.exception("tick_failed err=%s", e)
-            await asyncio.sleep(interval)
+            self.state.setdefault("health", {})["logging"] = tick_stats()
+            self.state["health"]["decisions"] = dict(self._audit.stats)
+            self.state["health"]["loop"] = LOOP.summary()
+            self._audit.retain(self._above_since)
+            report = STARTUP.first_tick()
+            if report is not None:
+                self.state.setdefault("health", {})["startup"] = report
+            mode, interval_s = self._cadence()
+            delay = self._sched.end(mode, interval_s)
+            self.state["health"]["scheduler"] = dict(self._sched.stats)
+            if self._warmup is not None and self._market_open and "first_tick_ms" not in self._warmup:
+                self._warmup["first_tick_ms"] = self._sched.stats["last_tick_ms"]
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                self._sched.woken()
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _cadence(self) -> Tuple[str, float]:
+        """(mode, seconds) until the next tick.
+
+        - sleep: market closed; wake `preopen_lead_seconds` before the next open
+          (capped, so a calendar change is picked up), then tick at normal
+          cadence until the bell.
+        - fast: confirmations pending or scores within `near_threshold_points`
+          of a threshold.
+        - normal: `decision_seconds`.
+        """
+        cfg = self._cfg
+        if not self.broker.is_configured():
+            return "normal", cfg.decision_seconds
+        if not self._market_open:
+            try:
+                tto = self.broker.market_calendar().time_to_open()
+            except Exception as e:
+                log.warning("calendar_failed err=%s", e)
+                tto = None
+            if tto is None:
+                return "normal", cfg.decision_seconds
+            if tto > cfg.preopen_lead_seconds:
+                return "sleep", min(cfg.closed_max_sleep_seconds, max(cfg.decision_seconds, tto - cfg.preopen_lead_seconds))
+            return "preopen", max(0.05, min(cfg.decision_seconds, tto))
+        if self._hot():
+            return "fast", min(cfg.fast_decision_seconds, cfg.decision_seconds)
+        return "normal", cfg.decision_seconds
+
+    def _hot(self) -> bool:
+        """True when the next few seconds can change a decision."""
+        now_ms = int(time.time() * 1000)
+        held = set(self._held)
+        p = self._profile
+        for sym, since in self._above_since.pending():
+            if sym not in held and now_ms - int(since) < p.entry_confirm_s * 1000:
+                return True
+        if any(sym in self._below_since for sym in held):
+            return True
+        margin = self._cfg.near_threshold_points
+        if margin <= 0:
+            return False
+        scores = self.feed.scores
+        for sym in held:
+            sc = scores.get(sym)
+            if sc is not None and p.exit < sc <= p.exit + margin:
+                return True
+        # Entry side: only the unheld symbols that could take a free slot (or,
+        # with the book full, rotate out the weakest holding) can change a decision.
+        free = p.max_positions - len(held)
+        if free <= 0:
+            held_scores = [scores[sym] for sym in held if sym in scores]
+            if not held_scores or p.entry - min(held_scores) < p.rotation_margin:
+                return False
+            free = 1
+        lo = p.entry - margin
+        top = heapq.nlargest(free, (sc for sym, sc in scores.items() if sym not in held))
+        return any(lo <= sc < p.entry for sc in top)
 
     async def _tick(self) -> None:
         now_ms = int(time.time() * 1000)
+        self._tick_ms = now_ms
+        self._scores = self.feed.view
+        self._cooldowns.expire(now_ms)
+        self._cfg = runtime_settings()
 
         # Refresh profile/panic from control plane.
         profile_name = (self.get_profile() or "balanced").strip()
@@ -73,7 +238,9 @@ class BotEngine:
         self.state.setdefault("health", {})
         self.state["health"]["last_tick_ms"] = now_ms
         self.state["health"]["ws_ok"] = self.feed.ws_ok
+        self.state["health"]["feed_endpoints"] = self.feed.endpoint_stats()
         self.state["health"]["signal_last_ms"] = self.feed.last_update_ms
+        self.state["health"]["signals_provisional"] = self.feed.provisional
         self.state["health"]["profile"] = self._profile.name
 
         if not self.broker.is_configured():
@@ -81,7 +248,8 @@ class BotEngine:
             save_state(self._persist())
             return
 
-        market_open = self.broker.is_market_open()
+        market_open = await self.broker.ais_market_open()
+        self._market_open = market_open
         self.state["health"]["market_open"] = market_open
 
         # Panic has priority during market hours.
@@ -92,7 +260,7 @@ class BotEngine:
             return
 
         # Signal freshness guard (only matters during market hours)
-        stale_s = float(os.getenv("BOT_SIGNAL_STALE_SECONDS", "480"))
+        stale_s = self._cfg.signal_stale_seconds
         if market_open:
             if self.feed.last_update_ms is None:
                 self.state["health"]["mode"] = "waiting_signals"
@@ -109,41 +277,55 @@ class BotEngine:
                 save_state(self._persist())
                 return
 
-        # No trading outside market hours; keep state warm.
+        # No trading outside market hours. Nothing changes while closed, so the
+        # state file is written once on the transition only.
         if not market_open:
-            self.state["health"]["mode"] = "market_closed"
-            save_state(self._persist())
+            if self.state["health"].get("mode") != "market_closed":
+                self.state["health"]["mode"] = "market_closed"
+                save_state(self._persist())
+            await self._maybe_warm_up()
             return
 
-        # Account polling
+        # Account polling (adapters that push account updates refresh the cache in between)
         if now_ms - self._last_account_poll_ms > 20_000 or self._cached_equity is None:
-            acct = self.broker.get_account()
+            acct = await self.broker.aget_account()
             self._cached_equity = float(acct.equity)
             self._cached_cash = float(acct.cash)
             self._last_account_poll_ms = now_ms
+            anchor = True
+        else:
+            anchor = False
 
-            # Daily drawdown guard
-            day = self.state.get("day") or {}
-            day_id = day.get("id")
-            # Use UTC date for consistency
-            utc_day = time.strftime("%Y-%m-%d", time.gmtime())
-            if day_id != utc_day:
-                day = {"id": utc_day, "equity_start": self._cached_equity}
-                self.state["day"] = day
-            dd = 0.0
-            try:
-                dd = (float(day.get("equity_start", self._cached_equity)) - self._cached_equity) / float(day.get("equity_start", self._cached_equity))
-            except Exception:
-                dd = 0.0
-            self.state["health"]["day_drawdown"] = round(dd, 4)
-            if dd > self._profile.daily_max_drawdown_pct:
-                self.state["health"]["mode"] = "safe_daily_drawdown"
-                await self._safe_close_all(reason=f"daily_drawdown_{round(dd*100,2)}%")
-                save_state(self._persist())
-                return
+        day = self.state.get("day") or {}
+        day_id = day.get("id")
+        # Use UTC date for consistency
+        utc_day = time.strftime("%Y-%m-%d", time.gmtime())
+        if day_id != utc_day:
+            day = {"id": utc_day, "equity_start": self._cached_equity}
+            self.state["day"] = day
+        self._equity.start_day(day["id"], float(day.get("equity_start") or self._cached_equity))
 
         # Sync positions
-        positions = {p.symbol: p for p in self.broker.list_positions() if p.side == "long"}
+        positions = {p.symbol: p for p in await self.broker.alist_positions() if p.side == "long"}
+        if anchor:
+            self._equity.sync(self._cached_equity, {
+                sym: (p.qty, (abs(p.market_value) / p.qty) if p.market_value and p.qty else None)
+                for sym, p in positions.items()
+            })
+
+        # Entry times of positions gone (closed by a bracket leg, or outside the bot).
+        # Recent entries are kept: the broker may not list a fresh fill yet.
+        for sym in [s for s, ms in self._opened_at.items() if s not in positions and now_ms - ms > FILL_WAIT_MS]:
+            self._opened_at.pop(sym)
+
+        # Daily drawdown guard (also enforced between ticks by the equity guard)
+        self.state["health"]["equity"] = self._equity.summary()
+        if await self._enforce_drawdown():
+            save_state(self._persist())
+            return
+
+        if self._pending_fills:
+            await self._resolve_fills(positions)
 
         # Update confirmation trackers
         self._update_confirmation(now_ms, positions)
@@ -159,17 +341,109 @@ class BotEngine:
 
         self.state["health"]["mode"] = "running"
         self.state["health"]["positions"] = list(sorted(positions.keys()))
+        self._held = list(positions)
         save_state(self._persist())
 
-    def _update_confirmation(self, now_ms: int, positions: Dict[str, Position]) -> None:
+    async def _maybe_warm_up(self) -> None:
+        if not self._cfg.preopen_warmup:
+            return
+        cal = self.broker.market_calendar()
+        tto = cal.time_to_open()
+        session = cal.session()
+        if tto is None or session is None or tto > self._cfg.preopen_lead_seconds:
+            return
+        if self._warmup is not None and self._warmup.get("day") == session.day:
+            return
+        await self._warm_up(session.day, session.open_ms)
+
+    async def _warm_up(self, day: str, open_ms: int) -> None:
+        """Pre-open: pay the first tick's cold-start costs before the bell.
+
+        Brings up the broker session, qualifies likely candidates and held
+        symbols, primes the account cache (valid until the open, since nothing
+        trades before it) and makes sure the feed is fresh. Position and price
+        requests run twice, cold then warm; `saved_ms_est` is the setup time
+        plus those differences. The first open tick and first order latency are
+        added to the report once the session starts.
+        """
+        p = self._profile
         scores = self.feed.scores
+        lo = p.entry - self._cfg.near_threshold_points
+        likely = sorted((s for s, sc in scores.items() if sc >= lo), key=lambda s: (-scores[s], s))[: p.max_positions * 2]
+        steps: Dict[str, float] = {}
+        failed: List[str] = []
+
+        async def step(name: str, coro: Awaitable[Any]) -> Any:
+            t = time.perf_counter()
+            try:
+                return await coro
+            except Exception as e:
+                failed.append(name)
+                log.warning("warmup_step_failed step=%s err=%s", name, e)
+                return None
+            finally:
+                steps[f"{name}_ms"] = round((time.perf_counter() - t) * 1000.0, 1)
+
+        await step("broker", self.broker.aprepare([]))
+        acct = await step("account", self.broker.aget_account())
+        if acct is not None and acct.equity > 0:
+            self._cached_equity = float(acct.equity)
+            self._cached_cash = float(acct.cash)
+            self._last_account_poll_ms = max(int(time.time() * 1000), open_ms)
+        positions = await step("positions_cold", self.broker.alist_positions()) or []
+        await step("positions_warm", self.broker.alist_positions())
+        held = [x.symbol for x in positions if x.side == "long"]
+        await step("contracts", self.broker.aprepare(likely + held))
+        if likely:
+            await step("prices_cold", self.broker.alatest_prices(likely))
+            await step("prices_warm", self.broker.alatest_prices(likely))
+
+        # Feed: a restored or stale score map is replaced by a snapshot now, not at the bell.
+        t = time.perf_counter()
+        last = self.feed.last_update_ms
+        age_s = (time.time() * 1000 - last) / 1000.0 if last else None
+        if last is None or self.feed.provisional or age_s > self._cfg.signal_stale_seconds:
+            self.feed.request_snapshot()
+            deadline = time.monotonic() + 10.0
+            while self.feed.last_update_ms == last and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+        steps["feed_ms"] = round((time.perf_counter() - t) * 1000.0, 1)
+        last = self.feed.last_update_ms
+        feed_age_s = round((time.time() * 1000 - last) / 1000.0, 1) if last else None
+
+        def delta(name: str) -> float:
+            return max(0.0, steps.get(f"{name}_cold_ms", 0.0) - steps.get(f"{name}_warm_ms", 0.0))
+
+        saved = steps.get("broker_ms", 0.0) + steps.get("account_ms", 0.0) + steps.get("contracts_ms", 0.0)
+        saved += delta("positions") + delta("prices")
+        self._warmup = {
+            "day": day,
+            "open_ms": open_ms,
+            "at_ms": int(time.time() * 1000),
+            "symbols": len(likely),
+            "held": len(held),
+            "steps": steps,
+            "failed": failed,
+            "feed_age_s": feed_age_s,
+            "ws_ok": self.feed.ws_ok,
+            "saved_ms_est": round(saved, 1),
+        }
+        self.state["health"]["warmup"] = self._warmup
+        log.info(
+            "warmup_done day=%s symbols=%d saved_ms_est=%.0f failed=%s",
+            day, len(likely), saved, ",".join(failed) or "-",
+        )
+
+    def _update_confirmation(self, now_ms: int, positions: Dict[str, Position]) -> None:
+        scores = self._scores
         entry_th = self._profile.entry
         exit_th = self._profile.exit
 
         # Track above threshold for entries
         for sym, sc in scores.items():
             if sc >= entry_th:
-                self._above_since.setdefault(sym, now_ms)
+                if self._above_since.setdefault(sym, now_ms):
+                    self._note_crossing(sym, now_ms)
             else:
                 self._above_since.pop(sym, None)
 
@@ -182,10 +456,65 @@ class BotEngine:
                 continue
             self._missing_since.pop(sym, None)
             if sc <= exit_th:
-                self._below_since.setdefault(sym, now_ms)
+                if self._below_since.setdefault(sym, now_ms):
+                    self._note_crossing(sym, now_ms)
             else:
                 self._below_since.pop(sym, None)
 
+        if len(self._crossings) > len(self._above_since) + len(self._below_since):
+            self._crossings = {
+                sym: c for sym, c in self._crossings.items() if sym in self._above_since or sym in self._below_since
+            }
+
+    def _note_crossing(self, sym: str, since_ms: int) -> None:
+        arrival = self.feed.arrivals.get(sym)
+        if arrival is not None:
+            self._crossings[sym] = (arrival[0], arrival[1], since_ms)
+
+    def _trace(self, order_id: str, symbol: str, side: str, confirm_s: Optional[int]) -> OrderTrace:
+        """Start a lifecycle trace; `confirm_s` is None for orders not driven by a crossing."""
+        trace = OrderTrace(order_id=order_id, symbol=symbol, side=side, decided_ms=self._tick_ms or int(time.time() * 1000))
+        cross = self._crossings.pop(symbol, None) if confirm_s is not None else None
+        if cross is not None:
+            trace.received_ms, trace.signal_ms, since_ms = cross
+            trace.confirmed_ms = since_ms + int(confirm_s) * 1000
+        return trace
+
+    def _traced(self, trace: OrderTrace) -> Dict:
+        """Trace as stored with the trade row; kept open until the fill is seen."""
+        trace.ack_ms = int(time.time() * 1000)
+        self._pending_fills[trace.order_id] = trace
+        return trace.to_json()
+
+    async def _resolve_fills(self, positions: Dict[str, Position]) -> None:
+        now_ms = int(time.time() * 1000)
+        for oid, trace in list(self._pending_fills.items()):
+            try:
+                fill_ms = await self.broker.afill_time_ms(oid)
+            except Exception as e:
+                log.debug("fill_time_failed err=%s", e, extra={"symbol": trace.symbol, "order_id": oid})
+                fill_ms = None
+            if fill_ms is not None:
+                trace.fill_ms, trace.fill_source = int(fill_ms), "broker"
+            elif (trace.side == "BUY") == (trace.symbol in positions):
+                # First position sync that reflects the order: an upper bound for the fill.
+                trace.fill_ms, trace.fill_source = now_ms, "positions"
+            elif now_ms - int(trace.ack_ms or now_ms) < FILL_WAIT_MS:
+                continue
+            del self._pending_fills[oid]
+            stages = trace.stages()
+            self._latency.observe(stages)
+            self.state["health"]["latency"] = self._latency.summary()
+            try:
+                await asyncio.to_thread(update_trade_latency, oid, trace.to_json())
+            except Exception as e:
+                log.warning("trade_latency_write_failed err=%s", e, extra={"order_id": oid})
+            log.info(
+                "order_latency %s side=%s %s", trace.symbol, trace.side,
+                " ".join(f"{k}_ms={v}" for k, v in stages.items()),
+                extra={"symbol": trace.symbol, "order_id": oid},
+            )
+
     def _decide_exits(self, now_ms: int, positions: Dict[str, Position]) -> List[Tuple[str, str]]:
         exits: List[Tuple[str, str]] = []
 
@@ -193,43 +522,39 @@ class BotEngine:
         # If a held symbol disappears from the feed, it may be benign. We therefore:
         # - wait a grace period
         # - then close at most ONE missing-held symbol per cycle
-        missing_grace_s = int(os.getenv("BOT_MISSING_SYMBOL_GRACE_SECONDS", "180"))
-        missing_candidates: List[Tuple[float, str]] = []
-        for sym, since in list(self._missing_since.items()):
+        # Due timers come oldest first, so the first held one is the longest-missing
+        # (kademeli azaltma); timers of symbols no longer held are dropped on the way.
+        missing_grace_ms = int(self._cfg.missing_symbol_grace_seconds * 1000)
+        for sym, _ in self._missing_since.pop_due(now_ms - missing_grace_ms):
             if sym in positions:
-                age = (now_ms - int(since)) / 1000.0
-                if age >= missing_grace_s:
-                    missing_candidates.append((age, sym))
-
-        if missing_candidates:
-            # Close the longest-missing first (kademeli azaltma).
-            missing_candidates.sort(key=lambda x: x[0], reverse=True)
-            _, sym = missing_candidates[0]
-            exits.append((sym, "symbol_missing"))
-            self._missing_since.pop(sym, None)
+                exits.append((sym, "symbol_missing"))
+                break
 
         # Confirmed below threshold
-        for sym, since in list(self._below_since.items()):
-            if sym not in positions:
-                self._below_since.pop(sym, None)
-                continue
-            if (now_ms - int(since)) / 1000.0 >= self._profile.exit_confirm_s:
+        for sym, _ in self._below_since.pop_due(now_ms - int(self._profile.exit_confirm_s * 1000)):
+            if sym in positions:
                 exits.append((sym, "score_exit"))
-                self._below_since.pop(sym, None)
 
         return exits
 
     async def _entries_and_rotation(self, now_ms: int, positions: Dict[str, Position]) -> None:
-        scores = self.feed.scores
+        scores = self._scores
 
         # Build eligible candidates
         eligible: List[Candidate] = []
-        for sym, since in self._above_since.items():
+        need_s = self._profile.entry_confirm_s
+        for sym in self._above_since.mature(now_ms - int(need_s * 1000)):
             sc = scores.get(sym)
-            if sc is None:
-                continue
-            if (now_ms - int(since)) / 1000.0 >= self._profile.entry_confirm_s:
+            if sc is not None:
                 eligible.append(Candidate(symbol=sym, score=int(sc)))
+        for sym, since in self._above_since.pending():
+            sc = scores.get(sym)
+            if sc is None or sym in positions:
+                continue
+            self._audit.record(
+                now_ms, sym, Action.SKIP, Gate.CONFIRMING,
+                score=int(sc), threshold=self._profile.entry, conf_age_s=(now_ms - int(since)) / 1000.0, conf_need_s=need_s,
+            )
 
         eligible.sort(key=lambda c: c.score, reverse=True)
 
@@ -243,178 +568,289 @@ class BotEngine:
 
         # Rotation logic if full
         if len(positions) >= max_pos:
-            worst = self._worst_position(scores, positions)
-            if worst is None:
-                return
-            worst_sym, worst_score = worst
-            best_new = eligible[0]
-
-            # Only rotate if margin met and min hold satisfied
-            opened_at = int((self.state.get("opened_at_ms") or {}).get(worst_sym, 0))
-            held_s = (now_ms - opened_at) / 1000.0 if opened_at else 1e9
-            if best_new.score >= (worst_score + self._profile.rotation_margin) and held_s >= self._profile.min_hold_s:
-                out_pos = positions.get(worst_sym)
-                if out_pos and self._rotation_worth_it(
-                    out_symbol=worst_sym,
-                    out_score=worst_score,
-                    out_pos=out_pos,
-                    in_symbol=best_new.symbol,
-                    in_score=best_new.score,
-                ):
-                    log.info("rotate out=%s(%s) in=%s(%s)", worst_sym, worst_score, best_new.symbol, best_new.score)
-                    await self._close(worst_sym, out_pos, reason="rotate")
-                    positions.pop(worst_sym, None)
-                    await self._open(best_new.symbol, best_new.score)
-                else:
-                    log.info("rotate_skip_cost out=%s(%s) in=%s(%s)", worst_sym, worst_score, best_new.symbol, best_new.score)
+            await self._rotate(now_ms, eligible, positions)
             return
 
-        # Otherwise, open until capacity
-        slots = max_pos - len(positions)
-        picks = eligible[:slots]
-        for c in picks:
-            await self._open(c.symbol, c.score)
-
-    def _worst_position(self, scores: Dict[str, int], positions: Dict[str, Position]) -> Optional[Tuple[str, int]]:
-        worst_sym = None
-        worst_score = 10**9
-        for sym in positions.keys():
-            sc = scores.get(sym, 50)  # if missing, treat as mediocre
-            if sc < worst_score:
-                worst_score = sc
-                worst_sym = sym
-        if worst_sym is None:
-            return None
-        return worst_sym, int(worst_score)
-
-    def _rotation_worth_it(
-        self,
-        out_symbol: str,
-        out_score: int,
-        out_pos: Position,
-        in_symbol: str,
-        in_score: int,
-    ) -> bool:
-        """Commission/slippage-aware rotation gate.
-
-        We only have a single score, so we use a conservative heuristic:
-        - Convert score improvement into an *expected edge* (bps).
-        - Compare to estimated round-trip cost (slippage + commissions) for closing+opening.
-        """
-
-        try:
-            out_px = self.broker.latest_price(out_symbol) or out_pos.avg_entry_price or 0.0
-            out_notional = max(0.0, float(out_pos.qty) * float(out_px))
-        except Exception:
-            out_notional = 0.0
-
-        if out_notional <= 0:
-            # If we can't estimate costs, default to *not* rotating.
-            return False
-
-        delta = max(0, int(in_score) - int(out_score))
-
-        score_point_bps = float(os.getenv("BOT_SCORE_POINT_VALUE_BPS", "4.0"))
-        # Estimated benefit in $ (very conservative)
-        est_benefit = out_notional * (delta * score_point_bps) / 10_000.0
-
-        # Costs
-        default_comm = "0.0" if getattr(self.broker, "name", "") == "alpaca" else "1.0"
-        commission = float(os.getenv("BOT_COMMISSION_PER_TRADE", default_comm))
-        slippage_bps = float(os.getenv("BOT_SLIPPAGE_BPS", "2.5"))
-        est_slip = out_notional * (slippage_bps / 10_000.0) * 2.0
-        est_cost = est_slip + (commission * 2.0)
-
-        mult = float(os.getenv("BOT_SWITCH_COST_MULTIPLIER", "1.5"))
-        return est_benefit >= (est_cost * mult)
-
-    def _desired_weight(self, score: int) -> float:
-        # Map score to weight in [minW, maxW] with a convex shape for selectivity.
-        min_w = float(os.getenv("BOT_MIN_WEIGHT_PER_POS", "0.08"))
-        max_w = float(self._profile.max_weight_per_pos)
-        entry = float(self._profile.entry)
-        if score <= entry:
-            return min_w
-        strength = (float(score) - entry) / max(1.0, (100.0 - entry))
-        strength = max(0.0, min(1.0, strength))
-        # Convex: stronger scores ramp faster
-        strength = strength * strength
-        return min_w + (max_w - min_w) * strength
-
-    async def _open(self, symbol: str, score: int) -> None:
-        now_ms = int(time.time() * 1000)
-        cds = self.state.get("cooldowns") or {}
-        cd_until = int(cds.get(symbol, 0))
-        if cd_until and now_ms < cd_until:
+        # Otherwise, size every eligible candidate together and open until capacity
+        await self._open_planned(eligible, positions)
+
+    def _cost_model(self) -> CostModel:
+        cfg = self._cfg
+        return CostModel(
+            score_point_bps=cfg.score_point_value_bps,
+            commission_per_trade=cfg.commission(getattr(self.broker, "name", "")),
+            slippage_bps=cfg.slippage_bps,
+            switch_cost_multiplier=cfg.switch_cost_multiplier,
+        )
+
+    async def _rotate(self, now_ms: int, eligible: List[Candidate], positions: Dict[str, Position]) -> None:
+        """Commission/slippage-aware rotation over all held x candidate pairs at once."""
+        candidates = self._drop_cooldowns(eligible, now_ms)
+        if not candidates:
             return
 
-        if self._cached_equity is None or self._cached_cash is None:
+        scores = self._scores
+        opened = self._opened_at
+        # One batched price request for every held symbol.
+        prices = await self.broker.alatest_prices(list(positions.keys()))
+        self._equity.mark_many(prices)
+        held: List[HeldInfo] = []
+        for sym, pos in positions.items():
+            px = prices.get(sym)
+            if not px and pos.market_value and pos.qty:
+                px = abs(float(pos.market_value)) / float(pos.qty)
+            if not px:
+                px = pos.avg_entry_price
+            opened_at = int(opened.get(sym, 0))
+            held.append(HeldInfo(
+                symbol=sym,
+                score=int(scores.get(sym, 50)),  # if missing, treat as mediocre
+                qty=float(pos.qty),
+                held_s=(now_ms - opened_at) / 1000.0 if opened_at else 1e9,
+                price=px,
+            ))
+
+        swaps = plan_rotations(
+            held=held,
+            candidates=[(c.symbol, c.score) for c in candidates],
+            rotation_margin=self._profile.rotation_margin,
+            min_hold_s=self._profile.min_hold_s,
+            cost=self._cost_model(),
+        )
+        swapped_in = {sw.in_symbol for sw in swaps}
+        for c in candidates:
+            if c.symbol not in swapped_in:
+                self._audit.record(now_ms, c.symbol, Action.SKIP, Gate.ROTATION_NO_GAIN, score=c.score, threshold=self._profile.entry)
+        if not swaps:
             return
 
-        # Dynamic sizing based on score quality
-        weight = self._desired_weight(score)
-        alloc = self._cached_equity * min(weight, self._profile.max_exposure)
+        # Size the buys before selling anything: a swap whose buy cannot be placed
+        # (no quote, cooldown, undersized) keeps its position. Dropping a swap
+        # changes the cash and exposure left for the others, so re-plan until stable.
+        value = {h.symbol: h.qty * float(h.price or 0.0) for h in held}
+        while True:
+            outs = {sw.out_symbol for sw in swaps}
+            remaining = {sym: pos for sym, pos in positions.items() if sym not in outs}
+            proceeds = sum(value.get(sw.out_symbol, 0.0) for sw in swaps)
+            cash = self._cached_cash + proceeds if self._cached_cash is not None else None
+            plans = await self._plan([Candidate(symbol=sw.in_symbol, score=sw.in_score) for sw in swaps], remaining, cash=cash)
+            planned = {p.symbol for p in plans}
+            kept = [sw for sw in swaps if sw.in_symbol in planned]
+            for sw in swaps:
+                if sw.in_symbol not in planned:
+                    log.info("rotate_skipped out=%s in=%s (buy not sized)", sw.out_symbol, sw.in_symbol, extra={"symbol": sw.out_symbol})
+            if len(kept) == len(swaps):
+                break
+            swaps = kept
+            if not swaps:
+                return
 
-        # Keep a small cash buffer
-        cash_buffer = float(os.getenv("BOT_CASH_BUFFER", "0.05"))
-        max_spend = max(0.0, self._cached_cash - self._cached_equity * cash_buffer)
-        alloc = min(alloc, max_spend)
-        if alloc <= 50:
-            return
+        for sw in swaps:
+            log.info(
+                "rotate out=%s(%s) in=%s(%s) net=%.2f", sw.out_symbol, sw.out_score, sw.in_symbol, sw.in_score, sw.net_benefit,
+                extra={"symbol": sw.out_symbol},
+            )
+            if await self._close(sw.out_symbol, positions.get(sw.out_symbol), reason="rotate", audit_aux=sw.net_benefit):
+                positions.pop(sw.out_symbol, None)
+            else:
+                planned.discard(sw.in_symbol)  # the sale failed: don't buy its replacement
+        for plan in plans:
+            if plan.symbol in planned:
+                await self._open(plan.symbol, plan.score, plan.qty, plan.price)
+
+    def _in_cooldown(self, symbol: str, now_ms: int) -> bool:
+        cd_until = int(self._cooldowns.get(symbol, 0))
+        return bool(cd_until and now_ms < cd_until)
+
+    def _drop_cooldowns(self, candidates: List[Candidate], now_ms: int) -> List[Candidate]:
+        out: List[Candidate] = []
+        for c in candidates:
+            if self._in_cooldown(c.symbol, now_ms):
+                self._audit.record(now_ms, c.symbol, Action.SKIP, Gate.COOLDOWN, score=c.score, threshold=self._profile.entry)
+            else:
+                out.append(c)
+        return out
 
-        price = self.broker.latest_price(symbol)
-        if not price or price <= 0:
-            return
+    async def _plan(
+        self, candidates: List[Candidate], positions: Dict[str, Position], cash: Optional[float] = None,
+    ) -> List[OrderPlan]:
+        """Batch-size candidates against current equity, cash and holdings.
 
-        qty = int(alloc / price)
-        if qty <= 0:
+        `cash` overrides the cached cash (a rotation sizes against the proceeds
+        of sales it has not placed yet).
+        """
+        cash = self._cached_cash if cash is None else cash
+        if self._cached_equity is None or cash is None:
+            return []
+        now_ms = int(time.time() * 1000)
+        candidates = self._drop_cooldowns(candidates, now_ms)
+        if not candidates:
+            return []
+
+        # Price the free slots plus as many runners-up (ties broken like the allocator):
+        # a slot whose top candidate has no quote or is dropped by the allocator
+        # goes to the next one instead of staying empty.
+        slots = max(0, self._profile.max_positions - len(positions))
+        ordered = sorted(candidates, key=lambda c: (-c.score, c.symbol))
+        ranked = ordered[:slots * 2]
+        entry_th = self._profile.entry
+        for c in ordered[slots * 2:]:
+            self._audit.record(now_ms, c.symbol, Action.SKIP, Gate.NO_SLOT, score=c.score, threshold=entry_th)
+        if not ranked:
+            return []
+        prices = await self.broker.alatest_prices([c.symbol for c in ranked])
+
+        held_value = 0.0
+        for p in positions.values():
+            if p.market_value:
+                held_value += abs(float(p.market_value))
+            elif p.avg_entry_price:
+                held_value += float(p.qty) * float(p.avg_entry_price)
+
+        sizing: Dict[str, Tuple[float, float]] = {}
+        plans = plan_entries(
+            candidates=[(c.symbol, c.score) for c in ranked],
+            prices=prices,
+            equity=self._cached_equity,
+            cash=cash,
+            held_value=held_value,
+            held_count=len(positions),
+            profile=self._profile,
+            min_weight=self._cfg.min_weight_per_pos,
+            cash_buffer=self._cfg.cash_buffer,
+            min_order_notional=self._cfg.min_order_notional,
+            sizing=sizing,
+        )
+        planned = {p.symbol for p in plans}
+        for c in ranked:
+            if c.symbol in planned:
+                continue
+            px = prices.get(c.symbol)
+            if not px:
+                gate = Gate.NO_PRICE
+            elif c.symbol in sizing:
+                gate = Gate.SIZING
+            else:
+                gate = Gate.NO_SLOT  # priced, but the slots went to stronger candidates
+            weight, notional = sizing.get(c.symbol, (0.0, 0.0))
+            self._audit.record(
+                now_ms, c.symbol, Action.SKIP, gate,
+                score=c.score, threshold=entry_th, price=px, weight=weight, aux=notional,
+            )
+        return plans
+
+    async def _open_planned(self, candidates: List[Candidate], positions: Dict[str, Position]) -> None:
+        for plan in await self._plan(candidates, positions):
+            await self._open(plan.symbol, plan.score, plan.qty, plan.price)
+
+    async def _open(self, symbol: str, score: int, qty: int, price: float) -> None:
+        if qty <= 0 or price <= 0:
             return
 
         cid = f"tca_{uuid.uuid4().hex[:10]}"
+        trace = self._trace(cid, symbol, "BUY", self._profile.entry_confirm_s)
         try:
-            self.broker.place_entry_with_bracket(
+            trace.submitted_ms = int(time.time() * 1000)
+            await self.broker.aplace_entry_with_bracket(
                 symbol=symbol,
                 qty=qty,
                 stop_loss_pct=self._profile.stop_loss_pct,
                 take_profit_pct=self._profile.take_profit_pct,
                 client_order_id=cid,
             )
-            log_trade(symbol, "BUY", qty, score, price, "entry", self.broker.name, "paper")
-            self.state.setdefault("opened_at_ms", {})
-            self.state["opened_at_ms"][symbol] = int(time.time() * 1000)
+            log_trade(symbol, "BUY", qty, score, price, "entry", self.broker.name, "paper", order_id=cid, latency=self._traced(trace))
+            self.traded.set()
+            self._opened_at.set(symbol, int(time.time() * 1000))
 
             # Cooldown to avoid rapid re-entries on noisy signals
-            cooldown_s = int(os.getenv("BOT_COOLDOWN_SECONDS", "240"))
-            self.state.setdefault("cooldowns", {})
-            self.state["cooldowns"][symbol] = int(time.time() * 1000 + cooldown_s * 1000)
+            cooldown_s = self._cfg.cooldown_seconds
+            self._cooldowns.set(symbol, int(time.time() * 1000 + cooldown_s * 1000))
+
+            self._equity.add(symbol, qty, price)
 
             # Update cash estimate pessimistically
             self._cached_cash = max(0.0, self._cached_cash - qty * price)
-            log.info("opened %s qty=%s score=%s est_price=%.2f", symbol, qty, score, price)
+            w = self._warmup
+            if w is not None and "first_order_s" not in w and time.time() * 1000 - w["open_ms"] < 86_400_000:
+                w["first_order_s"] = round((time.time() * 1000 - w["open_ms"]) / 1000.0, 3)
+            self._audit.record(
+                int(time.time() * 1000), symbol, Action.ENTER, Gate.OK, score=score, threshold=self._profile.entry,
+                price=price, qty=qty, weight=(qty * price / self._cached_equity) if self._cached_equity else 0.0,
+            )
+            log.info("opened %s qty=%s score=%s est_price=%.2f", symbol, qty, score, price, extra={"symbol": symbol, "order_id": cid})
         except Exception as e:
-            log.warning("open_failed %s err=%s", symbol, e)
+            self._audit.record(int(time.time() * 1000), symbol, Action.ENTER, Gate.ORDER_FAILED, score=score, price=price, qty=qty)
+            log.warning("open_failed %s err=%s", symbol, e, extra={"symbol": symbol, "order_id": cid})
 
-    async def _close(self, symbol: str, pos: Optional[Position], reason: str) -> None:
+    async def _close(self, symbol: str, pos: Optional[Position], reason: str, audit_aux: float = 0.0) -> bool:
+        """Close a position; False when the order failed."""
         symbol = symbol.upper()
         cid = f"tca_{uuid.uuid4().hex[:10]}"
+        action = Action.ROTATE_OUT if reason == "rotate" else Action.EXIT
+        trace = self._trace(cid, symbol, "SELL", self._profile.exit_confirm_s if reason == "score_exit" else None)
         try:
-            if pos is None:
-                self.broker.close_position(symbol, qty=None, client_order_id=cid)
-                qty = 0
-            else:
-                self.broker.close_position(symbol, qty=None, client_order_id=cid)
-                qty = pos.qty
+            trace.submitted_ms = int(time.time() * 1000)
+            await self.broker.aclose_position(symbol, qty=None, client_order_id=cid)
+            qty = pos.qty if pos is not None else 0
 
+            latency = self._traced(trace)
             sc = int(self.feed.scores.get(symbol, 50))
-            pe = self.broker.latest_price(symbol)
-            log_trade(symbol, "SELL", qty, sc, pe, reason, self.broker.name, "paper")
-            log.info("closed %s reason=%s", symbol, reason)
+            pe = await self.broker.alatest_price(symbol)
+            if self._cached_cash is not None and pe:
+                # Sale proceeds fund the buys planned in this tick (rotation).
+                self._cached_cash += qty * pe
+            self._equity.mark(symbol, pe)
+            self._equity.drop(symbol)
+            log_trade(symbol, "SELL", qty, sc, pe, reason, self.broker.name, "paper", order_id=cid, latency=latency)
+            self.traded.set()
+            self._opened_at.pop(symbol)
+            self._audit.record(
+                int(time.time() * 1000), symbol, action, gate_for_exit_reason(reason),
+                score=sc, threshold=self._profile.exit, price=pe, qty=qty, aux=audit_aux,
+            )
+            log.info("closed %s reason=%s", symbol, reason, extra={"symbol": symbol, "order_id": cid})
+            return True
         except Exception as e:
-            log.warning("close_failed %s err=%s", symbol, e)
+            self._audit.record(int(time.time() * 1000), symbol, action, Gate.ORDER_FAILED, aux=audit_aux)
+            log.warning("close_failed %s err=%s", symbol, e, extra={"symbol": symbol, "order_id": cid})
+            return False
+
+    async def _enforce_drawdown(self) -> bool:
+        """Close everything once the day's drawdown exceeds the profile limit."""
+        dd = self._equity.drawdown()
+        self.state["health"]["day_drawdown"] = round(dd, 4)
+        if dd <= self._profile.daily_max_drawdown_pct:
+            return False
+        self.state["health"]["mode"] = "safe_daily_drawdown"
+        await self._safe_close_all(reason=f"daily_drawdown_{round(dd*100,2)}%")
+        return True
+
+    async def _equity_guard_loop(self) -> None:
+        """Mark held positions to market between ticks and trip the drawdown guard early."""
+        while True:
+            await asyncio.sleep(self._cfg.equity_mark_seconds)
+            try:
+                if not self._market_open or self._equity.equity is None:
+                    continue
+                syms = self._equity.held_symbols
+                if not syms:
+                    continue
+                if self.broker.fast_quotes:
+                    prices = await self.broker.alatest_prices(syms)
+                    self._equity.mark_many(prices)
+                if self._equity.drawdown() <= self._profile.daily_max_drawdown_pct:
+                    continue
+                async with self._trade_lock:
+                    log.warning("drawdown_guard_tripped dd=%.4f", self._equity.drawdown())
+                    if await self._enforce_drawdown():
+                        self.state["health"]["equity"] = self._equity.summary()
+                        save_state(self._persist())
+            except Exception as e:
+                log.warning("equity_guard_failed err=%s", e)
 
     async def _panic_close_all(self) -> None:
         try:
-            positions = self.broker.list_positions()
+            positions = await self.broker.alist_positions()
         except Exception:
             positions = []
         for p in positions:
@@ -435,9 +871,9 @@ class BotEngine:
         - If outage persists beyond ESCALATE seconds, close all remaining positions.
         """
 
-        step_s = int(os.getenv("BOT_SAFE_REDUCE_STEP_SECONDS", "60"))
-        per_step = int(os.getenv("BOT_SAFE_REDUCE_PER_STEP", "1"))
-        escalate_s = float(os.getenv("BOT_SAFE_STALE_ESCALATE_SECONDS", "900"))
+        step_s = self._cfg.safe_reduce_step_seconds
+        per_step = self._cfg.safe_reduce_per_step
+        escalate_s = self._cfg.safe_stale_escalate_seconds
 
         safe = self.state.setdefault("safe_signal", {})
         last_ms = int(safe.get("last_reduce_ms", 0))
@@ -446,7 +882,7 @@ class BotEngine:
 
         # Snapshot positions (best-effort)
         try:
-            pos_list = [p for p in (self.broker.list_positions() or []) if p.side == "long"]
+            pos_list = [p for p in (await self.broker.alist_positions() or []) if p.side == "long"]
         except Exception:
             pos_list = []
 
@@ -481,7 +917,7 @@ class BotEngine:
     async def _safe_close_all(self, reason: str) -> None:
         # Safety mode: close positions rather than trying to adjust stops without reliable data.
         try:
-            positions = self.broker.list_positions()
+            positions = await self.broker.alist_positions()
         except Exception:
             positions = []
         for p in positions:
@@ -490,8 +926,19 @@ class BotEngine:
             await self._close(p.symbol, p, reason=reason)
 
     def _persist(self) -> Dict:
-        # Persist internal trackers with retention.
-        self.state["above_since"] = self._above_since
-        self.state["below_since"] = self._below_since
-        self.state["missing_since"] = self._missing_since
+        # Timers go to their own file, and only when one changed.
+        stores = {
+            "above_since": self._above_since,
+            "below_since": self._below_since,
+            "missing_since": self._missing_since,
+            "cooldowns": self._cooldowns,
+            "opened_at_ms": self._opened_at,
+        }
+        if any(t.dirty for t in stores.values()):
+            try:
+                save_timers({k: t.to_dict() for k, t in stores.items()})
+                for t in stores.values():
+                    t.dirty = False
+            except OSError as e:
+                log.warning("timers_save_failed err=%s", e)
         return self.state
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Stage -> (start mark, end mark) on OrderTrace.
+STAGES: Tuple[Tuple[str, str, str], ...] = (
+    ("feed", "signal_ms", "received_ms"),       # publisher `t` -> delta received by the feed
+    ("confirm", "received_ms", "confirmed_ms"),  # crossing -> confirmation window satisfied
+    ("decide", "confirmed_ms", "decided_ms"),    # confirmed -> tick that acted on it
+    ("submit", "decided_ms", "submitted_ms"),    # sizing/pricing -> broker call starts
+    ("ack", "submitted_ms", "ack_ms"),           # broker call returns
+    ("fill", "ack_ms", "fill_ms"),               # acknowledged -> fill seen
+)
+
+# Give up waiting for a fill after this long; the trace is kept without it.
+FILL_WAIT_MS = 120_000
+
+
+@dataclass
+class OrderTrace:
+    """Wall-clock marks (epoch ms) for one order, from the signal to the fill.
+
+    Marks that are unknown stay None (e.g. a restart lost the crossing delta,
+    or the broker does not report fill times); their stages are skipped.
+    """
+
+    order_id: str
+    symbol: str
+    side: str
+    decided_ms: int
+    signal_ms: Optional[int] = None
+    received_ms: Optional[int] = None
+    confirmed_ms: Optional[int] = None
+    submitted_ms: Optional[int] = None
+    ack_ms: Optional[int] = None
+    fill_ms: Optional[int] = None
+    fill_source: str = ""  # "broker" or "positions" (first seen in a position sync)
+
+    def stages(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for name, start, end in STAGES:
+            a, b = getattr(self, start), getattr(self, end)
+            if a is not None and b is not None:
+                out[name] = max(0, int(b) - int(a))
+        if self.signal_ms is not None and self.fill_ms is not None:
+            out["total"] = max(0, self.fill_ms - self.signal_ms)
+        return out
+
+    def to_json(self) -> Dict[str, Any]:
+        marks = {k: v for k, v in self.__dict__.items() if k.endswith("_ms") and v is not None}
+        return {"marks": marks, "stages_ms": self.stages(), "fill_source": self.fill_source or None}
+
+
+class LatencyHistograms:
+    """Fixed-bucket histograms of stage latencies (ms), one per stage."""
+
+    BOUNDS_MS: Tuple[int, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10_000, 30_000, 60_000, 300_000)
+
+    def __init__(self) -> None:
+        self._counts: Dict[str, List[int]] = {}
+        self._max: Dict[str, int] = {}
+
+    def observe(self, stages: Dict[str, int]) -> None:
+        for stage, ms in stages.items():
+            counts = self._counts.setdefault(stage, [0] * (len(self.BOUNDS_MS) + 1))
+            counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+            self._max[stage] = max(self._max.get(stage, 0), ms)
+
+    def _quantile(self, counts: List[int], q: float, mx: int) -> int:
+        """Upper bound of the bucket holding quantile `q` (the max for the overflow bucket)."""
+        target = q * sum(counts)
+        seen = 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= target and c:
+                return min(self.BOUNDS_MS[i], mx) if i < len(self.BOUNDS_MS) else mx
+        return mx
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"bounds_ms": list(self.BOUNDS_MS)}
+        for stage, counts in self._counts.items():
+            mx = self._max.get(stage, 0)
+            out[stage] = {
+                "n": sum(counts),
+                "p50": self._quantile(counts, 0.5, mx),
+                "p95": self._quantile(counts, 0.95, mx),
+                "max": mx,
+                "buckets": list(counts),
+            }
+        return out
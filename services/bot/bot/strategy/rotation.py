@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class HeldInfo:
+    symbol: str
+    score: int
+    qty: float
+    held_s: float
+    price: Optional[float]
+
+
+@dataclass(frozen=True)
+class CostModel:
+    score_point_bps: float
+    commission_per_trade: float
+    slippage_bps: float
+    switch_cost_multiplier: float
+
+
+@dataclass(frozen=True)
+class Swap:
+    out_symbol: str
+    out_score: int
+    in_symbol: str
+    in_score: int
+    net_benefit: float  # estimated benefit minus multiplied round-trip cost ($)
+
+
+def benefit_matrix(
+    held: Sequence[HeldInfo],
+    candidates: Sequence[Tuple[str, int]],
+    rotation_margin: int,
+    min_hold_s: float,
+    cost: CostModel,
+) -> List[List[Optional[float]]]:
+    """Net benefit ($) of swapping held[i] for candidates[j]; None where not allowed.
+
+    Same conservative model as the old single-swap gate: the score improvement is
+    converted to an expected edge on the outgoing notional and compared with the
+    round-trip cost (slippage on close+open plus two commissions) times the
+    switch-cost multiplier. Rows fail as a whole for positions under `min_hold_s`
+    or without a usable price.
+    """
+    edge_per_point = cost.score_point_bps / 10_000.0
+    slip = 2.0 * cost.slippage_bps / 10_000.0
+    fixed = 2.0 * cost.commission_per_trade
+    mult = cost.switch_cost_multiplier
+
+    matrix: List[List[Optional[float]]] = []
+    for h in held:
+        notional = max(0.0, float(h.qty) * float(h.price or 0.0))
+        if notional <= 0 or h.held_s < min_hold_s:
+            matrix.append([None] * len(candidates))
+            continue
+        row_cost = (notional * slip + fixed) * mult
+        row: List[Optional[float]] = []
+        for _, in_score in candidates:
+            delta = int(in_score) - int(h.score)
+            if delta < rotation_margin:
+                row.append(None)
+                continue
+            net = notional * delta * edge_per_point - row_cost
+            row.append(net if net >= 0 else None)
+        matrix.append(row)
+    return matrix
+
+
+def plan_rotations(
+    held: Sequence[HeldInfo],
+    candidates: Sequence[Tuple[str, int]],
+    rotation_margin: int,
+    min_hold_s: float,
+    cost: CostModel,
+    max_swaps: Optional[int] = None,
+) -> List[Swap]:
+    """Choose a set of swaps (each held symbol and candidate used at most once).
+
+    Pairs are taken greedily by largest net benefit over the whole matrix, with
+    deterministic tie-breaks, so a full book converges in one tick instead of
+    one swap per tick.
+    """
+    matrix = benefit_matrix(held, candidates, rotation_margin, min_hold_s, cost)
+    pairs = [
+        (net, i, j)
+        for i, row in enumerate(matrix)
+        for j, net in enumerate(row)
+        if net is not None
+    ]
+    pairs.sort(key=lambda p: (-p[0], held[p[1]].symbol, candidates[p[2]][0]))
+
+    used_out: set = set()
+    used_in: set = set()
+    swaps: List[Swap] = []
+    limit = len(held) if max_swaps is None else max(0, int(max_swaps))
+    for net, i, j in pairs:
+        if len(swaps) >= limit:
+            break
+        if i in used_out or j in used_in:
+            continue
+        used_out.add(i)
+        used_in.add(j)
+        h = held[i]
+        in_sym, in_score = candidates[j]
+        swaps.append(Swap(h.symbol, int(h.score), in_sym, int(in_score), round(net, 2)))
+    return swaps
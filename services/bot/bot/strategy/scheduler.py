@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional
+
+
+class TickScheduler:
+    """Fixed-cadence tick timing with overrun detection.
+
+    Each deadline is the previous deadline plus the interval, so the time a
+    tick takes does not add drift. A tick that runs past its next deadline is
+    an overrun: the missed slots are skipped (not fired back to back) and the
+    schedule keeps its phase. A mode change or an early wake re-anchors the
+    schedule at the start of the tick.
+    """
+
+    def __init__(self) -> None:
+        self._deadline: Optional[float] = None
+        self._start = 0.0
+        self._mode = ""
+        self._interval = 0.0
+        self.stats: Dict[str, Any] = {
+            "mode": "",
+            "interval_s": 0.0,
+            "ticks": 0,
+            "overruns": 0,
+            "skipped": 0,
+            "last_tick_ms": 0.0,
+            "max_tick_ms": 0.0,
+            "max_late_ms": 0.0,
+        }
+
+    def begin(self) -> None:
+        self._start = time.monotonic()
+        if self._deadline is not None:
+            late_ms = max(0.0, (self._start - self._deadline) * 1000.0)
+            self.stats["max_late_ms"] = round(max(self.stats["max_late_ms"], late_ms), 1)
+
+    def end(self, mode: str, interval_s: float) -> float:
+        """Record the tick just run; returns seconds to wait before the next one."""
+        now = time.monotonic()
+        took = now - self._start
+        st = self.stats
+        st["ticks"] += 1
+        st["last_tick_ms"] = round(took * 1000.0, 1)
+        st["max_tick_ms"] = round(max(st["max_tick_ms"], took * 1000.0), 1)
+
+        anchor = self._deadline
+        if anchor is None or mode != self._mode or interval_s != self._interval:
+            anchor = self._start
+        deadline = anchor + interval_s
+        if deadline <= now and interval_s > 0:
+            missed = int((now - anchor) // interval_s)
+            st["overruns"] += 1
+            st["skipped"] += missed
+            deadline = anchor + interval_s * (missed + 1)
+        self._deadline = deadline
+        self._mode = mode
+        self._interval = interval_s
+        st["mode"] = mode
+        st["interval_s"] = round(interval_s, 3)
+        return max(0.0, deadline - now)
+
+    def woken(self) -> None:
+        """The wait ended early (engine.wake()); the next tick starts a new schedule."""
+        self._deadline = None
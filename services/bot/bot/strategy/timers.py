@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import heapq
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+class TimerStore:
+    """Symbol -> epoch-ms timers of one kind, ordered by time.
+
+    The dict is authoritative; a min-heap of (ms, symbol) orders it, with
+    entries made stale by `set`/`pop` skipped lazily when they surface. Due
+    timers are taken in O(due log n), so a tick touches only what expired,
+    not every tracked symbol. `dirty` tells the owner the contents changed
+    since the last save.
+
+    Two ways to consume a due timer:
+    - `pop_due`: the timer is done and removed (cooldown ended, confirmation
+      acted on, grace period over); `expire` does the same without yielding.
+    - `mature`: the timer stays but is moved to the matured set (an entry
+      confirmation that keeps holding while the score stays above).
+    """
+
+    def __init__(self, items: Optional[Dict[str, int]] = None):
+        self._items: Dict[str, int] = {str(k): int(v) for k, v in (items or {}).items()}
+        self._heap: List[Tuple[int, str]] = [(ms, sym) for sym, ms in self._items.items()]
+        heapq.heapify(self._heap)
+        self._matured: Set[str] = set()
+        self._pending: Dict[str, int] = dict(self._items)  # not matured
+        self._mature_before: Optional[int] = None
+        self.dirty = False
+
+    # --- dict-like -------------------------------------------------------------
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def get(self, symbol: str, default: Optional[int] = None) -> Optional[int]:
+        return self._items.get(symbol, default)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        return iter(self._items.items())
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self._items)
+
+    def set(self, symbol: str, ms: int) -> None:
+        ms = int(ms)
+        if self._items.get(symbol) == ms:
+            return
+        self._items[symbol] = ms
+        self._matured.discard(symbol)
+        self._pending[symbol] = ms
+        heapq.heappush(self._heap, (ms, symbol))
+        self.dirty = True
+        self._compact()
+
+    def setdefault(self, symbol: str, ms: int) -> bool:
+        """Start a timer unless one is running; True if it was started."""
+        if symbol in self._items:
+            return False
+        self.set(symbol, ms)
+        return True
+
+    def pop(self, symbol: str, default: Optional[int] = None) -> Optional[int]:
+        ms = self._items.pop(symbol, None)
+        if ms is not None:
+            self._matured.discard(symbol)
+            self._pending.pop(symbol, None)
+            self.dirty = True
+            return ms
+        return default
+
+    # --- expiry ----------------------------------------------------------------
+
+    def _take(self, before_ms: int) -> Iterator[Tuple[str, int]]:
+        heap = self._heap
+        while heap and heap[0][0] <= before_ms:
+            ms, sym = heapq.heappop(heap)
+            if self._items.get(sym) == ms and sym not in self._matured:
+                yield sym, ms
+
+    def pop_due(self, before_ms: int) -> Iterator[Tuple[str, int]]:
+        """Remove and yield timers with ms <= `before_ms`, oldest first.
+
+        Stopping the iteration early leaves the rest in place.
+        """
+        for sym, ms in self._take(before_ms):
+            del self._items[sym]
+            del self._pending[sym]
+            self.dirty = True
+            yield sym, ms
+
+    def expire(self, before_ms: int) -> int:
+        """Remove every timer with ms <= `before_ms`; returns how many."""
+        n = 0
+        for sym, _ in self._take(before_ms):
+            del self._items[sym]
+            del self._pending[sym]
+            n += 1
+        if n:
+            self.dirty = True
+        return n
+
+    def mature(self, before_ms: int) -> Set[str]:
+        """Mark timers with ms <= `before_ms` matured; returns the matured set.
+
+        A later call with an earlier cutoff (a longer confirmation window)
+        re-arms everything matured after it.
+        """
+        if self._mature_before is not None and before_ms < self._mature_before:
+            self._matured.clear()
+            self._pending = dict(self._items)
+            self._heap = [(ms, sym) for sym, ms in self._items.items()]
+            heapq.heapify(self._heap)
+        self._mature_before = before_ms
+        for sym, _ in self._take(before_ms):
+            self._matured.add(sym)
+            del self._pending[sym]
+        return self._matured
+
+    def pending(self) -> Iterator[Tuple[str, int]]:
+        """Timers not matured yet."""
+        return iter(self._pending.items())
+
+    def _compact(self) -> None:
+        # Re-arming timers leaves stale heap entries behind; rebuild once they dominate.
+        if len(self._heap) > 2 * len(self._items) + 64:
+            self._heap = [(ms, sym) for sym, ms in self._pending.items()]
+            heapq.heapify(self._heap)
@@ -1,10 +1,230 @@
+"""Logging pipeline.
+
+Records are handed to a bounded in-memory queue on the caller's thread and
+written by a `QueueListener` thread, so a slow stdout (Docker log drivers)
+never blocks the event loop. On top of that:
+
+- `BOT_LOG_FORMAT=json` emits one JSON object per line with the current
+  `tick_id` and any `symbol` / `order_id` / `endpoint` passed via `extra=`.
+- Retry-loop warnings (`snapshot_failed`, `ws_failed`, ...) are rate limited
+  per logger + event name + `endpoint` (so one failing feed route does not
+  hide another's); the next emitted record carries `suppressed=N`.
+- Each engine tick has an INFO/DEBUG record budget; beyond it records are
+  dropped (counted), WARNING and above always pass. Only records emitted in
+  the engine's context (where `begin_tick` set a tick id) count, so feed,
+  outbox or retention tasks never exhaust it while the engine sleeps. Time
+  spent on the caller's side is measured per tick and reported in health.
+
+Settings come from `RuntimeSettings` (`BOT_LOG_FORMAT`, `BOT_LOG_QUEUE_SIZE`,
+`BOT_LOG_RATE_LIMIT_SECONDS`, `BOT_LOG_TICK_BUDGET`); defaults are used if
+they fail validation, which main reports right after.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import copy
+import json
 import logging
 import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# Warnings emitted from retry/reconnect loops; keyed by the event name (first word).
+RATE_LIMITED_EVENTS = frozenset({
+    "snapshot_failed",
+    "ws_failed",
+    "ws_token_expired",
+    "scores_persist_failed",
+    "centrifugo_token_failed",
+    "pair_status_check_failed",
+    "equity_guard_failed",
+    "user_config_refresh_failed",
+    "pb_realtime_failed",
+    "ibkr_connect_failed",
+    "settings_watch_failed",
+    "loop_stalled",
+})
+
+_tick_id: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("bot_tick_id", default=None)
+
+_CONTEXT_FIELDS = ("tick_id", "symbol", "order_id", "endpoint")
+
+_TRACEBACKS = logging.Formatter()
+
+
+class _RateLimiter:
+    def __init__(self, window_s: float):
+        self.window_s = float(window_s)
+        self._last: Dict[tuple, float] = {}
+        self._suppressed: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def check(self, key: tuple) -> Optional[int]:
+        """None to drop the record, else the number of records dropped since the last one."""
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.window_s:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return None
+            self._last[key] = now
+            return self._suppressed.pop(key, 0)
+
+
+class _TickStats:
+    """Caller-side logging cost, reset at each engine tick."""
+
+    def __init__(self, budget: int):
+        self.budget = int(budget)
+        self.records = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.emit_ns = 0
+        self.queue_full = 0
+
+    def reset(self) -> None:
+        self.records = self.dropped = self.rate_limited = self.emit_ns = self.queue_full = 0
+
+
+class BotQueueHandler(QueueHandler):
+    """`QueueHandler` with context fields, rate limiting and a per-tick budget.
+
+    Enqueueing never blocks: when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, q: "queue.Queue[Any]", limiter: _RateLimiter, stats: _TickStats):
+        super().__init__(q)
+        self.limiter = limiter
+        self.stats = stats
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        t0 = time.perf_counter_ns()
+        try:
+            in_tick = _tick_id.get() is not None
+            if (
+                in_tick and record.levelno < logging.WARNING
+                and self.stats.budget > 0 and self.stats.records >= self.stats.budget
+            ):
+                self.stats.dropped += 1
+                return False
+            if isinstance(record.msg, str):
+                event = record.msg.split(" ", 1)[0]
+                if event in RATE_LIMITED_EVENTS:
+                    n = self.limiter.check((record.name, event, getattr(record, "endpoint", None)))
+                    if n is None:
+                        self.stats.rate_limited += 1
+                        return False
+                    if n:
+                        record.msg = f"{record.msg} suppressed={n}"
+            if getattr(record, "tick_id", None) is None:
+                record.tick_id = _tick_id.get()
+            if in_tick:
+                self.stats.records += 1
+            return bool(super().handle(record))
+        finally:
+            self.stats.emit_ns += time.perf_counter_ns() - t0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like QueueHandler.prepare, but keep the traceback in `exc_text` instead
+        # of folding it into the message, so the JSON formatter can split it out.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _TRACEBACKS.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats.queue_full += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in _CONTEXT_FIELDS:
+            v = getattr(record, field, None)
+            if v is not None:
+                out[field] = v
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, separators=(",", ":"), default=str)
+
+
+_handler: Optional[BotQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_tick_seq = 0
 
 
 def setup_logging() -> None:
+    global _handler, _listener
+    if _listener is not None:
+        return
+    from bot.settings import RuntimeSettings, settings_store
+
+    try:
+        cfg = settings_store().current
+    except Exception:
+        cfg = RuntimeSettings()
     level = os.getenv("BOT_LOG_LEVEL", "INFO").upper().strip()
-    logging.basicConfig(
-        level=getattr(logging, level, logging.INFO),
-        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+
+    out = logging.StreamHandler()
+    if cfg.log_format == "json":
+        out.setFormatter(JsonFormatter())
+    else:
+        out.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+    q: "queue.Queue[Any]" = queue.Queue(maxsize=cfg.log_queue_size)
+    _handler = BotQueueHandler(
+        q,
+        limiter=_RateLimiter(cfg.log_rate_limit_seconds),
+        stats=_TickStats(budget=cfg.log_tick_budget),
     )
+    _listener = QueueListener(q, out, respect_handler_level=False)
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_handler)
+    root.setLevel(getattr(logging, level, logging.INFO))
+
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def begin_tick() -> int:
+    """Start a new engine tick: tag records with its id and reset the budget."""
+    global _tick_seq
+    _tick_seq += 1
+    _tick_id.set(_tick_seq)
+    if _handler is not None:
+        _handler.stats.reset()
+    return _tick_seq
+
+
+def tick_stats() -> Optional[Dict[str, Any]]:
+    """Logging cost of the current tick so far (None if `setup_logging` was not called)."""
+    if _handler is None:
+        return None
+    s = _handler.stats
+    return {
+        "records": s.records,
+        "emit_us": round(s.emit_ns / 1000.0, 1),
+        "dropped_budget": s.dropped,
+        "rate_limited": s.rate_limited,
+        "queue_full": s.queue_full,
+        "queue_depth": _handler.queue.qsize(),
+    }
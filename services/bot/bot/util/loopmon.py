@@ -0,0 +1,168 @@
+"""Event-loop lag sampling and blocked-loop attribution.
+
+The sampler is a task that sleeps a fixed interval and records how late it
+woke up: that lateness is time the loop spent running something else
+without yielding (a sync `requests` call, sqlite, a file write ...).
+
+The optional watchdog is a daemon thread watching the sampler's heartbeat.
+When the heartbeat is older than the interval plus `slow_ms`, the loop is
+stuck in one callback; the watchdog then grabs the loop thread's current
+stack and task while it is still blocked, and records the stall with its
+duration once the loop resumes. Stalls are grouped by the innermost `bot`
+frame, so the summary names the call site to fix.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from bot.strategy.latency import LatencyHistograms
+
+log = logging.getLogger("bot.loop")
+
+_STACK_DEPTH = 12
+_RECENT = 20
+_TOP = 10
+
+
+def _site(stack: List[traceback.FrameSummary]) -> str:
+    """Innermost frame in the bot package (else the innermost frame)."""
+    for fs in reversed(stack):
+        if "/bot/" in fs.filename.replace("\\", "/"):
+            return f"{fs.filename.rsplit('/bot/', 1)[-1]}:{fs.lineno} {fs.name}"
+    if stack:
+        fs = stack[-1]
+        return f"{fs.filename.rsplit('/', 1)[-1]}:{fs.lineno} {fs.name}"
+    return "?"
+
+
+def _task_name(task: Optional["asyncio.Task[Any]"]) -> str:
+    if task is None:
+        return "-"  # a plain callback, not a task step
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or task.get_name()
+
+
+class LoopMonitor:
+    def __init__(self) -> None:
+        self.interval_s = 0.25
+        self.slow_ms = 100.0
+        self._hist = LatencyHistograms()
+        self._samples = 0
+        self._max_lag_ms = 0.0
+        self._last_lag_ms = 0.0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._beat = 0.0
+        self._watchdog: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stall: Optional[Dict[str, Any]] = None  # in progress (watchdog thread)
+        self._stalls = 0
+        self._sites: Dict[Tuple[str, str], List[float]] = {}  # (task, site) -> [count, total_ms, max_ms]
+        self._recent: Deque[Dict[str, Any]] = collections.deque(maxlen=_RECENT)
+
+    # --- sampler (event loop) -------------------------------------------------
+
+    async def run(self, interval_s: float = 0.25, slow_ms: float = 100.0, watchdog: bool = False) -> None:
+        self.interval_s = max(0.01, float(interval_s))
+        self.slow_ms = max(1.0, float(slow_ms))
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        if watchdog and self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        while True:
+            t = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            now = time.perf_counter()
+            self._beat = now
+            lag_ms = max(0.0, (now - t - self.interval_s) * 1000.0)
+            self._samples += 1
+            self._last_lag_ms = lag_ms
+            self._max_lag_ms = max(self._max_lag_ms, lag_ms)
+            self._hist.observe({"lag": int(lag_ms)})
+
+    # --- watchdog (thread) -----------------------------------------------------
+
+    def _watch(self) -> None:
+        period = min(self.interval_s, self.slow_ms / 1000.0) / 4.0
+        while True:
+            time.sleep(period)
+            beat = self._beat
+            blocked_s = time.perf_counter() - beat - self.interval_s
+            stall = self._stall
+            if stall is None:
+                if blocked_s * 1000.0 >= self.slow_ms:
+                    self._stall = self._capture(beat)
+            elif beat != stall["beat"]:
+                self._finish(stall, (beat - stall["beat"] - self.interval_s) * 1000.0)
+                self._stall = None
+
+    def _capture(self, beat: float) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread or -1)
+        stack = traceback.extract_stack(frame, limit=_STACK_DEPTH) if frame is not None else []
+        task = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except Exception:
+            pass
+        return {
+            "beat": beat,
+            "at_ms": int(time.time() * 1000),
+            "task": _task_name(task),
+            "site": _site(stack),
+            "stack": [f"{fs.filename.rsplit('/', 1)[-1]}:{fs.lineno} {fs.name}" for fs in stack],
+        }
+
+    def _finish(self, stall: Dict[str, Any], ms: float) -> None:
+        ms = round(max(ms, self.slow_ms), 1)
+        key = (stall["task"], stall["site"])
+        with self._lock:
+            self._stalls += 1
+            agg = self._sites.setdefault(key, [0, 0.0, 0.0])
+            agg[0] += 1
+            agg[1] += ms
+            agg[2] = max(agg[2], ms)
+            self._recent.append({
+                "at_ms": stall["at_ms"], "ms": ms, "task": stall["task"], "site": stall["site"], "stack": stall["stack"],
+            })
+        log.warning("loop_stalled ms=%.0f task=%s site=%s", ms, stall["task"], stall["site"])
+
+    # --- report -----------------------------------------------------------------
+
+    def summary(self) -> Dict[str, Any]:
+        lag = self._hist.summary().get("lag") or {}
+        out: Dict[str, Any] = {
+            "interval_s": self.interval_s,
+            "samples": self._samples,
+            "lag_ms": {
+                "last": round(self._last_lag_ms, 1),
+                "p50": lag.get("p50"),
+                "p95": lag.get("p95"),
+                "max": round(self._max_lag_ms, 1),
+            },
+            "watchdog": self._watchdog is not None,
+        }
+        if self._watchdog is not None:
+            with self._lock:
+                top = sorted(self._sites.items(), key=lambda kv: kv[1][1], reverse=True)[:_TOP]
+                out["slow_ms"] = self.slow_ms
+                out["stalls"] = self._stalls
+                out["top"] = [
+                    {"task": task, "site": site, "count": int(c), "total_ms": round(total, 1), "max_ms": mx}
+                    for (task, site), (c, total, mx) in top
+                ]
+                out["recent"] = list(self._recent)[-5:]
+        return out
+
+
+LOOP = LoopMonitor()
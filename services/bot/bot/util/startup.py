@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import importlib
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger("bot.startup")
+
+
+def _process_start_epoch() -> Optional[float]:
+    """Wall-clock process start (Linux /proc), so interpreter startup is counted too."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # comm (field 2) may contain spaces; fields after ')' are well-formed.
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])  # field 22: starttime (clock ticks since boot)
+        with open("/proc/stat", "r") as f:
+            btime = next(int(line.split()[1]) for line in f if line.startswith("btime "))
+        return btime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        return None
+
+
+class StartupReport:
+    """Collects startup phases and lazy-import costs until the first engine tick.
+
+    Times are relative to process start when /proc is available (container
+    restarts by Watchtower start a fresh process), otherwise to this module's
+    import.
+    """
+
+    def __init__(self) -> None:
+        self._t0_wall = time.time()
+        self._t0_perf = time.perf_counter()
+        proc_start = _process_start_epoch()
+        # Offset between process start and this module's import (interpreter + stdlib).
+        self.pre_import_ms = max(0.0, (self._t0_wall - proc_start) * 1000.0) if proc_start else 0.0
+        self.phases: List[Tuple[str, float]] = []
+        self.imports: List[Tuple[str, float]] = []
+        self.marks: Dict[str, float] = {}
+        self.done: Optional[Dict[str, Any]] = None
+
+    def _since_start_ms(self) -> float:
+        return self.pre_import_ms + (time.perf_counter() - self._t0_perf) * 1000.0
+
+    def mark(self, name: str) -> None:
+        self.marks.setdefault(name, round(self._since_start_ms(), 1))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, round((time.perf_counter() - t) * 1000.0, 1)))
+
+    def timed_import(self, module: str) -> Any:
+        """Import a module lazily and record how long it took (cold import only)."""
+        t = time.perf_counter()
+        mod = importlib.import_module(module)
+        ms = (time.perf_counter() - t) * 1000.0
+        if ms >= 0.5:
+            self.imports.append((module, round(ms, 1)))
+        return mod
+
+    def first_tick(self) -> Optional[Dict[str, Any]]:
+        """Finalize and log the report on the first completed tick (idempotent)."""
+        if self.done is not None:
+            return None
+        self.done = {
+            "time_to_first_tick_ms": round(self._since_start_ms(), 1),
+            "pre_import_ms": round(self.pre_import_ms, 1),
+            "phases": dict(self.phases),
+            "imports": dict(self.imports),
+            "marks": dict(self.marks),
+        }
+        log.info(
+            "startup_report first_tick_ms=%.0f pre_import_ms=%.0f phases=%s imports=%s",
+            self.done["time_to_first_tick_ms"],
+            self.pre_import_ms,
+            " ".join(f"{k}={v:.0f}" for k, v in self.phases),
+            " ".join(f"{k}={v:.0f}" for k, v in self.imports) or "-",
+        )
+        return self.done
+
+
+STARTUP = StartupReport()